@@ -1,57 +1,418 @@
-from flask import Flask, request, jsonify, render_template
-from scheduler_bot import process_request, MEETING_STATE
-from google_calendar import get_calendar_service
-import json
-
-app = Flask(__name__)
-
-# Initialize calendar service once
-try:
-    service = get_calendar_service()
-    print("Calendar service initialized successfully")
-except Exception as e:
-    print(f"Error initializing calendar service: {e}")
-    service = None
-
-@app.route("/")
-def index():
-    return render_template("index.html")
-
-@app.route("/process", methods=["POST"])
-def process():
-    data = request.get_json()
-    user_message = data.get("message")
-    
-    if not user_message:
-        return jsonify({"reply": "No message provided."}), 400
-    
-    if not service:
-        return jsonify({"reply": "Calendar service is not available. Please check your Google Calendar setup."}), 500
-    
-    try:
-        reply = process_request(user_message, service)
-        return jsonify({
-            "reply": reply,
-            "meeting_state": MEETING_STATE  # Optional: return current state for debugging
-        })
-    except Exception as e:
-        print(f"Error processing request: {e}")
-        return jsonify({"reply": "Sorry, there was an error processing your request. Please try again."}), 500
-
-@app.route("/state", methods=["GET"])
-def get_state():
-    """Optional endpoint to check current meeting state"""
-    return jsonify({"meeting_state": MEETING_STATE})
-
-@app.route("/reset", methods=["POST"])
-def reset_state():
-    """Optional endpoint to reset meeting state"""
-    global MEETING_STATE
-    for key in MEETING_STATE:
-        MEETING_STATE[key] = None
-    return jsonify({"reply": "Meeting state has been reset.", "meeting_state": MEETING_STATE})
-
-
-
-if __name__ == "__main__":
+from flask import Flask, request, jsonify, render_template, g, Response, stream_with_context, redirect, url_for
+from scheduler_bot import process_request
+from google_calendar import load_credentials, save_credentials, on_meeting_created, cache_calendar_id, FREEBUSY_CACHE, SCOPES
+from calendar_mirror import CalendarMirror, register_mirror
+from calendar_service import ServicePool
+from credential_store import CredentialStore
+from fast_extract import EXTRACTION_STATS
+from llm import PARSE_STATS
+from session_store import SessionStore
+from session_db import SessionDB, DEFAULT_DB_PATH as SESSION_DB_PATH
+from bulk_scheduler import schedule_meetings
+from recurring import schedule_recurring
+from booking_jobs import BOOKING_QUEUE
+from metrics import REGISTRY, PROCESS_LATENCY, ERRORS
+from traffic_log import TrafficRecorder
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+# Verbose pipeline logging is off unless LOG_LEVEL asks for it
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+
+SESSION_COOKIE = "session_id"
+# Identifies a user who connected their own calendar via /authorize
+USER_COOKIE = "user_id"
+USER_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+# Create events on the booking queue and let clients poll /jobs/<id>;
+# ASYNC_BOOKING=0 creates them inline and puts the links in the reply
+ASYNC_BOOKING = os.getenv("ASYNC_BOOKING", "1") != "0"
+
+# Streamed /process turns run on these threads rather than the request
+# thread; they are long-lived so each keeps its Calendar services
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", "8"))
+_stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="stream")
+
+# Conversation state per user, keyed by the session cookie, and created
+# events, persisted to SESSION_DB_PATH (empty keeps conversations in
+# memory only)
+session_db = SessionDB() if SESSION_DB_PATH else None
+if session_db is not None:
+    on_meeting_created(session_db.record_booking)
+    # Lets any worker process answer /jobs/<id> for a job another one queued
+    BOOKING_QUEUE.on_update = session_db.save_job
+    atexit.register(session_db.close)
+sessions = SessionStore(db=session_db)
+
+# Appends every /process turn to RECORD_TRAFFIC_PATH when it is set
+traffic = TrafficRecorder()
+
+# Per-thread Calendar services sharing one set of credentials, set up on
+# first use rather than at import so workers boot without touching
+# credentials or the Google client libraries
+service_pool = None
+_service_error = None
+_service_lock = threading.Lock()
+
+# Busy time of the shared calendar, mirrored locally with sync tokens so
+# availability checks skip freebusy (CALENDAR_MIRROR=0 disables it).
+# Started with the first shared service.
+CALENDAR_MIRROR = os.getenv("CALENDAR_MIRROR", "1") != "0"
+calendar_mirror = None
+
+# Per-user credentials, opened on first use
+credential_store = None
+_store_lock = threading.Lock()
+
+def get_credential_store():
+    global credential_store
+    if credential_store is None:
+        with _store_lock:
+            if credential_store is None:
+                credential_store = CredentialStore()
+    return credential_store
+
+def get_service():
+    """
+    Return this thread's Calendar service for the caller
+
+    Users who connected their own calendar get a service for it; everyone
+    else shares the deployment's calendar (token.json).
+    """
+    return service_for(request.cookies.get(USER_COOKIE))
+
+def service_for(user_id):
+    """Return this thread's Calendar service for ``user_id``, or the shared one"""
+    if user_id:
+        try:
+            service = get_credential_store().service(user_id)
+        except Exception as e:
+            logger.error("Error loading credentials for user %s: %s", user_id, e)
+            service = None
+        if service is not None:
+            return service
+    return shared_service()
+
+def shared_service():
+    """Return this thread's service for the shared calendar, or None if it could not be built"""
+    global service_pool, _service_error
+    if service_pool is None and _service_error is None:
+        with _service_lock:
+            if service_pool is None and _service_error is None:
+                try:
+                    service_pool = ServicePool(load_credentials(), on_refresh=save_credentials)
+                    logger.info("Calendar credentials loaded")
+                except Exception as e:
+                    _service_error = e
+                    logger.error("Error initializing calendar service: %s", e)
+    if service_pool is None:
+        return None
+    try:
+        service = service_pool.get()
+    except Exception as e:
+        logger.error("Error building calendar service: %s", e)
+        return None
+    if CALENDAR_MIRROR and calendar_mirror is None:
+        start_mirror(service)
+    return service
+
+def start_mirror(service):
+    """Mirror the shared calendar and answer its availability checks locally"""
+    global calendar_mirror
+    with _service_lock:
+        if calendar_mirror is None:
+            mirror = CalendarMirror(lambda: service_pool.get(), key=cache_calendar_id(service))
+            calendar_mirror = register_mirror(mirror).start()
+
+def current_session():
+    """Resolve the caller's session from the cookie, header or JSON body"""
+    data = request.get_json(silent=True) or {}
+    session_id = (
+        request.cookies.get(SESSION_COOKIE)
+        or request.headers.get("X-Session-Id")
+        or data.get("session_id")
+    )
+    session = sessions.get(session_id)
+    g.session_id = session.id
+    return session
+
+@app.after_request
+def set_session_cookie(response):
+    session_id = g.get("session_id")
+    if session_id and request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="Lax")
+    return response
+
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+def _oauth_flow(**kwargs):
+    from google_auth_oauthlib.flow import Flow
+
+    return Flow.from_client_secrets_file(
+        "credentials.json", SCOPES, redirect_uri=url_for("oauth2callback", _external=True), **kwargs
+    )
+
+@app.route("/authorize")
+def authorize():
+    """Send the user to Google to connect their own calendar"""
+    flow = _oauth_flow()
+    auth_url, state = flow.authorization_url(access_type="offline", prompt="consent")
+    session = current_session()
+    session.oauth_flow = (state, flow.code_verifier)
+    return redirect(auth_url)
+
+@app.route("/oauth2callback")
+def oauth2callback():
+    """Store the user's credentials and remember them with a cookie"""
+    session = current_session()
+    pending, session.oauth_flow = session.oauth_flow, None
+    if not pending or request.args.get("state") != pending[0]:
+        return jsonify({"error": "Authorization was not started here or has expired. Please try again."}), 400
+
+    flow = _oauth_flow(state=pending[0], code_verifier=pending[1])
+    try:
+        flow.fetch_token(authorization_response=request.url)
+    except Exception as e:
+        logger.error("Error completing authorization: %s", e)
+        return jsonify({"error": "Google authorization failed. Please try again."}), 400
+
+    store = get_credential_store()
+    user_id = store.enroll(flow.credentials)
+    previous = request.cookies.get(USER_COOKIE)
+    if previous:
+        store.remove(previous)
+
+    response = redirect(url_for("index"))
+    response.set_cookie(
+        USER_COOKIE, user_id, max_age=USER_COOKIE_MAX_AGE,
+        httponly=True, samesite="Lax", secure=request.is_secure,
+    )
+    return response
+
+@app.route("/process", methods=["POST"])
+def process():
+    data = request.get_json()
+    user_message = data.get("message")
+    
+    if not user_message:
+        return jsonify({"reply": "No message provided."}), 400
+    
+    service = get_service()
+    if not service:
+        return jsonify({"reply": "Calendar service is not available. Please check your Google Calendar setup."}), 500
+    
+    session = current_session()
+    if request.accept_mimetypes.best == "text/event-stream":
+        return stream_process(user_message, session)
+
+    book, jobs = booker(session)
+    try:
+        arrived, started = time.time(), time.perf_counter()
+        with PROCESS_LATENCY.time():
+            reply = process_request(user_message, service, session, book=book)
+        traffic.record(arrived, session.id, user_message, reply, time.perf_counter() - started)
+        body = {
+            "reply": reply,
+            "session_id": session.id,
+            "meeting_state": dict(session.state)  # Optional: return current state for debugging
+        }
+        if jobs:
+            body["job_id"] = jobs[-1]
+        return jsonify(body)
+    except Exception as e:
+        ERRORS.inc(stage="process")
+        logger.exception("Error processing request: %s", e)
+        return jsonify({"reply": "Sorry, there was an error processing your request. Please try again."}), 500
+    finally:
+        sessions.save(session)
+
+def booker(session):
+    """
+    Return (book, job_ids) for one /process turn
+
+    ``book`` queues the caller's event insert on BOOKING_QUEUE and records
+    the job ID in ``job_ids``; it is None when ASYNC_BOOKING is off.
+    """
+    job_ids = []
+    if not ASYNC_BOOKING:
+        return None, job_ids
+    # Read the cookie now; the job's service is built on a worker thread
+    user_id = request.cookies.get(USER_COOKIE)
+
+    def book(start, end):
+        job = BOOKING_QUEUE.submit(lambda: service_for(user_id), start, end, owner=session.id)
+        job_ids.append(job.id)
+        return job.id
+    return book, job_ids
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_process(user_message, session):
+    """
+    Run a /process turn and stream its progress as Server-Sent Events
+
+    Emits "stage" events as the turn moves through understanding, thinking
+    (waiting for the LLM), checking the calendar and creating the event, and
+    a final "reply" (or "error") event with the same body the JSON endpoint
+    returns, including any booking ``job_id``.
+    """
+    # The turn runs on a stream worker with that thread's Calendar service,
+    # never the request thread's: it can outlive the request (the client
+    # disconnects and the server reuses the request thread). Read the cookie
+    # now, as booker() does.
+    user_id = request.cookies.get(USER_COOKIE)
+    events = queue.Queue()
+
+    def progress(event, data=None):
+        events.put((event, data))
+
+    book, jobs = booker(session)
+
+    def run():
+        arrived, started = time.time(), time.perf_counter()
+        try:
+            service = service_for(user_id)
+            if not service:
+                raise RuntimeError("Calendar service is not available")
+            reply = process_request(user_message, service, session, progress=progress, book=book)
+            traffic.record(arrived, session.id, user_message, reply, time.perf_counter() - started)
+            body = {
+                "reply": reply,
+                "session_id": session.id,
+                "meeting_state": dict(session.state)
+            }
+            if jobs:
+                body["job_id"] = jobs[-1]
+            events.put(("reply", body))
+        except Exception as e:
+            ERRORS.inc(stage="process")
+            logger.exception("Error processing request: %s", e)
+            events.put(("error", {"reply": "Sorry, there was an error processing your request. Please try again."}))
+        finally:
+            PROCESS_LATENCY.observe(time.perf_counter() - started)
+            sessions.save(session)
+            events.put(None)
+
+    _stream_executor.submit(run)
+
+    def generate():
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            yield sse_event(*item)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status of a queued booking; links are included once it is done"""
+    job = BOOKING_QUEUE.get(job_id)
+    if job is not None:
+        owner, body = job.owner, job.to_dict()
+    else:
+        # Queued by another worker process
+        saved = session_db.load_job(job_id) if session_db is not None else None
+        owner, body = saved or (None, None)
+    if body is None or owner != current_session().id:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(body)
+
+@app.route("/process_batch", methods=["POST"])
+def process_batch():
+    """Book many meetings at once; results are reported per meeting"""
+    data = request.get_json(silent=True) or {}
+    meetings = data.get("meetings")
+
+    if not isinstance(meetings, list) or not meetings:
+        return jsonify({"error": "Provide a non-empty 'meetings' list."}), 400
+
+    service = get_service()
+    if not service:
+        return jsonify({"error": "Calendar service is not available. Please check your Google Calendar setup."}), 500
+
+    try:
+        results = schedule_meetings(service, meetings)
+    except Exception as e:
+        ERRORS.inc(stage="batch")
+        logger.exception("Error processing batch: %s", e)
+        return jsonify({"error": "Sorry, there was an error processing the batch. Please try again."}), 500
+
+    created = sum(1 for r in results if r.get("status") == "created")
+    return jsonify({"created": created, "total": len(results), "results": results})
+
+@app.route("/process_recurring", methods=["POST"])
+def process_recurring():
+    """Book a recurring meeting; all occurrences are checked, then one series is created"""
+    spec = request.get_json(silent=True)
+    if not isinstance(spec, dict) or not spec.get("rrule"):
+        return jsonify({"error": "Provide a meeting with an 'rrule', e.g. FREQ=WEEKLY;COUNT=12."}), 400
+
+    service = get_service()
+    if not service:
+        return jsonify({"error": "Calendar service is not available. Please check your Google Calendar setup."}), 500
+
+    try:
+        result = schedule_recurring(service, spec)
+    except Exception as e:
+        ERRORS.inc(stage="recurring")
+        logger.exception("Error processing recurring meeting: %s", e)
+        return jsonify({"error": "Sorry, there was an error scheduling the series. Please try again."}), 500
+
+    status_codes = {"invalid": 400, "conflict": 409, "error": 500}
+    return jsonify(result), status_codes.get(result["status"], 200)
+
+@app.route("/state", methods=["GET"])
+def get_state():
+    """Optional endpoint to check current meeting state"""
+    session = current_session()
+    return jsonify({"session_id": session.id, "meeting_state": dict(session.state)})
+
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    """Extraction path, LLM parse and freebusy cache counters"""
+    return jsonify({
+        "extraction": EXTRACTION_STATS.snapshot(),
+        "llm_parse": PARSE_STATS.snapshot(),
+        "freebusy_cache": FREEBUSY_CACHE.stats(),
+        "calendar_services_built": service_pool.built if service_pool else 0,
+        "user_credentials": credential_store.stats() if credential_store else None,
+        "booking_jobs": BOOKING_QUEUE.stats(),
+        "session_db": session_db.stats() if session_db else None,
+        "calendar_mirror": calendar_mirror.stats() if calendar_mirror else None,
+    })
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Latency histograms and counters in Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/reset", methods=["POST"])
+def reset_state():
+    """Optional endpoint to reset meeting state"""
+    session = current_session()
+    with session.lock:
+        session.reset()
+        sessions.save(session)
+    return jsonify({"reply": "Meeting state has been reset.", "session_id": session.id, "meeting_state": dict(session.state)})
+
+
+
+if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
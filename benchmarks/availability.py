@@ -0,0 +1,134 @@
+"""
+N-attendee availability: correctness and speed on synthetic calendars
+
+Usage:
+    python -m benchmarks.availability [--intervals 2000] [--seed 7]
+
+For small inputs the heap-merge engine is checked against a brute-force
+minute grid; for larger ones it reports merge time as the number of
+calendars grows. Freebusy chunking is checked against a stub service.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from availability import (
+    FREEBUSY_MAX_ITEMS,
+    common_free_slots,
+    fetch_busy_lists,
+    merge_busy_lists,
+)
+
+START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_calendar(rng, intervals, horizon_minutes):
+    """Sorted, possibly overlapping busy intervals on a minute grid"""
+    busy = []
+    for _ in range(intervals):
+        offset = rng.randrange(horizon_minutes)
+        length = rng.choice((15, 30, 30, 45, 60, 90, 120))
+        busy.append((START + timedelta(minutes=offset), START + timedelta(minutes=offset + length)))
+    return sorted(busy)
+
+
+def brute_force_free(calendars, horizon_minutes, duration_minutes):
+    busy = [False] * horizon_minutes
+    for calendar in calendars:
+        for start, end in calendar:
+            lo = int((start - START).total_seconds() // 60)
+            hi = min(int((end - START).total_seconds() // 60), horizon_minutes)
+            for minute in range(max(lo, 0), hi):
+                busy[minute] = True
+    slots, run_start = [], None
+    for minute in range(horizon_minutes + 1):
+        free = minute < horizon_minutes and not busy[minute]
+        if free and run_start is None:
+            run_start = minute
+        elif not free and run_start is not None:
+            if minute - run_start >= duration_minutes:
+                slots.append((run_start, minute))
+            run_start = None
+    return slots
+
+
+def check_correctness(rng, rounds=200):
+    for _ in range(rounds):
+        horizon = rng.randrange(60, 3 * 24 * 60)
+        calendars = [
+            synthetic_calendar(rng, rng.randrange(0, 40), horizon)
+            for _ in range(rng.randrange(1, 12))
+        ]
+        duration = rng.choice((15, 30, 60))
+        got = [
+            (
+                int((datetime.fromisoformat(s['start']) - START).total_seconds() // 60),
+                int((datetime.fromisoformat(s['end']) - START).total_seconds() // 60),
+            )
+            for s in common_free_slots(calendars, START, START + timedelta(minutes=horizon), duration)
+        ]
+        expected = brute_force_free(calendars, horizon, duration)
+        assert got == expected, (got, expected)
+    print(f"correctness: {rounds} random cases match the brute-force grid")
+
+
+class _StubFreeBusy:
+    def __init__(self, calendars):
+        self.calendars = calendars
+        self.requests = 0
+
+    def freebusy(self):
+        return self
+
+    def query(self, body):
+        self.body = body
+        return self
+
+    def execute(self):
+        self.requests += 1
+        assert len(self.body['items']) <= FREEBUSY_MAX_ITEMS
+        return {'calendars': {
+            item['id']: {'busy': [
+                {'start': s.isoformat(), 'end': e.isoformat()} for s, e in self.calendars[item['id']]
+            ]}
+            for item in self.body['items']
+        }}
+
+
+def check_chunking(rng, calendars=120):
+    data = {f"user{i}@example.com": synthetic_calendar(rng, 20, 7 * 24 * 60) for i in range(calendars)}
+    stub = _StubFreeBusy(data)
+    busy_lists, errors = fetch_busy_lists(
+        stub, list(data), START.isoformat(), (START + timedelta(days=7)).isoformat()
+    )
+    assert len(busy_lists) == calendars and not errors
+    print(f"chunking: {calendars} calendars fetched in {stub.requests} freebusy requests")
+
+
+def bench(rng, intervals):
+    horizon = 60 * 24 * 60
+    print(f"\n{'calendars':>9} {'intervals':>10} {'merge ms':>9} {'slots':>6}")
+    for count in (5, 10, 50, 100, 500):
+        calendars = [synthetic_calendar(rng, intervals, horizon) for _ in range(count)]
+        started = time.perf_counter()
+        slots = common_free_slots(calendars, START, START + timedelta(minutes=horizon), 30)
+        elapsed = (time.perf_counter() - started) * 1000
+        merged = len(merge_busy_lists(calendars))
+        print(f"{count:>9} {count * intervals:>10} {elapsed:>9.1f} {len(slots):>6}  ({merged} merged)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--intervals", type=int, default=2000, help="busy intervals per calendar")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    check_correctness(rng)
+    check_chunking(rng)
+    bench(rng, args.intervals)
+
+
+if __name__ == "__main__":
+    main()
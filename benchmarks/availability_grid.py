@@ -0,0 +1,108 @@
+"""
+Grid (NumPy) slot search vs the Python busy-list loop, 1 to 500 calendars
+
+Usage:
+    python -m benchmarks.availability_grid [--days 60] [--granularity 15]
+
+The loop baseline is the algorithm find_free_slots uses: sort every busy
+interval and walk them once. The heap-merge engine from availability.py is
+shown for reference. "grid*" feeds the grid engine calendars already held
+as epoch arrays (to_epoch_array), i.e. without datetime conversion; "grid
+MB" is the grid engine's peak allocation. Times are the best of --repeat
+runs. With --granularity 1 and minute-aligned data all three must agree
+exactly, which is checked first.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from availability import common_free_slots
+from availability_grid import grid_free_slots, to_epoch_array
+from intervals import make_slot
+
+START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def loop_free_slots(busy_lists, start, end, duration_minutes):
+    """The per-interval Python walk from find_free_slots, over every calendar."""
+    busy_times = sorted(b for busy in busy_lists for b in busy)
+    free_slots = []
+    last_end = start
+    for busy_start, busy_end in busy_times:
+        if (busy_start - last_end).total_seconds() >= duration_minutes * 60:
+            free_slots.append(make_slot(last_end, busy_start))
+        last_end = max(last_end, busy_end)
+    if (end - last_end).total_seconds() >= duration_minutes * 60:
+        free_slots.append(make_slot(last_end, end))
+    return free_slots
+
+
+def working_calendar(rng, days):
+    """A plausible calendar: a few meetings per weekday between 8:00 and 18:00"""
+    busy = []
+    for day in range(days):
+        date = START + timedelta(days=day)
+        if date.weekday() >= 5:
+            continue
+        for _ in range(rng.randrange(0, 3)):
+            begin = date + timedelta(minutes=rng.randrange(8 * 60, 17 * 60, 15))
+            busy.append((begin, begin + timedelta(minutes=rng.choice((15, 30, 60)))))
+    return sorted(busy)
+
+
+def timed(repeat, fn, *args):
+    """Result and best-of-``repeat`` milliseconds of fn(*args)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return result, best * 1000
+
+
+def peak_mb(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--granularity", type=int, default=15)
+    parser.add_argument("--duration", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    end = START + timedelta(days=args.days)
+
+    sample = [working_calendar(rng, args.days) for _ in range(20)]
+    exact = loop_free_slots(sample, START, end, args.duration)
+    assert grid_free_slots(sample, START, end, args.duration, 1) == exact
+    assert common_free_slots(sample, START, end, args.duration) == exact
+    print("check: grid at 1-minute granularity, heap merge and loop agree\n")
+
+    print(f"{args.days}-day horizon, {args.granularity}-minute grid, {args.duration}-minute meetings")
+    print(f"{'calendars':>9} {'intervals':>9} {'loop ms':>9} {'heap ms':>9} {'grid ms':>9} {'grid* ms':>9} {'grid MB':>8} {'slots':>6}")
+    for count in (1, 5, 10, 50, 100, 250, 500):
+        calendars = [working_calendar(rng, args.days) for _ in range(count)]
+        total = sum(len(c) for c in calendars)
+        _, loop_ms = timed(args.repeat, loop_free_slots, calendars, START, end, args.duration)
+        _, heap_ms = timed(args.repeat, common_free_slots, calendars, START, end, args.duration)
+        grid, grid_ms = timed(args.repeat, grid_free_slots, calendars, START, end, args.duration, args.granularity)
+        epoch = [to_epoch_array(c) for c in calendars]
+        _, epoch_ms = timed(args.repeat, grid_free_slots, epoch, START, end, args.duration, args.granularity)
+        grid_mb = peak_mb(grid_free_slots, calendars, START, end, args.duration, args.granularity)
+        print(f"{count:>9} {total:>9} {loop_ms:>9.2f} {heap_ms:>9.2f} {grid_ms:>9.2f} {epoch_ms:>9.2f} "
+              f"{grid_mb:>8.1f} {len(grid):>6}")
+
+
+if __name__ == "__main__":
+    main()
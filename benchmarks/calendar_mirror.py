@@ -0,0 +1,141 @@
+"""
+Availability checks from the calendar mirror vs. a freebusy call each
+
+Usage:
+    python -m benchmarks.calendar_mirror [--events 600] [--checks 300]
+        [--calendar-latency 0.08] [--sync-seconds 0.2]
+
+A fake calendar is seeded with --events meetings over the next weeks.
+
+latency      --checks availability lookups for random windows through
+             fetch_busy_index: as before (freebusy plus FREEBUSY_CACHE)
+             and with the mirror registered.
+correctness  After batches of outside changes (new and cancelled events),
+             an incremental sync must leave the mirror identical to what
+             freebusy reports; also after sync tokens expire (410 Gone,
+             full resync).
+staleness    With the background sync running every --sync-seconds, how
+             long an event created elsewhere takes to show up in reads.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fakes import FakeCalendarService
+from calendar_mirror import MIRRORS, CalendarMirror, register_mirror
+from google_calendar import fetch_busy_index
+from intervals import BusyIndex
+
+
+def seed(fake, rng, events, now, days=30):
+    for _ in range(events):
+        add_random(fake, rng, now, days)
+
+
+def add_random(fake, rng, now, days=30):
+    start = now.replace(minute=0, second=0, microsecond=0) + timedelta(
+        days=rng.randrange(days), hours=rng.randrange(8, 18), minutes=rng.choice((0, 15, 30, 45))
+    )
+    return fake.add_busy(start.isoformat(), (start + timedelta(minutes=rng.choice((15, 30, 60)))).isoformat())
+
+
+def random_window(rng, now):
+    start = now + timedelta(days=rng.randrange(1, 25), hours=rng.randrange(0, 24))
+    return start.isoformat(), (start + timedelta(hours=rng.choice((1, 8, 24, 24 * 7)))).isoformat()
+
+
+def timed_checks(fake, rng, now, checks):
+    samples = []
+    for _ in range(checks):
+        time_min, time_max = random_window(rng, now)
+        started = time.perf_counter()
+        fetch_busy_index(fake, time_min, time_max)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def assert_mirrors(mirror, fake, now):
+    time_min, time_max = now.isoformat(), (now + timedelta(days=40)).isoformat()
+    result = fake._freebusy({"timeMin": time_min, "timeMax": time_max, "items": [{"id": "primary"}]})
+    expected = BusyIndex.from_freebusy(result["calendars"]["primary"]["busy"])
+    mirrored = mirror.busy_index(time_min, time_max)
+    got = mirrored.busy_between(now, now + timedelta(days=40))
+    assert got == list(expected), f"mirror has {len(got)} intervals, freebusy {len(expected)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=600)
+    parser.add_argument("--checks", type=int, default=300)
+    parser.add_argument("--calendar-latency", type=float, default=0.08)
+    parser.add_argument("--sync-seconds", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    fake = FakeCalendarService(latency=args.calendar_latency, seed=args.seed)
+    seed(fake, rng, args.events, now)
+
+    # FREEBUSY_CACHE stays on for the baseline; it answers windows inside earlier ones
+    direct = timed_checks(fake, random.Random(args.seed), now, args.checks)
+    freebusy_calls = fake.calls["freebusy"]
+
+    mirror = register_mirror(CalendarMirror(lambda: fake, sync_seconds=args.sync_seconds, max_staleness=60))
+    started = time.perf_counter()
+    mirror.sync()
+    load_ms = (time.perf_counter() - started) * 1000
+    mirrored = timed_checks(fake, random.Random(args.seed), now, args.checks)
+
+    print(f"{args.events} events, {args.checks} checks, {args.calendar_latency * 1000:.0f} ms per Calendar call\n")
+    print(f"{'mode':<10} {'mean ms':>9} {'p95 ms':>9} {'API calls':>10}")
+    for name, samples, calls in (
+        ("freebusy", direct, freebusy_calls),
+        ("mirror", mirrored, fake.calls["list"] + fake.calls["freebusy"] - freebusy_calls),
+    ):
+        p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+        print(f"{name:<10} {statistics.mean(samples):>9.3f} {p95:>9.3f} {calls:>10}")
+    print(f"initial full load: {load_ms:.0f} ms")
+
+    # Outside changes, picked up incrementally
+    # No round-trip latency for the correctness rounds
+    fake._latency = FakeCalendarService()._latency
+    kinds = []
+    for _ in range(20):
+        created = [add_random(fake, rng, now) for _ in range(rng.randrange(1, 10))]
+        for event in rng.sample(created, rng.randrange(len(created))):
+            fake.events().update(calendarId="primary", eventId=event["id"], body={"status": "cancelled"}).execute()
+        kinds.append(mirror.sync())
+        assert_mirrors(mirror, fake, now)
+    fake.expire_sync_tokens()
+    add_random(fake, rng, now)
+    kinds.append(mirror.sync())
+    assert_mirrors(mirror, fake, now)
+    print(f"\ncorrectness: ok ({kinds.count('incremental')} incremental syncs, then {kinds[-1]} after 410)")
+
+    # Visibility lag with the timer running
+    mirror.start()
+    lags = []
+    for _ in range(10):
+        # Land at a random point of the sync period
+        time.sleep(rng.uniform(0, args.sync_seconds))
+        start = now + timedelta(days=35, hours=rng.randrange(240))
+        end = start + timedelta(minutes=30)
+        created_at = time.perf_counter()
+        fake.add_busy(start.isoformat(), end.isoformat())
+        while not mirror.busy_index(now.isoformat(), (now + timedelta(days=60)).isoformat()).overlaps(start, end):
+            time.sleep(0.005)
+        lags.append(time.perf_counter() - created_at)
+    mirror.stop()
+    print(f"staleness: outside events visible after {statistics.mean(lags) * 1000:.0f} ms mean, "
+          f"{max(lags) * 1000:.0f} ms max (sync every {args.sync_seconds * 1000:.0f} ms)")
+    MIRRORS.clear()
+
+    assert max(lags) <= args.sync_seconds + 0.1
+    assert statistics.mean(mirrored) < statistics.mean(direct)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+End-to-end /process benchmark against fake Calendar and Gemini backends
+
+Usage:
+    python -m benchmarks.e2e [--conversations 200] [--concurrency 8]
+        [--llm-latency 0.4] [--calendar-latency 0.08] [--failure-rate 0]
+        [--sync-booking] [--no-mirror]
+
+Scripted multi-turn conversations are driven through the Flask app's
+/process endpoint at the given concurrency. The report shows throughput
+and p50/p95/p99 latency for each pipeline stage (LLM call, freebusy,
+event insert) and for the whole /process request. Events are created on
+the booking queue unless --sync-booking is given; "booked" is the time
+from submitting a booking job to its links being ready. Availability is
+answered from the calendar mirror ("list" is its sync calls) unless
+--no-mirror is given.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.fakes import FakeCalendarService, StubGeminiServer
+
+CONVERSATIONS = [
+    # Simple messages answered by the local fast path
+    ["30 minutes tomorrow at 3pm"],
+    ["Schedule a 45-minute meeting on Friday at 10 AM"],
+    # Details gathered over several turns
+    ["half an hour", "Monday", "at 11:30"],
+    # Free-form messages that need the LLM
+    ["Could we get the design crew together tomorrow around 2 PM for an hour?"],
+    ["I'd love a quick 15 minutes with finance on Thursday at 9 AM please"],
+    # Deadline-driven suggestions followed by a pick
+    ["30 minutes at 4 PM before {deadline}", "suggest some dates", "option 2"],
+]
+
+
+class StageTimer:
+    """Collects wall-clock samples per pipeline stage from many threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return timed
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_conversation(flask_app, turns, timer):
+    client = flask_app.test_client()
+    replies = []
+    for message in turns:
+        started = time.perf_counter()
+        response = client.post("/process", json={"message": message})
+        timer.add("process", time.perf_counter() - started)
+        replies.append(response.get_json()["reply"])
+    return replies
+
+
+def report(timer, elapsed, conversations, turns):
+    print(f"\n{conversations} conversations / {turns} turns in {elapsed:.2f}s")
+    print(f"throughput: {conversations / elapsed:.1f} conversations/s, {turns / elapsed:.1f} turns/s\n")
+    print(f"{'stage':<10} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage in ("process", "llm", "freebusy", "list", "insert", "booked"):
+        samples = [s * 1000 for s in timer.samples.get(stage, [])]
+        if not samples:
+            if stage not in ("booked", "list"):
+                print(f"{stage:<10} {0:>6}")
+            continue
+        print(
+            f"{stage:<10} {len(samples):>6} {statistics.mean(samples):>9.1f} "
+            f"{percentile(samples, 50):>9.1f} {percentile(samples, 95):>9.1f} {percentile(samples, 99):>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds per Gemini call")
+    parser.add_argument("--calendar-latency", type=float, default=0.08, help="seconds per Calendar call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of backend calls that fail")
+    parser.add_argument("--sync-booking", action="store_true", help="create events inside /process")
+    parser.add_argument("--no-mirror", action="store_true", help="check availability with freebusy, not the calendar mirror")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    stub = StubGeminiServer(latency=args.llm_latency, failure_rate=args.failure_rate, seed=args.seed).start()
+    fake = FakeCalendarService(latency=args.calendar_latency, failure_rate=args.failure_rate, seed=args.seed)
+
+    os.environ["GEMINI_MODEL_URL"] = stub.model_url
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    # Keep benchmark conversations out of the working directory's sessions.db
+    os.environ.setdefault("SESSION_DB_PATH", os.path.join(tempfile.mkdtemp(), "sessions.db"))
+
+    import app
+    import scheduler_bot
+    from calendar_service import ServicePool
+    app.service_pool = ServicePool(None, factory=lambda creds: fake)
+    app.ASYNC_BOOKING = not args.sync_booking
+    app.CALENDAR_MIRROR = not args.no_mirror
+    scheduler_bot.chat_with_llm = timer.wrap("llm", scheduler_bot.chat_with_llm)
+
+    deadline = (date.today() + timedelta(days=10)).isoformat()
+    scripts = [
+        [turn.format(deadline=deadline) for turn in CONVERSATIONS[i % len(CONVERSATIONS)]]
+        for i in range(args.conversations)
+    ]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda turns: run_conversation(app.app, turns, timer), scripts))
+    elapsed = time.perf_counter() - started
+    app.BOOKING_QUEUE.join()
+    stub.stop()
+
+    for op in ("freebusy", "list", "insert"):
+        timer.samples[op] = fake.timings[op]
+    timer.samples["booked"] = [
+        job.finished_at - job.created_at for job in app.BOOKING_QUEUE._jobs.values() if job.finished
+    ]
+    report(timer, elapsed, len(scripts), sum(len(s) for s in scripts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+In-process fake Calendar service and stub Gemini server for benchmarks
+
+FakeCalendarService mimics the parts of the googleapiclient Calendar
+service the app uses (freebusy().query(), events().insert()/get()/
+update()/list() and batch requests) on an in-memory event store.
+Recurring events are expanded into their occurrences, as freebusy and
+list(singleEvents=True) do.
+StubGeminiServer answers generateContent on a local port. Both take an
+artificial latency and a failure rate so the pipeline can be exercised
+under realistic and degraded conditions.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dateutil.rrule import rrulestr
+
+from intervals import parse_iso
+
+try:
+    import httplib2
+    from googleapiclient.errors import HttpError
+except ImportError:  # the fakes still work without the Google client installed
+    httplib2 = None
+
+    class HttpError(Exception):
+        def __init__(self, resp, content, uri=None):
+            super().__init__(f"HTTP {resp['status']}: {content!r}")
+            self.resp = resp
+            self.content = content
+            self.status_code = resp['status']
+
+
+def http_error(status, message):
+    resp = httplib2.Response({'status': status}) if httplib2 else {'status': status}
+    if httplib2:
+        resp.reason = message
+    return HttpError(resp, json.dumps({'error': {'code': status, 'message': message}}).encode())
+
+
+class _Latency:
+    """Fixed seconds or a (low, high) uniform range, plus a failure rate"""
+
+    def __init__(self, latency, failure_rate, seed):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            if isinstance(self.latency, tuple):
+                delay = self._rng.uniform(*self.latency)
+            else:
+                delay = self.latency
+            failed = self._rng.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        return failed
+
+
+class _FakeRequest:
+    def __init__(self, service, op, fn):
+        self._service = service
+        self._op = op
+        self._fn = fn
+
+    def execute(self, num_retries=0):
+        return self._service._run(self._op, self._fn)
+
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id or str(len(self._requests))))
+
+    def execute(self):
+        # One round trip for the whole batch, then every part runs locally
+        self._service._run('batch', lambda: None)
+        for request, callback, request_id in self._requests:
+            try:
+                response, error = request._fn(), None
+            except Exception as e:
+                response, error = None, e
+            self._service.calls[request._op] += 1
+            callback(request_id, response, error)
+
+
+class _Resource:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+def instances(event):
+    """The event itself, or each occurrence of a recurring event as its own event"""
+    if not event.get('recurrence'):
+        return [event]
+    start = parse_iso(event['start']['dateTime'])
+    duration = parse_iso(event['end']['dateTime']) - start
+    occurrences = []
+    for occurrence in rrulestr("\n".join(event['recurrence']), dtstart=start, forceset=True):
+        instance = dict(
+            event,
+            id=f"{event['id']}_{occurrence.strftime('%Y%m%dT%H%M%SZ')}",
+            recurringEventId=event['id'],
+            start={'dateTime': occurrence.isoformat()},
+            end={'dateTime': (occurrence + duration).isoformat()},
+        )
+        del instance['recurrence']
+        occurrences.append(instance)
+    return occurrences
+
+
+class FakeCalendarService:
+    """
+    In-memory stand-in for ``build('calendar', 'v3', ...)``
+
+    Args:
+        latency: Seconds per API round trip, or a (low, high) range
+        failure_rate: Probability that a round trip raises HTTP 503
+        lost_write_rate: Probability that an insert is stored but its
+            response is lost (the client sees HTTP 503)
+        seed: Seed for latency/failure randomness
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, lost_write_rate=0.0, seed=None):
+        self._latency = _Latency(latency, failure_rate, seed)
+        self.lost_write_rate = lost_write_rate
+        self._lost_rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.events_by_calendar = defaultdict(dict)
+        self.calls = Counter()
+        self.timings = defaultdict(list)
+        self._sync_version = 0
+        self._changes = []
+        # Bumped by expire_sync_tokens; older tokens get 410 Gone
+        self._token_generation = 0
+
+    # -- googleapiclient surface ----------------------------------------
+
+    def freebusy(self):
+        return _Resource(query=lambda body: _FakeRequest(self, 'freebusy', lambda: self._freebusy(body)))
+
+    def events(self):
+        return _Resource(
+            insert=lambda calendarId, body, **kwargs: _FakeRequest(
+                self, 'insert', lambda: self._insert(calendarId, body)
+            ),
+            get=lambda calendarId, eventId, **kwargs: _FakeRequest(
+                self, 'get', lambda: self._get(calendarId, eventId)
+            ),
+            update=lambda calendarId, eventId, body, **kwargs: _FakeRequest(
+                self, 'update', lambda: self._update(calendarId, eventId, body)
+            ),
+            list=lambda calendarId, **kwargs: _FakeRequest(
+                self, 'list', lambda: self._list(calendarId, **kwargs)
+            ),
+            list_next=lambda previous_request, previous_response: None,
+        )
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    # -- helpers ----------------------------------------------------------
+
+    def add_busy(self, start, end, calendar_id='primary', summary='Busy'):
+        """Seed the store with an existing event."""
+        return self._insert(calendar_id, {
+            'summary': summary,
+            'start': {'dateTime': start},
+            'end': {'dateTime': end},
+        })
+
+    def expire_sync_tokens(self):
+        """Invalidate every sync token handed out so far, as Google does after a while."""
+        with self._lock:
+            self._token_generation += 1
+
+    def _run(self, op, fn):
+        started = time.perf_counter()
+        try:
+            if self._latency.wait():
+                raise http_error(503, 'Backend Error')
+            result = fn()
+            if op == 'insert' and self.lost_write_rate:
+                with self._lock:
+                    lost = self._lost_rng.random() < self.lost_write_rate
+                if lost:
+                    raise http_error(503, 'Backend Error')
+            return result
+        finally:
+            self.calls[op] += 1
+            self.timings[op].append(time.perf_counter() - started)
+
+    def _freebusy(self, body):
+        time_min, time_max = parse_iso(body['timeMin']), parse_iso(body['timeMax'])
+        calendars = {}
+        with self._lock:
+            for item in body['items']:
+                busy = []
+                events = self.events_by_calendar.get(item['id'], {}).values()
+                for event in (instance for series in events for instance in instances(series)):
+                    start = parse_iso(event['start']['dateTime'])
+                    end = parse_iso(event['end']['dateTime'])
+                    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+                        continue
+                    if start < time_max and time_min < end:
+                        busy.append({'start': max(start, time_min).isoformat(), 'end': min(end, time_max).isoformat()})
+                calendars[item['id']] = {'busy': sorted(busy, key=lambda b: b['start'])}
+        return {'kind': 'calendar#freeBusy', 'calendars': calendars}
+
+    def _insert(self, calendar_id, body):
+        with self._lock:
+            events = self.events_by_calendar[calendar_id]
+            event_id = body.get('id') or uuid.uuid4().hex
+            if event_id in events:
+                raise http_error(409, 'The requested identifier already exists.')
+            event = dict(body, id=event_id, status='confirmed', htmlLink=f"https://calendar.example/event?eid={event_id}")
+            if 'conferenceData' in body:
+                event['conferenceData'] = {
+                    'entryPoints': [{'entryPointType': 'video', 'uri': f"https://meet.example/{event_id[:10]}"}]
+                }
+            events[event_id] = event
+            self._sync_version += 1
+            self._changes.append((self._sync_version, calendar_id, event_id))
+            return dict(event)
+
+    def _get(self, calendar_id, event_id):
+        with self._lock:
+            event = self.events_by_calendar.get(calendar_id, {}).get(event_id)
+            if event is None:
+                raise http_error(404, 'Not Found')
+            return dict(event)
+
+    def _update(self, calendar_id, event_id, body):
+        with self._lock:
+            events = self.events_by_calendar.get(calendar_id, {})
+            if event_id not in events:
+                raise http_error(404, 'Not Found')
+            event = dict(events[event_id], **body)
+            event.update(id=event_id, status=body.get('status', 'confirmed'))
+            events[event_id] = event
+            self._sync_version += 1
+            self._changes.append((self._sync_version, calendar_id, event_id))
+            return dict(event)
+
+    def _list(self, calendarId, syncToken=None, pageToken=None, timeMin=None, timeMax=None,
+              maxResults=None, **kwargs):
+        with self._lock:
+            events = self.events_by_calendar.get(calendarId, {})
+            if syncToken is None:
+                items = sorted(
+                    (instance for series in events.values() for instance in instances(series)),
+                    key=lambda e: parse_iso(e['start']['dateTime']),
+                )
+                if timeMin:
+                    items = [e for e in items if parse_iso(e['end']['dateTime']) > parse_iso(timeMin)]
+                if timeMax:
+                    items = [e for e in items if parse_iso(e['start']['dateTime']) < parse_iso(timeMax)]
+                items = items[:maxResults]
+            else:
+                generation, _, since = syncToken.partition(':')
+                if int(generation) != self._token_generation:
+                    raise http_error(410, 'Sync token is no longer valid, a full sync is required.')
+                since = int(since)
+                changed = {eid for version, cal, eid in self._changes if version > since and cal == calendarId}
+                items = [instance for eid in changed if eid in events for instance in instances(events[eid])]
+            return {
+                'items': [dict(e) for e in items],
+                'nextSyncToken': f"{self._token_generation}:{self._sync_version}",
+            }
+
+
+class _GeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server.stub
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server.calls += 1
+        if server._latency.wait():
+            return self._send(503, {"error": {"code": 503, "message": "The model is overloaded."}})
+
+        prompt = payload["contents"][0]["parts"][0]["text"]
+        return self._send(200, _candidate(json.dumps(server.responder(prompt))))
+
+    def _send(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _candidate(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+def rule_responder(prompt):
+    """Answer extraction prompts with the local rules, ignoring confidence."""
+    from fast_extract import extract_meeting_details
+
+    match = re.search(r"User input: (.*)", prompt)
+    user_input = match.group(1) if match else ""
+    return extract_meeting_details(user_input, min_confidence=0.0) or {}
+
+
+class StubGeminiServer:
+    """
+    Local HTTP server standing in for the Gemini API
+
+    Use ``model_url`` as GEMINI_MODEL_URL.
+
+    Args:
+        latency: Seconds per call, or a (low, high) range
+        failure_rate: Probability that a call returns HTTP 503
+        responder: Function from prompt text to the JSON object to return
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, responder=rule_responder, seed=None):
+        self._latency = _Latency(latency, failure_rate, seed)
+        self.responder = responder
+        self.calls = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _GeminiHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.model_url = f"http://127.0.0.1:{self._server.server_address[1]}/v1beta/models/stub"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
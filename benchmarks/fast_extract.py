@@ -0,0 +1,76 @@
+"""
+Local fast-path extraction accuracy and per-message cost
+
+Usage:
+    python -m benchmarks.fast_extract [--repeat 2000]
+
+Every corpus message is labelled with the fields the local extractor
+should return, or None when it must go to the LLM (words it does not
+understand, or phrasings that look simple but mean something else, such
+as "in 2 hours", a start time relative to now rather than a duration).
+Any mismatch fails the run.
+"""
+import argparse
+import time
+from datetime import date
+
+from fast_extract import extract_meeting_details
+
+TODAY = date(2025, 1, 6)  # a Monday
+
+CORPUS = [
+    # Answered locally
+    ("Schedule a 30-minute meeting on Monday at 2 PM",
+     {"duration_minutes": 30, "date": "monday", "time_pref": "2:00 PM"}),
+    ("Book a 1-hour call tomorrow at 3:30 PM",
+     {"duration_minutes": 60, "date": "2025-01-07", "time_pref": "3:30 PM"}),
+    ("half an hour on Friday at noon", {"duration_minutes": 30, "date": "friday", "time_pref": "12:00 PM"}),
+    ("an hour next tuesday", {"duration_minutes": 60, "date": "tuesday"}),
+    ("45 mins today at 16:00", {"duration_minutes": 45, "date": "2025-01-06", "time_pref": "4:00 PM"}),
+    ("I need a meeting before Friday at 10 AM", {"deadline": "friday", "time_pref": "10:00 AM"}),
+    ("30 minutes", {"duration_minutes": 30}),
+    ("tomorrow", {"date": "2025-01-07"}),
+    ("suggest some dates", {"request_suggestions": True}),
+    # Left to the LLM
+    ("schedule a meeting in 2 hours", None),
+    ("book a call in 30 minutes", None),
+    ("can we meet in an hour", None),
+    ("set up a sync within half an hour", None),
+    ("30 minutes with the finance team about the budget", None),
+    ("suggest some dates for a 30 minute call", None),
+    ("hmm", None),
+]
+
+
+def per_message_us(repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message, _ in CORPUS:
+            extract_meeting_details(message, today=TODAY)
+    return (time.perf_counter() - started) / (repeat * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    wrong = []
+    for message, expected in CORPUS:
+        got = extract_meeting_details(message, today=TODAY)
+        if got != expected:
+            wrong.append((message, expected, got))
+
+    total = len(CORPUS)
+    local = sum(1 for _, expected in CORPUS if expected is not None)
+    print(f"corpus: {total} messages, {local} answerable locally\n")
+    print(f"fast path: {total - len(wrong)}/{total} correct")
+    for message, expected, got in wrong:
+        print(f"  {message!r}: expected {expected}, got {got}")
+    print(f"\nper message: {per_message_us(args.repeat):.2f} us")
+
+    assert not wrong, f"{len(wrong)} messages extracted wrongly"
+
+
+if __name__ == "__main__":
+    main()
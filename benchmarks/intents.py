@@ -0,0 +1,105 @@
+"""
+Intent router accuracy and per-message cost vs the old greeting scans
+
+Usage:
+    python -m benchmarks.intents [--repeat 2000]
+
+Every corpus message is labelled with the intent it should be routed to,
+or None when it carries meeting details and must reach extraction. The
+old is_greeting_or_casual/handle_greeting_or_casual pair could only say
+"casual or not", so it is scored on that: a message it answered with a
+canned reply that should have gone to extraction is a false positive.
+"""
+import argparse
+import time
+
+from intents import route_intent
+
+CORPUS = [
+    # Greetings
+    ("hi", "greeting"), ("Hello!", "greeting"), ("hey there", "greeting"), ("Good morning", "greeting"),
+    ("hiya", "greeting"), ("yo", "greeting"), ("what's up?", "greeting"), ("How are you doing today?", "greeting"),
+    ("hi, how are you", "greeting"), ("Hey bot", "greeting"),
+    # Thanks / goodbye / acknowledgements
+    ("thanks", "thanks"), ("Thank you so much!", "thanks"), ("ok thanks", "thanks"), ("thx", "thanks"),
+    ("much appreciated", "thanks"), ("bye", "goodbye"), ("Goodbye!", "goodbye"), ("see you later", "goodbye"),
+    ("thanks, bye", "goodbye"), ("that's all, thanks", "goodbye"), ("have a great day", "goodbye"),
+    ("ok", "ack"), ("okay", "ack"), ("cool", "ack"), ("got it", "ack"), ("sounds good", "ack"), ("perfect!", "ack"),
+    # Reset / cancel
+    ("start over", "reset"), ("Let's start over", "reset"), ("reset", "reset"), ("please start again", "reset"),
+    ("cancel", "cancel"), ("cancel that", "cancel"), ("never mind", "cancel"), ("nevermind", "cancel"),
+    ("forget it", "cancel"), ("scratch that please", "cancel"),
+    # Listing meetings
+    ("list my meetings", "list_meetings"), ("show me my upcoming meetings", "list_meetings"),
+    ("What's on my calendar today?", "list_meetings"), ("what meetings do I have tomorrow", "list_meetings"),
+    ("can you show my schedule for this week", "list_meetings"), ("my meetings please", "list_meetings"),
+    ("hi, what do I have on my calendar?", "list_meetings"), ("upcoming meetings", "list_meetings"),
+    # Meeting requests that must reach extraction
+    ("Schedule a 30-minute meeting on Monday at 2 PM", None),
+    ("hi, book 30 minutes this Friday at 3pm", None),
+    ("hi this friday works", None),
+    ("your meeting tomorrow at 10 AM for an hour", None),
+    ("hey can we meet tomorrow at 3", None),
+    ("history review, 45 minutes on Thursday", None),
+    ("Hello, I need a meeting before Friday at 10 AM", None),
+    ("yoga class planning call, 1 hour tomorrow", None),
+    ("supplier sync at 4 PM on Wednesday", None),
+    ("option 2", None), ("the second one", None), ("suggest some dates", None),
+    ("ok let's do 3 pm instead", None), ("thanks, make it 45 minutes", None),
+    ("cancel my 3pm meeting tomorrow", None), ("good morning! 30 min with finance at 9am tomorrow", None),
+    ("tomorrow", None), ("30 minutes", None), ("how about Tuesday", None),
+]
+
+
+def legacy_is_casual(user_input):
+    """is_greeting_or_casual as it was before the intent router."""
+    greetings = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+                 "how are you", "what's up", "whats up", "sup", "yo", "hiya"]
+    casual_phrases = ["thanks", "thank you", "bye", "goodbye", "see you", "ok", "okay", "cool"]
+    user_lower = user_input.lower().strip()
+    if user_lower in greetings + casual_phrases:
+        return True
+    return any(user_lower.startswith(greeting) for greeting in greetings)
+
+
+def per_message_us(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message, _ in CORPUS:
+            fn(message)
+    return (time.perf_counter() - started) / (repeat * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    wrong, routed = [], 0
+    for message, expected in CORPUS:
+        result = route_intent(message)
+        got = result[0] if result else None
+        routed += got is not None
+        if got != expected:
+            wrong.append((message, expected, got))
+    legacy_false_positives = [m for m, expected in CORPUS if expected is None and legacy_is_casual(m)]
+    legacy_missed = [m for m, expected in CORPUS if expected is not None and not legacy_is_casual(m)]
+
+    total = len(CORPUS)
+    local = sum(1 for _, expected in CORPUS if expected is not None)
+    print(f"corpus: {total} messages, {local} answerable without extraction\n")
+    print(f"router: {total - len(wrong)}/{total} correct, {routed} routed locally")
+    for message, expected, got in wrong:
+        print(f"  {message!r}: expected {expected}, got {got}")
+    print(f"legacy: {len(legacy_false_positives)} meeting requests given a canned reply, "
+          f"{len(legacy_missed)} casual messages sent to extraction")
+    for message in legacy_false_positives:
+        print(f"  canned reply for {message!r}")
+
+    router_us = per_message_us(route_intent, args.repeat)
+    legacy_us = per_message_us(legacy_is_casual, args.repeat)
+    print(f"\nper message: router {router_us:.2f} us, legacy {legacy_us:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
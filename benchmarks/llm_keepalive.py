@@ -0,0 +1,95 @@
+"""
+Per-call latency of LLM requests on a cold vs a warm (pooled) connection
+
+Usage:
+    python -m benchmarks.llm_keepalive [--calls 50] [--url URL]
+
+Without --url a local keep-alive HTTP server answering like Gemini is
+started, which isolates connection setup cost from model latency. Point
+--url at a real HTTPS endpoint to include the TLS handshake.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_pool import PooledClient
+
+REPLY = json.dumps(
+    {"candidates": [{"content": {"parts": [{"text": "{}"}]}}]}
+).encode()
+
+
+class _GeminiLikeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _time_calls(calls, send):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        send()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{label:<8} mean {statistics.mean(samples):7.2f} ms  "
+        f"p50 {statistics.median(samples):7.2f} ms  p95 {p95:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--url", help="endpoint to POST to (default: local stub)")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _GeminiLikeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/generateContent"
+
+    payload = {"contents": [{"parts": [{"text": "ping"}]}]}
+
+    # Cold: a fresh connection per call, as plain requests.post does
+    cold = _time_calls(args.calls, lambda: requests.post(url, json=payload, timeout=30))
+
+    # Warm: pooled keep-alive client, first call excluded as connection setup
+    client = PooledClient()
+    client.post(url, json=payload)
+    warm = _time_calls(args.calls, lambda: client.post(url, json=payload))
+    client.close()
+
+    print(f"{args.calls} calls to {url}")
+    _report("cold", cold)
+    _report("warm", warm)
+    print(f"speedup  {statistics.mean(cold) / statistics.mean(warm):.2f}x")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
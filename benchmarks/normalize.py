@@ -0,0 +1,95 @@
+"""
+Date/time normalization: fuzzy dateutil vs precompiled patterns vs memo
+
+Usage:
+    python -m benchmarks.normalize [--repeat 2000]
+
+"dateutil" is the parsing scheduler_bot used before normalize.py: a fuzzy
+dateutil parse with a weekday-name fallback for dates, and a fuzzy parse
+for times. "patterns" calls normalize.py with its memo bypassed, so every
+call pays for matching (and the dateutil fallback on unusual input);
+"memo" is the steady state where each string was seen before. Wherever
+the old parser understood an input, both must give the same answer,
+which is checked first.
+"""
+import argparse
+import calendar
+import time
+from datetime import date, datetime, timedelta
+
+from dateutil import parser as date_parser
+
+import normalize
+
+TODAY = date(2030, 1, 2)
+
+DATES = [
+    "2030-01-15", "tomorrow", "today", "Friday", "monday", "next tuesday", "on Thursday",
+    "Jan 20", "20th of January", "March 3rd", "Sat", "the 3rd of next month",
+]
+TIMES = ["3 PM", "3:30 pm", "10 AM", "15:30", "9:00", "noon", "at 4 pm", "around 2 PM"]
+
+
+def legacy_date(value, today=TODAY):
+    try:
+        dt = date_parser.parse(value, fuzzy=True, default=datetime.combine(today, datetime.min.time()))
+        return dt.date().isoformat()
+    except Exception:
+        try:
+            target_weekday = list(calendar.day_name).index(value.capitalize())
+            days_ahead = (target_weekday - today.weekday() + 7) % 7 or 7
+            return (today + timedelta(days=days_ahead)).isoformat()
+        except ValueError:
+            return None
+
+
+def legacy_time(value):
+    try:
+        parsed = date_parser.parse(value, fuzzy=True)
+    except Exception:
+        return None
+    return parsed.hour, parsed.minute
+
+
+def per_call_us(fn, inputs, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for value in inputs:
+            fn(value)
+    return (time.perf_counter() - started) / (repeat * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    for value in DATES:
+        old, new = legacy_date(value), normalize.normalize_date(value, TODAY)
+        assert old is None or old == new, (value, old, new)
+    for value in TIMES:
+        old, new = legacy_time(value), normalize.parse_time(value)
+        assert old is None or old == new, (value, old, new)
+    print("check: patterns agree with dateutil wherever dateutil understood the input\n")
+
+    uncached_date = normalize._normalize_date.__wrapped__
+    uncached_time = normalize._parse_time.__wrapped__
+    cases = {
+        "date": (
+            lambda v: legacy_date(v),
+            lambda v: uncached_date(v.strip().lower(), TODAY),
+            lambda v: normalize.normalize_date(v, TODAY),
+            DATES,
+        ),
+        "time": (legacy_time, lambda v: uncached_time(v.strip().lower()), normalize.parse_time, TIMES),
+    }
+    print(f"{'kind':<6} {'dateutil us':>12} {'patterns us':>12} {'memo us':>9} {'speedup':>8}")
+    for kind, (old, patterns, memo, inputs) in cases.items():
+        old_us = per_call_us(old, inputs, max(args.repeat // 10, 1))
+        pattern_us = per_call_us(patterns, inputs, args.repeat)
+        memo_us = per_call_us(memo, inputs, args.repeat)
+        print(f"{kind:<6} {old_us:>12.1f} {pattern_us:>12.1f} {memo_us:>9.2f} {old_us / memo_us:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
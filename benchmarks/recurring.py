@@ -0,0 +1,124 @@
+"""
+Recurring meeting: one series check and insert vs. one per occurrence
+
+Usage:
+    python -m benchmarks.recurring [--occurrences 52] [--busy 40]
+        [--calendar-latency 0.08]
+
+A fake calendar is seeded with --busy meetings, some on the series'
+dates. A weekly series of --occurrences meetings is then booked:
+
+per-occurrence  A freebusy query for each occurrence, then an insert for
+                each free one (what create_meeting in a loop does).
+series          recurring.schedule_recurring: one busy fetch for the
+                whole span, then one recurring insert (with the
+                conflicting dates as EXDATEs).
+
+Both must find the same conflicts, and afterwards the fake's freebusy
+must show every booked occurrence as busy.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fakes import FakeCalendarService
+from calendar_mirror import MIRRORS
+from google_calendar import FREEBUSY_CACHE, build_event_body, fetch_busy_index, insert_event
+from intervals import BusyIndex
+from recurring import expand_occurrences, schedule_recurring
+
+RULE = "FREQ=WEEKLY;BYDAY=TU;COUNT={count}"
+
+
+def seed(fake, rng, first_start, occurrences, busy):
+    """Random meetings over the series' span, a few of them on series dates."""
+    weeks = occurrences + 1
+    for i in range(busy):
+        if i % 8 == 0:
+            start = first_start + timedelta(weeks=rng.randrange(occurrences), minutes=rng.choice((-15, 0, 15)))
+        else:
+            start = first_start + timedelta(days=rng.randrange(weeks * 7), hours=rng.randrange(-6, 3))
+        fake.add_busy(start.isoformat(), (start + timedelta(minutes=30)).isoformat())
+
+
+def per_occurrence(fake, occurrences):
+    """Check and book each occurrence on its own; returns conflicting indexes."""
+    conflicts = []
+    for i, (start, end) in enumerate(occurrences):
+        busy = fetch_busy_index(fake, start.isoformat(), end.isoformat(), use_cache=False)
+        if busy.overlaps(start, end):
+            conflicts.append(i)
+    for i, (start, end) in enumerate(occurrences):
+        if i not in conflicts:
+            insert_event(fake, build_event_body(start, end, "1:1"))
+    return conflicts
+
+
+def busy_on_fake(fake, occurrences):
+    result = fake._freebusy({
+        "timeMin": occurrences[0][0].isoformat(),
+        "timeMax": occurrences[-1][1].isoformat(),
+        "items": [{"id": "primary"}],
+    })
+    return BusyIndex.from_freebusy(result["calendars"]["primary"]["busy"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--occurrences", type=int, default=52)
+    parser.add_argument("--busy", type=int, default=40)
+    parser.add_argument("--calendar-latency", type=float, default=0.08)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    # Next Tuesday, 15:00 UTC
+    today = datetime.now(timezone.utc).replace(hour=15, minute=0, second=0, microsecond=0)
+    first_start = today + timedelta(days=(1 - today.weekday()) % 7 or 7)
+    rule = RULE.format(count=args.occurrences)
+    occurrences = expand_occurrences(first_start, first_start + timedelta(minutes=30), rule)
+    MIRRORS.clear()
+
+    fakes, rows = [], []
+    for mode in ("per-occurrence", "series"):
+        fake = FakeCalendarService(latency=args.calendar_latency, seed=args.seed)
+        seed(fake, random.Random(args.seed), first_start, args.occurrences, args.busy)
+        FREEBUSY_CACHE.invalidate()
+        started = time.perf_counter()
+        if mode == "per-occurrence":
+            conflicts = per_occurrence(fake, occurrences)
+        else:
+            result = schedule_recurring(fake, {
+                "start": first_start.isoformat(), "duration_minutes": 30, "rrule": rule,
+                "summary": "1:1", "skip_conflicts": True,
+            })
+            assert result["status"] == "created", result
+            conflicts = [c["index"] for c in result["conflicts"]]
+        elapsed = time.perf_counter() - started
+        fakes.append(fake)
+        rows.append((mode, elapsed, fake.calls["freebusy"], fake.calls["insert"], conflicts))
+
+    print(f"{args.occurrences} weekly occurrences, {args.busy} existing meetings, "
+          f"{args.calendar_latency * 1000:.0f} ms per Calendar call\n")
+    print(f"{'mode':<16} {'seconds':>8} {'freebusy':>9} {'inserts':>8} {'conflicts':>10}")
+    for mode, elapsed, freebusy, inserts, conflicts in rows:
+        print(f"{mode:<16} {elapsed:>8.2f} {freebusy:>9} {inserts:>8} {len(conflicts):>10}")
+
+    (_, naive_s, _, _, naive_conflicts), (_, series_s, freebusy, inserts, series_conflicts) = rows
+    assert series_conflicts == naive_conflicts, (series_conflicts, naive_conflicts)
+    assert naive_conflicts, "seed some conflicts to make the check meaningful"
+    assert (freebusy, inserts) == (1, 1), (freebusy, inserts)
+
+    # Every booked occurrence is busy on the calendar itself, the skipped ones untouched
+    for fake in fakes:
+        busy = busy_on_fake(fake, occurrences)
+        assert all(busy.overlaps(start, end) for start, end in occurrences)
+    series_events = [e for e in fakes[1].events_by_calendar["primary"].values() if e.get("recurrence")]
+    assert len(series_events) == 1
+    print(f"\nseries: {args.occurrences} occurrences checked in 1 round trip, "
+          f"{naive_s / series_s:.0f}x faster; conflicts match")
+    FREEBUSY_CACHE.invalidate()
+
+
+if __name__ == "__main__":
+    main()
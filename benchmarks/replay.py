@@ -0,0 +1,237 @@
+"""
+Replay recorded conversations against the scheduler and diff the replies
+
+Usage:
+    python -m benchmarks.replay TRAFFIC.jsonl [--target app|process]
+        [--backend stub|live] [--speed 1] [--concurrency 8]
+        [--baseline FILE] [--output FILE] [--mask-dates]
+        [--llm-latency 0.4] [--calendar-latency 0.08]
+
+TRAFFIC.jsonl is what the app writes when RECORD_TRAFFIC_PATH is set (see
+traffic_log.py), or a hand-written file in the same format. Turns of one
+session are replayed in order; different sessions run concurrently.
+``--speed`` scales the recorded inter-arrival times (2 replays twice as
+fast, 0 sends every turn as soon as the previous one in its session has
+finished).
+
+``--target app`` drives the Flask app's /process endpoint; ``--target
+process`` calls scheduler_bot.process_request directly. ``--backend stub``
+uses the fake Calendar service and stub Gemini server from
+benchmarks/fakes.py; ``--backend live`` uses the configured credentials and
+GOOGLE_API_KEY, and creates real events.
+
+Replies are compared with those in ``--baseline`` (a previous ``--output``)
+or, failing that, the replies recorded in TRAFFIC.jsonl. Links and ids
+always differ between runs and are masked; ``--mask-dates`` also masks
+dates and times, for traffic recorded on another day.
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.e2e import StageTimer, report
+from traffic_log import read_traffic
+
+# Turns starting later than this behind schedule are reported
+LATE_TOLERANCE = 0.05
+
+_MASKS = [
+    (re.compile(r"https?://\S+"), "<url>"),
+    (re.compile(r"\b[0-9a-f]{16,}\b"), "<id>"),
+]
+_DATE_MASKS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}(?:T[\d:.]+(?:Z|[+-]\d{2}:\d{2})?)?"), "<date>"),
+    (re.compile(r"\b\d{1,2}:\d{2}(?:\s*[AP]M)?", re.IGNORECASE), "<time>"),
+]
+
+
+def mask(reply, dates=False):
+    for pattern, placeholder in _MASKS + (_DATE_MASKS if dates else []):
+        reply = pattern.sub(placeholder, reply)
+    return reply
+
+
+class Replayer:
+    """Sends one conversation's turns to the target, paced by their timestamps"""
+
+    def __init__(self, send, origin, speed, timer):
+        self.send = send
+        self.origin = origin
+        self.speed = speed
+        self.timer = timer
+        self.started = None
+        self._lock = threading.Lock()
+        self.late = []
+
+    def run(self, conversation):
+        results = []
+        for turn in conversation:
+            if self.speed > 0 and "ts" in turn:
+                due = self.started + (turn["ts"] - self.origin) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -LATE_TOLERANCE:
+                    with self._lock:
+                        self.late.append(-delay)
+            started = time.perf_counter()
+            reply = self.send(turn["session"], turn["message"])
+            seconds = time.perf_counter() - started
+            self.timer.add("process", seconds)
+            results.append({
+                "ts": turn.get("ts"),
+                "session": turn["session"],
+                "message": turn["message"],
+                "reply": reply,
+                "latency_ms": round(seconds * 1000, 1),
+            })
+        return results
+
+
+def app_sender(flask_app):
+    clients = threading.local()
+
+    def send(session_id, message):
+        # One client per thread; the session travels in the header so a
+        # conversation keeps its state wherever its turns run
+        if not hasattr(clients, "client"):
+            clients.client = flask_app.test_client()
+        response = clients.client.post(
+            "/process", json={"message": message}, headers={"X-Session-Id": f"replay-{session_id}"}
+        )
+        return response.get_json()["reply"]
+    return send
+
+
+def process_sender(get_service):
+    from scheduler_bot import process_request
+    from session_store import SessionStore
+
+    sessions = SessionStore()
+
+    def send(session_id, message):
+        session = sessions.get(f"replay-{session_id}")
+        with session.lock:
+            return process_request(message, get_service(), session)
+    return send
+
+
+def compare(results, expected, mask_dates, show):
+    """Print how many replies match ``expected`` and the first few diffs."""
+    expected = {(t["session"], i): t.get("reply") for t, i in _numbered(expected)}
+    compared, differing = 0, []
+    for turn, i in _numbered(results):
+        before = expected.get((turn["session"], i))
+        if before is None:
+            continue
+        compared += 1
+        if mask(before, mask_dates) != mask(turn["reply"], mask_dates):
+            differing.append((turn, before))
+
+    if not compared:
+        print("\nno recorded replies to compare against")
+        return
+    print(f"\nreplies: {compared - len(differing)}/{compared} match the baseline")
+    for turn, before in differing[:show]:
+        print(f"\n{turn['session']}: {turn['message']!r}")
+        diff = difflib.unified_diff(
+            mask(before, mask_dates).splitlines(), mask(turn["reply"], mask_dates).splitlines(),
+            "baseline", "replay", lineterm="", n=1,
+        )
+        for line in list(diff)[2:]:
+            print(f"  {line}")
+
+
+def _numbered(turns):
+    """Pair each turn with its position within its session."""
+    positions = {}
+    for turn in turns:
+        i = positions.get(turn["session"], 0)
+        positions[turn["session"]] = i + 1
+        yield turn, i
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("traffic", help="recorded traffic (JSONL)")
+    parser.add_argument("--target", choices=("app", "process"), default="app")
+    parser.add_argument("--backend", choices=("stub", "live"), default="stub")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale; 0 replays back to back")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--baseline", help="compare against this replay output instead")
+    parser.add_argument("--output", help="write the replayed turns here, in the traffic format")
+    parser.add_argument("--mask-dates", action="store_true", help="ignore dates and times in diffs")
+    parser.add_argument("--show-diffs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="stub seconds per Gemini call")
+    parser.add_argument("--calendar-latency", type=float, default=0.08, help="stub seconds per Calendar call")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    conversations = read_traffic(args.traffic)
+    timer = StageTimer()
+
+    stub = fake = None
+    if args.backend == "stub":
+        from benchmarks.fakes import FakeCalendarService, StubGeminiServer
+        stub = StubGeminiServer(latency=args.llm_latency, seed=args.seed).start()
+        fake = FakeCalendarService(latency=args.calendar_latency, seed=args.seed)
+        os.environ["GEMINI_MODEL_URL"] = stub.model_url
+        os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+    import scheduler_bot
+    scheduler_bot.chat_with_llm = timer.wrap("llm", scheduler_bot.chat_with_llm)
+
+    if args.target == "app":
+        # Replayed conversations must not land in the real sessions.db
+        os.environ.setdefault("SESSION_DB_PATH", os.path.join(tempfile.mkdtemp(), "sessions.db"))
+        import app
+        if fake is not None:
+            from calendar_service import ServicePool
+            app.service_pool = ServicePool(None, factory=lambda creds: fake)
+        send = app_sender(app.app)
+    elif fake is not None:
+        send = process_sender(lambda: fake)
+    else:
+        from calendar_service import ServicePool
+        from google_calendar import load_credentials
+        pool = ServicePool(load_credentials())
+        send = process_sender(pool.get)
+
+    origin = min((t["ts"] for c in conversations for t in c if "ts" in t), default=0)
+    replayer = Replayer(send, origin, args.speed, timer)
+    replayer.started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        replayed = list(pool.map(replayer.run, conversations))
+    elapsed = time.perf_counter() - replayer.started
+    if stub is not None:
+        stub.stop()
+        for op in ("freebusy", "insert"):
+            timer.samples[op] = fake.timings[op]
+
+    turns = [turn for conversation in replayed for turn in conversation]
+    report(timer, elapsed, len(replayed), len(turns))
+    if replayer.late:
+        print(f"\n{len(replayer.late)} turns started late (max {max(replayer.late) * 1000:.0f} ms); "
+              f"raise --concurrency or lower --speed")
+
+    if args.baseline:
+        expected = [turn for conversation in read_traffic(args.baseline) for turn in conversation]
+    else:
+        expected = [turn for conversation in conversations for turn in conversation]
+    compare(turns, expected, args.mask_dates, args.show_diffs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for turn in sorted(turns, key=lambda t: t["ts"] or 0):
+                f.write(json.dumps(turn) + "\n")
+        print(f"\nwrote {len(turns)} turns to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Retries, circuit breaking and idempotent inserts against flaky backends
+
+Usage:
+    python -m benchmarks.resilience [--calls 200] [--failure-rate 0.2]
+        [--lost-write-rate 0.1] [--concurrency 8]
+
+Three scenarios, each run as the app behaved before and with the
+resilience layer:
+
+  gemini    chat_with_llm against a stub returning 503 at --failure-rate;
+            counts calls that surfaced an error to the user.
+  insert    create_meeting for distinct meetings while Calendar fails
+            round trips at --failure-rate and loses the response of
+            --lost-write-rate of the inserts it did store. The caller
+            tries each meeting up to 4 times, as a user resubmitting
+            would; duplicates are extra events for one meeting. The
+            "before" side inserts without a client-chosen event ID.
+  outage    Calendar failing every call; counts the requests that still
+            reach it and the time callers spend, retrying with and
+            without the circuit breaker.
+
+Backoff delays are scaled down so the run takes seconds.
+"""
+import argparse
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import resilience
+from benchmarks.fakes import FakeCalendarService, StubGeminiServer
+
+USER_ATTEMPTS = 4
+
+
+def reset(max_attempts, threshold=10 ** 9):
+    resilience.RETRY_MAX_ATTEMPTS = max_attempts
+    for breaker in resilience.BREAKERS.values():
+        breaker.failure_threshold = threshold
+        breaker.record_success()
+
+
+def gemini_scenario(args, max_attempts):
+    import llm
+
+    reset(max_attempts)
+    stub = StubGeminiServer(failure_rate=args.failure_rate, seed=args.seed).start()
+    os.environ["GEMINI_MODEL_URL"] = stub.model_url
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+    def one(_):
+        try:
+            llm.chat_with_llm("User input: 30 minutes tomorrow at 3pm")
+            return True
+        except RuntimeError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        ok = sum(pool.map(one, range(args.calls)))
+    stub.stop()
+    return {"user errors": args.calls - ok, "backend calls": stub.calls}
+
+
+def legacy_create(service, start, end, summary):
+    """create_meeting's insert before idempotent IDs: no ID, no retries."""
+    from google_calendar import build_event_body, meeting_links
+
+    body = build_event_body(start, end, summary)
+    return meeting_links(service.events().insert(calendarId='primary', body=body).execute())
+
+
+def insert_scenario(args, max_attempts, idempotent):
+    import google_calendar
+
+    reset(max_attempts)
+    fake = FakeCalendarService(
+        failure_rate=args.failure_rate, lost_write_rate=args.lost_write_rate, seed=args.seed
+    )
+    base = datetime(2030, 1, 7, 9, tzinfo=timezone.utc)
+
+    def book(n):
+        start = base + timedelta(hours=n)
+        end = start + timedelta(minutes=30)
+        summary = f"Meeting {n}"
+        for _ in range(USER_ATTEMPTS):
+            if idempotent:
+                if google_calendar.create_meeting(service=fake, start=start.isoformat(),
+                                                  end=end.isoformat(), summary=summary):
+                    return True
+            else:
+                try:
+                    legacy_create(fake, start, end, summary)
+                    return True
+                except Exception:
+                    pass
+        return False
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        booked = sum(pool.map(book, range(args.calls)))
+    per_meeting = Counter(e["summary"] for e in fake.events_by_calendar["primary"].values())
+    return {
+        "not booked": args.calls - booked,
+        "duplicates": sum(count - 1 for count in per_meeting.values()),
+        "backend calls": sum(fake.calls.values()),
+    }
+
+
+def outage_scenario(args, max_attempts, breaker):
+    import google_calendar
+
+    reset(max_attempts, threshold=resilience.BREAKER_FAILURE_THRESHOLD if breaker else 10 ** 9)
+    fake = FakeCalendarService(latency=0.002, failure_rate=1.0, seed=args.seed)
+    started = time.perf_counter()
+
+    def one(_):
+        try:
+            google_calendar.fetch_busy_index(
+                fake, "2030-01-07T00:00:00+00:00", "2030-01-08T00:00:00+00:00", use_cache=False
+            )
+        except Exception:
+            pass
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.calls)))
+    return {
+        "backend calls": fake.calls["freebusy"],
+        "caller seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--lost-write-rate", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Every retry and failure would otherwise be logged
+    logging.disable(logging.CRITICAL)
+    resilience.RETRY_BASE_DELAY = 0.005
+    resilience.RETRY_MAX_DELAY = 0.05
+    attempts = resilience.RETRY_MAX_ATTEMPTS
+
+    rows = [
+        ("gemini", "single attempt", gemini_scenario(args, 1)),
+        ("gemini", f"retry x{attempts}", gemini_scenario(args, attempts)),
+        ("insert", "before", insert_scenario(args, 1, idempotent=False)),
+        ("insert", f"idempotent + retry x{attempts}", insert_scenario(args, attempts, idempotent=True)),
+        ("outage", "retries, no breaker", outage_scenario(args, attempts, breaker=False)),
+        ("outage", "retries + breaker", outage_scenario(args, attempts, breaker=True)),
+    ]
+    print(f"{args.calls} calls per scenario, failure rate {args.failure_rate}, "
+          f"lost writes {args.lost_write_rate}\n")
+    for scenario, mode, result in rows:
+        detail = ", ".join(f"{key} {value}" for key, value in result.items())
+        print(f"{scenario:<7} {mode:<28} {detail}")
+
+    assert rows[3][2]["duplicates"] == 0, "idempotent inserts created duplicates"
+
+
+if __name__ == "__main__":
+    main()
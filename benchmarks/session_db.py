@@ -0,0 +1,214 @@
+"""
+Per-turn cost of persisting conversations in SQLite (session_db.py)
+
+Usage:
+    python -m benchmarks.session_db [--sessions 500] [--turns 20000] [--threads 8]
+
+A "turn" is what /process does around process_request: look the session
+up (plus a version check against the database), change its state, and
+save it. Rows are compared for the in-memory store, the SQLite store
+with its write buffer, and a naive variant committing every save on its
+own. Also measured: loading every conversation back after a restart, and
+two processes writing one database file at the same time. The batched
+store must add less than 1 ms per turn.
+
+Two failure cases are checked as well. While another process holds the
+database write lock for longer than the busy timeout, lookups must not
+wait for it (nor for a prune running into it) and the buffered turn must
+still be written afterwards. When
+two processes save the same version of a conversation, the second must
+be told and reload the first one's state instead of overwriting it.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import session_db
+from session_db import SessionDB
+from session_store import SessionStore
+
+BUDGET_MS = 1.0
+
+
+class UnbufferedDB(SessionDB):
+    """SessionDB committing each save in its own transaction."""
+
+    def save_session(self, session):
+        super().save_session(session)
+        self.flush()
+
+
+def turn(store, session_id, n):
+    session = store.get(session_id)
+    with session.lock:
+        session.state["duration_minutes"] = 30 + n % 4 * 15
+        session.state["time_pref"] = f"{9 + n % 8}:00"
+        session.suggested_dates = [{"date": "2030-01-0%d" % (n % 9 + 1), "formatted": "Tuesday"}]
+    store.save(session)
+
+
+def run_turns(store, args):
+    ids = [f"session-{i}" for i in range(args.sessions)]
+    samples = []
+
+    def worker(offset):
+        local = []
+        for n in range(offset, args.turns, args.threads):
+            started = time.perf_counter()
+            turn(store, ids[n % len(ids)], n)
+            local.append(time.perf_counter() - started)
+        return local
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for local in pool.map(worker, range(args.threads)):
+            samples.extend(local)
+    elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def write_from_process(path, prefix, count):
+    db = SessionDB(path, flush_seconds=0.005)
+    store = SessionStore(db=db)
+    for n in range(count):
+        turn(store, f"{prefix}-{n % 50}", n)
+    db.close()
+
+
+def locked_writer(path):
+    """
+    Hold the write lock past the busy timeout while this process keeps working
+
+    Returns:
+        (slowest lookup in ms, failed flushes, whether the buffered turn landed)
+    """
+    db = SessionDB(path, flush_seconds=0.005)
+    store = SessionStore(db=db)
+    turn(store, "cached", 0)
+    db.flush()
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    # Prune on every flush, so it too runs into the lock
+    prune_every, session_db.PRUNE_EVERY_SECONDS = session_db.PRUNE_EVERY_SECONDS, 0
+    turn(store, "buffered", 1)
+    slowest = 0.0
+    deadline = time.monotonic() + session_db.BUSY_TIMEOUT_SECONDS * 2.5
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        store.get("cached")
+        store.get(f"fresh-{slowest}")
+        slowest = max(slowest, time.perf_counter() - started)
+        time.sleep(0.01)
+    other.execute("ROLLBACK")
+    other.close()
+    session_db.PRUNE_EVERY_SECONDS = prune_every
+    failed = db.failed_flushes
+    # Polled before close(), which would flush synchronously
+    landed = False
+    deadline = time.monotonic() + 5
+    with sqlite3.connect(path) as check:
+        while not landed and time.monotonic() < deadline:
+            time.sleep(0.01)
+            landed = check.execute("SELECT count(*) FROM sessions WHERE session_id = 'buffered'").fetchone()[0]
+    db.close()
+    return slowest * 1000, failed, bool(landed)
+
+
+def same_version_conflict(path):
+    """Two stores (as two processes would) both save version N+1 of one conversation."""
+    first_db, second_db = SessionDB(path), SessionDB(path)
+    first, second = SessionStore(db=first_db), SessionStore(db=second_db)
+    turn(first, "shared", 0)
+    first_db.flush()
+    a, b = first.get("shared"), second.get("shared")
+    a.state["time_pref"], b.state["time_pref"] = "first", "second"
+    first.save(a)
+    first_db.flush()
+    second.save(b)
+    second_db.flush()
+    kept = SessionStore(db=SessionDB(path)).get("shared").state["time_pref"]
+    refreshed = second.get("shared").state["time_pref"]
+    first_db.close()
+    second_db.close()
+    return kept, refreshed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp()
+
+    rows = []
+    stores = [("memory", None)]
+    stores.append(("sqlite batched", SessionDB(os.path.join(workdir, "batched.db"))))
+    stores.append(("sqlite per save", UnbufferedDB(os.path.join(workdir, "unbuffered.db"))))
+    baseline_us = None
+    for name, db in stores:
+        samples, elapsed = run_turns(SessionStore(db=db), args)
+        if db is not None:
+            db.flush()
+        mean_us = statistics.mean(samples) * 1e6
+        baseline_us = mean_us if baseline_us is None else baseline_us
+        rows.append((name, mean_us, percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6,
+                     args.turns / elapsed, db.flushes if db else 0))
+
+    print(f"{args.turns} turns over {args.sessions} sessions, {args.threads} threads\n")
+    print(f"{'store':<16} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'turns/s':>9} {'commits':>8} {'added us':>9}")
+    for name, mean_us, p50, p99, rate, commits in rows:
+        print(f"{name:<16} {mean_us:>9.1f} {p50:>9.1f} {p99:>9.1f} {rate:>9.0f} {commits:>8} "
+              f"{mean_us - baseline_us:>9.1f}")
+
+    batched = stores[1][1]
+    batched.close()
+    reopened = SessionDB(batched.path)
+    store = SessionStore(db=reopened)
+    started = time.perf_counter()
+    restored = sum(store.get(f"session-{i}").state["duration_minutes"] is not None for i in range(args.sessions))
+    load_us = (time.perf_counter() - started) / args.sessions * 1e6
+    print(f"\nafter restart: {restored}/{args.sessions} conversations restored, {load_us:.1f} us each")
+    reopened.close()
+
+    shared = os.path.join(workdir, "shared.db")
+    SessionDB(shared).close()
+    processes = [
+        multiprocessing.Process(target=write_from_process, args=(shared, f"p{i}", 2000)) for i in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    with sqlite3.connect(shared) as db:
+        count = db.execute("SELECT count(*) FROM sessions").fetchone()[0]
+    print(f"two processes, one file: {count}/100 conversations stored, "
+          f"exit codes {[p.exitcode for p in processes]}")
+
+    session_db.BUSY_TIMEOUT_SECONDS = 0.2
+    slowest_ms, failed, landed = locked_writer(os.path.join(workdir, "locked.db"))
+    print(f"write lock held elsewhere for {session_db.BUSY_TIMEOUT_SECONDS * 2.5:.1f} s: slowest lookup "
+          f"{slowest_ms:.1f} ms, {failed} failed flushes, buffered turn written afterwards: {landed}")
+    kept, refreshed = same_version_conflict(os.path.join(workdir, "conflict.db"))
+    print(f"same version saved twice: database keeps {kept!r}, the other process reloads {refreshed!r}")
+
+    added_ms = (rows[1][1] - baseline_us) / 1000
+    assert restored == args.sessions and count == 100
+    assert slowest_ms < 100 and failed and landed
+    assert kept == refreshed == "first"
+    assert added_ms < BUDGET_MS, f"persistence adds {added_ms:.3f} ms per turn"
+
+
+if __name__ == "__main__":
+    main()
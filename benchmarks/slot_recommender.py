@@ -0,0 +1,180 @@
+"""
+Nearest-alternative recommendations: correctness, speed and turns saved
+
+Usage:
+    python -m benchmarks.slot_recommender [--trials 40] [--density 0.7] [--seed 3]
+
+correctness  On random calendars, every recommended slot is free, inside
+             working hours and before the deadline, the alternatives are
+             distinct free gaps, and the best one scores no worse than any
+             grid-aligned start found by brute force.
+speed        Time to rank a two-week horizon of a busy calendar.
+turns        A 3 pm request on a day that is --density booked, through
+             process_request against a fake Calendar. "before" is a user
+             retrying other working hours (4 pm, 2 pm, 1 pm, ...) and then the
+             following days until one is free, as they had to when the bot
+             only said the time was taken; "after" picks option 1 of the
+             offered alternatives.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("SESSION_DB_PATH", "")
+
+import scheduler_bot
+import slot_recommender
+from benchmarks.fakes import FakeCalendarService
+from google_calendar import FREEBUSY_CACHE
+from intervals import BusyIndex, merge_sorted, parse_iso
+from scheduler_bot import process_request
+from session_store import Session
+
+WORKING = slot_recommender.WorkingHours((9, 0), (17, 0), range(5))
+STEP = 15
+
+
+def random_busy(rng, first_day, days, density):
+    """Busy blocks on the quarter-hour covering about ``density`` of working hours."""
+    busy = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for quarter in range(9 * 4, 17 * 4):
+            if rng.random() < density:
+                start = day + timedelta(minutes=15 * quarter)
+                busy.append((start, start + timedelta(minutes=15)))
+    return merge_sorted(sorted(busy))
+
+
+def brute_best(index, preferred, duration_minutes, deadline, now):
+    window_start, window_end = slot_recommender.search_window(preferred, duration_minutes, deadline, now)
+    duration = timedelta(minutes=duration_minutes)
+    context = (preferred, duration, slot_recommender._deadline_end(deadline, preferred.tzinfo))
+    best = None
+    for span_start, span_end in WORKING.spans(window_start, window_end):
+        for gap in index.free_slots(span_start, span_end, duration_minutes):
+            gap_start, gap_end = parse_iso(gap["start"]), parse_iso(gap["end"])
+            start = span_start.replace(minute=0)
+            while start + duration <= gap_end:
+                if start >= gap_start:
+                    score = slot_recommender._score(start, gap_start, gap_end, context)
+                    best = score if best is None else min(best, score)
+                start += timedelta(minutes=STEP)
+    return best
+
+
+def check_correctness(rng, rounds=300):
+    now = datetime(2030, 1, 6, 12, tzinfo=timezone.utc)
+    for _ in range(rounds):
+        density = rng.uniform(0.2, 0.95)
+        busy = random_busy(rng, datetime(2030, 1, 6, tzinfo=timezone.utc), 21, density)
+        index = BusyIndex.from_merged(busy)
+        preferred = datetime(2030, 1, 6 + rng.randrange(1, 10), rng.randrange(8, 18), tzinfo=timezone.utc)
+        duration = rng.choice((15, 30, 45, 60, 90))
+        deadline = (preferred + timedelta(days=rng.randrange(0, 6))).date() if rng.random() < 0.5 else None
+        slots = slot_recommender.recommend_slots(
+            index, preferred, duration, deadline, now, working_hours=WORKING, step_minutes=STEP, k=3
+        )
+        deadline_end = slot_recommender._deadline_end(deadline, timezone.utc)
+        for slot in slots:
+            start, end = parse_iso(slot["start"]), parse_iso(slot["end"])
+            assert not index.overlaps(start, end), slot
+            assert start >= now and (deadline_end is None or end <= deadline_end), slot
+            assert start.weekday() < 5 and (9, 0) <= (start.hour, start.minute), slot
+            assert (end.hour, end.minute) <= (17, 0) or end.date() > start.date(), slot
+        # One alternative per free gap: two on one day have a meeting between them
+        for i, a in enumerate(slots):
+            for b in slots[i + 1:]:
+                lo, hi = sorted((parse_iso(a["start"]), parse_iso(b["start"])))
+                assert lo.date() != hi.date() or index.overlaps(lo, hi), (a, b)
+        brute = brute_best(index, preferred, duration, deadline, now)
+        if brute is None:
+            continue
+        assert slots and slots[0]["score"] <= round(brute, 2) + 1e-9, (slots[0], brute)
+
+
+def bench_speed(rng, repeats=200):
+    now = datetime(2030, 1, 6, 12, tzinfo=timezone.utc)
+    index = BusyIndex.from_merged(random_busy(rng, datetime(2030, 1, 1, tzinfo=timezone.utc), 30, 0.7))
+    preferred = datetime(2030, 1, 14, 15, tzinfo=timezone.utc)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        slot_recommender.recommend_slots(index, preferred, 30, None, now, working_hours=WORKING)
+    return (time.perf_counter() - started) / repeats * 1000, len(index)
+
+
+def say(service, session, message):
+    return process_request(message, service, session)
+
+
+def guesses(day):
+    for hour in (16, 14, 13, 12, 11, 10, 9):
+        yield day, hour
+    for later in range(1, 14):
+        yield day + timedelta(days=later), 15
+
+
+def conversation(rng, density, alternatives):
+    FREEBUSY_CACHE.invalidate()
+    fake = FakeCalendarService()
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    day = today + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    for start, end in random_busy(rng, day, 15, density):
+        fake.add_busy(start.isoformat(), end.isoformat())
+    fake.add_busy(day.replace(hour=15).isoformat(), day.replace(hour=15, minute=30).isoformat())
+    session = Session("benchmark")
+
+    turns = 1
+    reply = say(fake, session, f"30 minutes on {day.date().isoformat()} at 3:00 PM")
+    if alternatives:
+        if "closest free times" in reply:
+            turns += 1
+            reply = say(fake, session, "option 1")
+    else:
+        attempts = guesses(day)
+        while not reply.startswith("Meeting scheduled"):
+            try:
+                guess_day, hour = next(attempts)
+            except StopIteration:
+                break
+            turns += 1
+            reply = say(fake, session, f"30 minutes on {guess_day.date().isoformat()} at {hour}:00")
+    return reply.startswith("Meeting scheduled"), turns, fake.calls["freebusy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=40)
+    parser.add_argument("--density", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    check_correctness(random.Random(args.seed))
+    print("correctness: ok")
+    ms, intervals = bench_speed(random.Random(args.seed))
+    print(f"speed: {ms:.2f} ms to rank a 2-week horizon ({intervals} busy intervals)\n")
+
+    print(f"{'flow':<8} {'booked':>7} {'turns mean':>11} {'turns max':>10} {'freebusy calls':>15}")
+    results = {}
+    for name, alternatives in (("before", False), ("after", True)):
+        # "before" replies as the bot used to: just "that time is taken"
+        scheduler_bot.suggest_alternatives = (
+            slot_recommender.suggest_alternatives if alternatives else lambda *args, **kwargs: []
+        )
+        rng = random.Random(args.seed)
+        runs = [conversation(rng, args.density, alternatives) for _ in range(args.trials)]
+        results[name] = runs
+        print(f"{name:<8} {sum(ok for ok, _, _ in runs):>7} "
+              f"{statistics.mean(t for _, t, _ in runs):>11.2f} {max(t for _, t, _ in runs):>10} "
+              f"{statistics.mean(c for _, _, c in runs):>15.2f}")
+
+    assert all(ok and turns <= 2 for ok, turns, _ in results["after"]), "an alternative did not book in two turns"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Web worker startup cost: import time, time to first response and memory
+
+Usage:
+    python -m benchmarks.startup [--runs 5]
+
+Every run starts a fresh interpreter that imports app and serves GET /
+through the Flask test client, which is what a gunicorn worker does when
+it boots. GOOGLE_API_KEY is removed from the child environment to show the
+app starts without it. The "eager" profile also imports what startup used
+to load up front (the voice stack and the Google API client), for
+comparison. Reported figures are medians over the runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+{preload}
+import app
+imported = time.perf_counter()
+app.app.test_client().get("/")
+served = time.perf_counter()
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "boot_ms": (served - started) * 1000,
+    "rss_mb": rss_kb / 1024,
+    "modules": len(sys.modules),
+}}))
+"""
+
+PROFILES = {
+    "lazy": "",
+    "eager": "import voice, googleapiclient.discovery, google_auth_oauthlib.flow",
+}
+
+
+def run_child(preload):
+    env = dict(os.environ)
+    env.pop("GOOGLE_API_KEY", None)
+    env.setdefault("SESSION_DB_PATH", os.path.join(tempfile.mkdtemp(), "sessions.db"))
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(preload=preload)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'profile':<8} {'import ms':>10} {'boot ms':>9} {'RSS MB':>8} {'modules':>8}")
+    for name, preload in PROFILES.items():
+        try:
+            runs = [run_child(preload) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<8} skipped: {e}")
+            continue
+        median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        print(
+            f"{name:<8} {median['import_ms']:>10.1f} {median['boot_ms']:>9.1f} "
+            f"{median['rss_mb']:>8.1f} {median['modules']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Background queue for Calendar event creation
+
+Inserting an event with a Meet link is the slowest Calendar call we make.
+With the queue, /process resolves the slot, reserves it (record_busy)
+and returns a job ID at once; the insert runs on a worker thread and
+clients poll GET /jobs/<id> until the calendar and Meet links are ready.
+
+A job gets its Calendar service from the factory it was submitted with,
+called on the worker thread, because googleapiclient services must not
+be shared between threads. Finished jobs are kept for
+JOB_RETENTION_SECONDS so late polls still find them. Jobs live in the
+process that queued them; ``on_update`` lets the app save each job's
+status where other worker processes can read it (SessionDB.save_job).
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from google_calendar import create_meeting, forget_busy
+from metrics import REGISTRY
+from scheduler_bot import BOOKING_FAILED_REPLY, booked_reply
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv("BOOKING_WORKERS", "4"))
+DEFAULT_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+DEFAULT_MAX_JOBS = 10000
+
+
+class BookingJob:
+    """One queued event insert and its outcome"""
+
+    def __init__(self, start, end, summary="Scheduled Meeting", owner=None):
+        self.id = uuid.uuid4().hex
+        self.start = start
+        self.end = end
+        self.summary = summary
+        self.owner = owner
+        self.status = "pending"
+        self.links = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        result = {
+            "job_id": self.id,
+            "status": self.status,
+            "start": self.start,
+            "end": self.end,
+            "summary": self.summary,
+        }
+        if self.links:
+            result.update(self.links)
+            result["reply"] = booked_reply(self.start, self.end, self.links)
+        if self.error:
+            result["error"] = self.error
+            result["reply"] = BOOKING_FAILED_REPLY
+        return result
+
+
+class BookingQueue:
+    """
+    Thread-pool queue of event inserts, with job status lookup
+
+    Args:
+        max_workers: Inserts in flight at once
+        retention_seconds: How long finished jobs stay queryable
+        max_jobs: Upper bound on remembered jobs (oldest finished dropped)
+        on_update: Called with (job_id, owner, job dict) when a job is
+            queued and when it finishes
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, retention_seconds=DEFAULT_RETENTION_SECONDS,
+                 max_jobs=DEFAULT_MAX_JOBS, on_update=None):
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self.on_update = on_update
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="booking")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, service_factory, start, end, summary="Scheduled Meeting", owner=None):
+        """
+        Queue an event insert
+
+        Args:
+            service_factory: Callable returning a Calendar service, called
+                on the worker thread
+            start: Start time in ISO format
+            end: End time in ISO format
+            summary: Meeting title
+            owner: Session ID allowed to look the job up
+
+        Returns:
+            The BookingJob, still pending
+        """
+        job = BookingJob(start, end, summary, owner)
+        with self._lock:
+            self._prune(time.time())
+            self._jobs[job.id] = job
+        self._publish(job)
+        self._executor.submit(self._run, job, service_factory)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def join(self, timeout=None):
+        """Wait for every job submitted so far; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            pending = [job for job in self._jobs.values() if not job.finished]
+        for job in pending:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not job.wait(remaining):
+                return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(Counter(job.status for job in self._jobs.values()))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, service_factory):
+        job.status = "running"
+        service = None
+        try:
+            service = service_factory()
+            if service is None:
+                raise RuntimeError("Calendar service is not available")
+            links = create_meeting(service, job.start, job.end, job.summary)
+            if links is None:
+                raise RuntimeError("The calendar event could not be created")
+            job.links = links
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            logger.error("Booking job %s failed: %s", job.id, e)
+            # Drop the reservation made when the job was queued
+            if service is not None:
+                forget_busy(service)
+        finally:
+            job.finished_at = time.time()
+            self._publish(job)
+            job._done.set()
+
+    def _publish(self, job):
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(job.id, job.owner, job.to_dict())
+        except Exception as e:
+            logger.error("Could not save the status of booking job %s: %s", job.id, e)
+
+    def _prune(self, now):
+        """Forget expired finished jobs, and the oldest finished ones past max_jobs."""
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            overflow = len(self._jobs) > self.max_jobs
+            if job.finished and (overflow or now - job.finished_at > self.retention_seconds):
+                del self._jobs[job_id]
+            elif not overflow:
+                break
+
+
+# Shared by the web app's request threads
+BOOKING_QUEUE = BookingQueue()
+
+
+def _collect_job_metrics():
+    stats = BOOKING_QUEUE.stats()
+    samples = [({"status": status}, stats.get(status, 0)) for status in ("pending", "running", "done", "failed")]
+    return [("scheduler_booking_jobs", "gauge", "Remembered booking jobs by status", samples)]
+
+
+REGISTRY.register_collector(_collect_job_metrics)
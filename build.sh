@@ -1,8 +1,5 @@
 #!/usr/bin/env bash
 
-# Step 1: Update apt and install portaudio
-apt-get update
-apt-get install -y portaudio19-dev
-
-# Step 2: Install Python dependencies
+# Install Python dependencies. The web app does not use the voice stack,
+# so portaudio and requirements-voice.txt are not needed here.
 pip install -r requirements.txt
@@ -0,0 +1,205 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import resilience
+from google_calendar import (
+    build_event_body,
+    existing_event,
+    fetch_busy_index,
+    idempotent_event_id,
+    meeting_links,
+    notify_meeting_created,
+    record_busy,
+)
+from intervals import BusyIndex, parse_iso
+from metrics import ERRORS, INSERT_LATENCY, RETRIES
+from resilience import http_status
+from normalize import parse_time
+from scheduler_bot import parse_date_or_day
+
+logger = logging.getLogger(__name__)
+
+# Google recommends at most 50 calls per Calendar batch request
+BATCH_MAX_REQUESTS = 50
+
+
+def resolve_slot(spec):
+    """
+    Resolve a meeting spec to (start, end) UTC datetimes
+
+    A spec gives either ``start`` (ISO timestamp) or ``date`` plus
+    ``time_pref``, and ``duration_minutes``.
+    """
+    duration = int(spec["duration_minutes"])
+    if duration <= 0:
+        raise ValueError("duration_minutes must be positive")
+
+    if spec.get("start"):
+        start_dt = parse_iso(spec["start"])
+        if start_dt.tzinfo is None:
+            start_dt = start_dt.replace(tzinfo=timezone.utc)
+    else:
+        date_str = parse_date_or_day(spec["date"])
+        if not date_str:
+            raise ValueError(f"could not understand date {spec['date']!r}")
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        preferred = parse_time(spec["time_pref"])
+        if preferred is None:
+            raise ValueError(f"could not understand time {spec['time_pref']!r}")
+        start_dt = datetime(
+            date_obj.year, date_obj.month, date_obj.day, *preferred, tzinfo=timezone.utc,
+        )
+    return start_dt, start_dt + timedelta(minutes=duration)
+
+
+def schedule_meetings(service, specs, chunk_size=BATCH_MAX_REQUESTS):
+    """
+    Book many meetings with a few batched API round trips
+
+    Every spec is resolved to a slot, checked against the other meetings
+    in the same request and against the calendar (one freebusy query
+    covering the whole span), and the conflict-free ones are inserted
+    through Calendar batch requests of up to ``chunk_size`` inserts.
+
+    Args:
+        service: Google Calendar service object
+        specs: List of dicts with duration_minutes, start or date/time_pref,
+            and optional summary, description and attendees
+
+    Returns:
+        One result dict per spec, in order, with a ``status`` of created,
+        conflict, invalid or error
+    """
+    results = [{"index": i} for i in range(len(specs))]
+    slots = {}
+
+    for i, spec in enumerate(specs):
+        try:
+            slots[i] = resolve_slot(spec)
+        except KeyError as e:
+            results[i].update(status="invalid", error=f"Missing field {e}")
+            continue
+        except (ValueError, TypeError, OverflowError) as e:
+            results[i].update(status="invalid", error=str(e))
+            continue
+        start_dt, end_dt = slots[i]
+        results[i].update(start=start_dt.isoformat(), end=end_dt.isoformat())
+
+    if not slots:
+        return results
+
+    time_min = min(start for start, _ in slots.values()).isoformat()
+    time_max = max(end for _, end in slots.values()).isoformat()
+    calendar_busy = fetch_busy_index(service, time_min, time_max)
+    if calendar_busy is None:
+        for i in slots:
+            results[i].update(status="error", error="Could not read calendar availability")
+        return results
+
+    # Earlier specs win when two requested meetings overlap each other
+    accepted = BusyIndex()
+    accepted_slots = []
+    to_create = []
+    for i, (start_dt, end_dt) in slots.items():
+        if calendar_busy.overlaps(start_dt, end_dt):
+            results[i].update(status="conflict", error="Calendar is busy at that time")
+        elif accepted.overlaps(start_dt, end_dt):
+            other = next(j for j, (s, e) in accepted_slots if s < end_dt and start_dt < e)
+            results[i].update(status="conflict", error=f"Overlaps meeting {other} in this batch")
+        else:
+            accepted.add(start_dt, end_dt)
+            accepted_slots.append((i, (start_dt, end_dt)))
+            to_create.append(i)
+
+    for offset in range(0, len(to_create), chunk_size):
+        _insert_batch(service, specs, slots, results, to_create[offset:offset + chunk_size])
+
+    return results
+
+
+def _insert_batch(service, specs, slots, results, indexes):
+    """
+    Insert the meetings at ``indexes`` with batch requests
+
+    Every event gets an idempotent ID, so parts that failed transiently
+    are simply sent again in a smaller batch (after a backoff), and a part
+    that reports 409 was created by an earlier attempt.
+    """
+    events = {}
+    for i in indexes:
+        spec = specs[i]
+        start_dt, end_dt = slots[i]
+        summary = spec.get("summary", "Scheduled Meeting")
+        events[i] = build_event_body(
+            start_dt,
+            end_dt,
+            summary,
+            spec.get("description", ""),
+            spec.get("attendees"),
+            event_id=idempotent_event_id(service, start_dt, end_dt, summary, spec.get("attendees")),
+        )
+
+    pending = list(indexes)
+    for attempt in range(resilience.RETRY_MAX_ATTEMPTS):
+        outcomes = {}
+
+        def callback(request_id, response, exception):
+            outcomes[int(request_id)] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for i in pending:
+            batch.add(
+                service.events().insert(calendarId='primary', body=events[i], conferenceDataVersion=1),
+                request_id=str(i),
+            )
+
+        logger.info("Creating %d meetings in one batch request", len(pending))
+        try:
+            with INSERT_LATENCY.time():
+                resilience.call("calendar", batch.execute)
+        except Exception as e:
+            ERRORS.inc(stage="insert")
+            logger.error("Error executing batch: %s", e)
+            for i in pending:
+                results[i].update(status="error", error=str(e))
+            return
+
+        retry, retry_after, errors = [], None, {}
+        for i in pending:
+            response, exception = outcomes.get(i, (None, RuntimeError("No response in batch")))
+            if exception is not None and http_status(exception) == 409:
+                try:
+                    response, exception = existing_event(service, events[i]), None
+                except Exception as e:
+                    exception = e
+            if exception is None:
+                links = meeting_links(response)
+                results[i].update(status="created", **links)
+                record_busy(service, *slots[i])
+                notify_meeting_created(
+                    service, results[i]["start"], results[i]["end"], events[i]["summary"], links
+                )
+                continue
+            retryable, after = resilience.classify(exception)
+            errors[i] = exception
+            if retryable:
+                retry.append(i)
+                if after is not None:
+                    retry_after = max(retry_after or 0, after)
+            else:
+                results[i].update(status="error", error=str(exception))
+
+        if not retry:
+            return
+        delay = resilience.backoff_delay(attempt, retry_after)
+        if delay is None or attempt + 1 >= resilience.RETRY_MAX_ATTEMPTS:
+            break
+        RETRIES.inc(backend="calendar")
+        logger.warning("%d batched inserts failed (%s); retrying in %.2fs", len(retry), errors[retry[0]], delay)
+        time.sleep(delay)
+        pending = retry
+
+    ERRORS.inc(stage="insert")
+    for i in retry:
+        results[i].update(status="error", error=str(errors[i]))
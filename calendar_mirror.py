@@ -0,0 +1,298 @@
+"""
+Local mirror of a calendar's busy time, kept current with sync tokens
+
+The scheduler checks the same calendar all day, and every freebusy query
+costs a round trip to Google. A CalendarMirror loads the calendar's
+events once with ``events().list`` and then applies only what changed,
+using the ``nextSyncToken`` of the previous listing. Syncs run on a
+timer (MIRROR_SYNC_SECONDS) and on demand when a read finds the data
+older than MIRROR_MAX_STALENESS. Google answers an expired sync token
+with 410 Gone, which triggers a full reload.
+
+Busy intervals are kept in a BusyIndex (sorted by start, merged), so
+``fetch_busy_index`` answers windows the mirror covers locally. It
+returns None (and the caller asks freebusy) for windows outside the
+mirrored range or when the mirror cannot be brought within its
+staleness bound.
+
+Events booked or reserved here are held in the mirror until a sync has
+had time to pick them up, so a slot never looks free between the insert
+and the next sync.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import resilience
+from intervals import BusyIndex, merge_sorted, parse_iso
+from metrics import REGISTRY
+from resilience import http_status
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_SECONDS = float(os.getenv("MIRROR_SYNC_SECONDS", "10"))
+DEFAULT_MAX_STALENESS = float(os.getenv("MIRROR_MAX_STALENESS", "30"))
+DEFAULT_HORIZON_DAYS = int(os.getenv("MIRROR_HORIZON_DAYS", "90"))
+# Locally booked or reserved intervals outlive this many sync periods
+HOLD_SYNC_PERIODS = 6
+PAGE_SIZE = 2500
+
+# Mirrors by FREEBUSY_CACHE calendar key, consulted by fetch_busy_index
+MIRRORS = {}
+
+
+def busy_interval(event):
+    """
+    The (start, end) an event blocks, as freebusy would report it
+
+    Returns:
+        Aware datetimes, or None for cancelled, transparent ("free") and
+        declined events
+    """
+    if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+        return None
+    if any(a.get("self") and a.get("responseStatus") == "declined" for a in event.get("attendees", ())):
+        return None
+    start, end = event.get("start", {}), event.get("end", {})
+    if "dateTime" in start and "dateTime" in end:
+        return parse_iso(start["dateTime"]), parse_iso(end["dateTime"])
+    if "date" in start and "date" in end:
+        # All-day events, taken as whole UTC days like the rest of the scheduler
+        return (
+            datetime.strptime(start["date"], "%Y-%m-%d").replace(tzinfo=timezone.utc),
+            datetime.strptime(end["date"], "%Y-%m-%d").replace(tzinfo=timezone.utc),
+        )
+    return None
+
+
+class CalendarMirror:
+    """
+    Busy intervals of one calendar, mirrored from events().list
+
+    Args:
+        service_factory: Callable returning a Calendar service for the
+            calling thread (syncs run on the timer thread and on request
+            threads)
+        calendar_id: Calendar to mirror
+        key: Name the mirror is registered under (cache_calendar_id)
+        sync_seconds: Interval of the background sync
+        max_staleness: Oldest data a read may be answered from, in seconds
+        horizon_days: How far ahead the full load reaches
+    """
+
+    def __init__(self, service_factory, calendar_id="primary", key=None,
+                 sync_seconds=DEFAULT_SYNC_SECONDS, max_staleness=DEFAULT_MAX_STALENESS,
+                 horizon_days=DEFAULT_HORIZON_DAYS, clock=time.monotonic):
+        self.service_factory = service_factory
+        self.calendar_id = calendar_id
+        self.key = key or calendar_id
+        self.sync_seconds = sync_seconds
+        self.max_staleness = max_staleness
+        self.horizon_days = horizon_days
+        self._clock = clock
+        self._events = {}
+        self._index = BusyIndex()
+        self._holds = []
+        self._sync_token = None
+        self._coverage = None
+        self._synced_at = None
+        self._sync_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.syncs = Counter()
+        self.reads = Counter()
+
+    # -- reads ------------------------------------------------------------
+
+    def busy_index(self, time_min, time_max):
+        """
+        BusyIndex for the window, synced first if the data is too old
+
+        Returns:
+            The index, or None if the window is outside the mirrored range
+            or fresh enough data could not be loaded
+        """
+        start, end = parse_iso(time_min), parse_iso(time_max)
+        if self.age() > self.max_staleness:
+            try:
+                self.sync(max_age=self.max_staleness)
+            except Exception as e:
+                logger.warning("Calendar mirror sync for %s failed: %s", self.key, e)
+        with self._lock:
+            coverage, index, holds = self._coverage, self._index, self._active_holds()
+        if self.age() > self.max_staleness or coverage is None or not (
+            coverage[0] <= start and end <= coverage[1]
+        ):
+            self.reads["miss"] += 1
+            return None
+        self.reads["hit"] += 1
+        if holds:
+            index = BusyIndex.from_merged(list(index))
+            for hold_start, hold_end in holds:
+                index.add(hold_start, hold_end)
+        return index
+
+    def age(self):
+        """Seconds since the last successful sync (infinite before the first)."""
+        synced_at = self._synced_at
+        return float("inf") if synced_at is None else self._clock() - synced_at
+
+    # -- local writes -----------------------------------------------------
+
+    def add_busy(self, start, end):
+        """Hold an interval booked or reserved here until syncs have caught up."""
+        expires = self._clock() + max(self.sync_seconds, 1) * HOLD_SYNC_PERIODS
+        with self._lock:
+            self._holds.append((expires, parse_iso(start), parse_iso(end)))
+
+    def invalidate(self):
+        """Drop local holds and sync again before the next read."""
+        with self._lock:
+            self._holds = []
+            self._synced_at = None
+
+    def _active_holds(self):
+        now = self._clock()
+        self._holds = [hold for hold in self._holds if hold[0] > now]
+        return [(start, end) for _, start, end in self._holds]
+
+    # -- syncing ----------------------------------------------------------
+
+    def sync(self, max_age=None):
+        """
+        Bring the mirror up to date: incremental if a sync token is held
+        and the loaded range still reaches far enough ahead, full otherwise
+
+        Args:
+            max_age: Skip the sync if another thread has meanwhile brought
+                the data within this many seconds
+
+        Returns:
+            "full", "incremental" or "resync" (full after a 410), or None
+            if skipped
+        """
+        with self._sync_lock:
+            if max_age is not None and self.age() <= max_age:
+                return None
+            now = datetime.now(timezone.utc)
+            coverage = self._coverage
+            if self._sync_token is None or coverage[1] < now + timedelta(days=self.horizon_days / 2):
+                self._full_load(now)
+                kind = "full"
+            else:
+                try:
+                    self._incremental()
+                    kind = "incremental"
+                except Exception as e:
+                    if http_status(e) != 410:
+                        raise
+                    logger.info("Sync token for %s expired; reloading the calendar", self.key)
+                    self._full_load(now)
+                    kind = "resync"
+            self._synced_at = self._clock()
+            self.syncs[kind] += 1
+            return kind
+
+    def _list(self, **params):
+        """Every page of one events().list call; returns (items, nextSyncToken)."""
+        service = self.service_factory()
+        items, page_token = [], None
+        while True:
+            request = service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, maxResults=PAGE_SIZE,
+                pageToken=page_token, **params
+            )
+            result = resilience.call("calendar", request.execute)
+            items.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return items, result.get("nextSyncToken")
+
+    def _full_load(self, now):
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        coverage = (today, today + timedelta(days=self.horizon_days))
+        items, token = self._list(timeMin=coverage[0].isoformat(), timeMax=coverage[1].isoformat())
+        events = {}
+        for event in items:
+            interval = busy_interval(event)
+            if interval is not None:
+                events[event["id"]] = interval
+        self._events = events
+        self._publish(coverage)
+        self._sync_token = token
+        logger.info("Loaded %d busy events of %s", len(events), self.key)
+
+    def _incremental(self):
+        items, token = self._list(syncToken=self._sync_token)
+        for event in items:
+            interval = busy_interval(event)
+            if interval is None:
+                self._events.pop(event["id"], None)
+            else:
+                self._events[event["id"]] = interval
+        if items:
+            self._publish(self._coverage)
+        self._sync_token = token or self._sync_token
+
+    def _publish(self, coverage):
+        """Swap in an index rebuilt from the event map."""
+        index = BusyIndex.from_merged(merge_sorted(sorted(self._events.values())))
+        with self._lock:
+            self._index = index
+            self._coverage = coverage
+
+    # -- background sync --------------------------------------------------
+
+    def start(self):
+        """Start the timer thread (the first sync runs on it straight away)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"mirror-{self.key}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning("Calendar mirror sync for %s failed: %s", self.key, e)
+            self._stop.wait(self.sync_seconds)
+
+    def stats(self):
+        age = self.age()
+        return {
+            "events": len(self._events),
+            "syncs": dict(self.syncs),
+            "reads": dict(self.reads),
+            "age_seconds": None if age == float("inf") else round(age, 3),
+        }
+
+
+def register_mirror(mirror):
+    """Answer fetch_busy_index for ``mirror.key`` from the mirror."""
+    MIRRORS[mirror.key] = mirror
+    return mirror
+
+
+def _collect_mirror_metrics():
+    mirrors = sorted(MIRRORS.items())
+    return [
+        ("scheduler_mirror_events", "gauge", "Busy events held by a calendar mirror",
+         [({"calendar": key}, len(m._events)) for key, m in mirrors]),
+        ("scheduler_mirror_syncs_total", "counter", "Calendar mirror syncs by kind",
+         [({"calendar": key, "kind": kind}, m.syncs[kind])
+          for key, m in mirrors for kind in ("full", "incremental", "resync")]),
+        ("scheduler_mirror_reads_total", "counter", "Busy lookups answered (hit) or passed on (miss) by a mirror",
+         [({"calendar": key, "result": result}, m.reads[result])
+          for key, m in mirrors for result in ("hit", "miss")]),
+    ]
+
+
+REGISTRY.register_collector(_collect_mirror_metrics)
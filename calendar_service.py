@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Refresh this many seconds before the access token expires. Must exceed
+# google-auth's own 3m45s threshold, or requests would refresh inline.
+DEFAULT_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+# Wait before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 30
+
+
+@lru_cache(maxsize=None)
+def discovery_document(api="calendar", version="v3"):
+    """
+    Parsed discovery document for an API, loaded once per process
+
+    Uses the copy bundled with google-api-python-client, so building a
+    service never fetches discovery over the network. Returns None when
+    the installed client has no static documents.
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    doc = get_static_doc(api, version)
+    return json.loads(doc) if doc else None
+
+
+def build_service(credentials):
+    """
+    Build a Calendar service from the cached discovery document
+
+    Every service gets its own httplib2 transport, so one service must not
+    be shared between threads; see ServicePool.
+    """
+    from googleapiclient.discovery import build, build_from_document
+
+    document = discovery_document()
+    if document is None:
+        return build('calendar', 'v3', credentials=credentials, cache_discovery=False)
+    return build_from_document(document, credentials=credentials)
+
+
+def seconds_until_expiry(credentials):
+    """Seconds left on the access token, or None if it has no expiry."""
+    if credentials.expiry is None:
+        return None
+    now = datetime.now(timezone.utc).replace(tzinfo=None)  # google-auth uses naive UTC
+    return (credentials.expiry - now).total_seconds()
+
+
+def refresh_credentials(credentials):
+    from google.auth.transport.requests import Request
+
+    credentials.refresh(Request())
+
+
+class CredentialRefresher:
+    """
+    Refreshes OAuth credentials in a daemon thread ahead of expiry
+
+    Requests keep using the current access token while a new one is
+    fetched, so no user request waits on the token endpoint.
+
+    Args:
+        credentials: google.oauth2 Credentials shared by all services
+        on_refresh: Called with the credentials after each refresh
+        margin_seconds: Refresh this long before the token expires
+    """
+
+    def __init__(self, credentials, on_refresh=None, margin_seconds=DEFAULT_REFRESH_MARGIN):
+        self.credentials = credentials
+        self.on_refresh = on_refresh
+        self.margin_seconds = margin_seconds
+        self.refreshes = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def seconds_until_refresh(self):
+        remaining = seconds_until_expiry(self.credentials)
+        if remaining is None:
+            return self.margin_seconds
+        return remaining - self.margin_seconds
+
+    def refresh(self):
+        refresh_credentials(self.credentials)
+        self.refreshes += 1
+        if self.on_refresh:
+            self.on_refresh(self.credentials)
+
+    def _run(self):
+        while not self._stop.wait(max(self.seconds_until_refresh(), 0)):
+            if self.credentials.expiry is None:
+                continue
+            try:
+                self.refresh()
+                logger.info("Refreshed Calendar credentials, valid until %s", self.credentials.expiry)
+            except Exception as e:
+                self.failures += 1
+                logger.warning("Background credential refresh failed: %s", e)
+                self._stop.wait(REFRESH_RETRY_SECONDS)
+
+
+class ServicePool:
+    """
+    One Calendar service per thread, all sharing one set of credentials
+
+    googleapiclient services are not thread-safe (each wraps a single
+    httplib2 connection), so ``get()`` hands every worker thread its own
+    instance, built on first use from the cached discovery document.
+    Credentials that can be refreshed are kept fresh in the background.
+
+    Args:
+        credentials: Shared credentials, or None for factories that need none
+        factory: Builds a service from the credentials
+        on_refresh: Called with the credentials after each background refresh
+        background_refresh: Start a CredentialRefresher for the credentials;
+            turn off when something else keeps them fresh
+    """
+
+    def __init__(self, credentials, factory=build_service, on_refresh=None, background_refresh=True):
+        self.credentials = credentials
+        self._factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.built = 0
+        self.refresher = None
+        if background_refresh and getattr(credentials, "refresh_token", None):
+            self.refresher = CredentialRefresher(credentials, on_refresh).start()
+
+    def get(self):
+        """Return the calling thread's service, building it if needed."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self._factory(self.credentials)
+            with self._lock:
+                self.built += 1
+        return service
+
+    def close(self):
+        if self.refresher:
+            self.refresher.stop()
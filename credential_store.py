@@ -0,0 +1,253 @@
+"""
+Per-user Google credentials and Calendar services
+
+Usage:
+    python credential_store.py enroll [--user-id ID]
+    python credential_store.py list
+    python credential_store.py remove USER_ID
+
+Tokens are persisted in SQLite (CREDENTIAL_DB_PATH). Live credentials and
+their per-thread Calendar services are kept in an in-memory LRU in front
+of it, so a request for a cached user costs one dict lookup.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from calendar_service import (
+    DEFAULT_REFRESH_MARGIN,
+    ServicePool,
+    build_service,
+    refresh_credentials,
+    seconds_until_expiry,
+)
+from google_calendar import SCOPES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("CREDENTIAL_DB_PATH", "credentials.db")
+DEFAULT_MAX_USERS = int(os.getenv("CREDENTIAL_CACHE_SIZE", "1000"))
+# How often cached tokens are checked for upcoming expiry; keep well
+# below the refresh margin
+SWEEP_SECONDS = 60
+
+
+def _restrict_permissions(path):
+    """
+    Make the database and its -wal/-shm files readable by the owner only
+
+    Refresh tokens grant calendar access. SQLite creates the -wal and -shm
+    files with the database file's mode, so the database is created 0600
+    before it is opened; files left by an earlier run are tightened too.
+    """
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    for name in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(name):
+            os.chmod(name, 0o600)
+
+
+class CredentialStore:
+    """
+    Thread-safe store of OAuth credentials keyed by user ID
+
+    The ``max_users`` most recently used users stay loaded, each with a
+    ServicePool of per-thread services tagged with ``calendar_owner`` (so
+    freebusy cache entries are kept per user). One background thread
+    refreshes loaded tokens ``refresh_margin`` seconds before they expire
+    and writes them back to the database.
+
+    Args:
+        path: SQLite database file
+        max_users: Users kept loaded in memory
+        refresh_margin: Refresh this long before a token expires
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, max_users=DEFAULT_MAX_USERS,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.max_users = max_users
+        self.refresh_margin = refresh_margin
+        if path != ":memory:":
+            _restrict_permissions(path)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS credentials ("
+            " user_id TEXT PRIMARY KEY, token TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db_lock = threading.Lock()
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    # -- persistence ------------------------------------------------------
+
+    def save(self, user_id, credentials):
+        """Persist credentials for a user, replacing any loaded copy."""
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO credentials (user_id, token, updated_at) VALUES (?, ?, ?)",
+                (user_id, credentials.to_json(), time.time()),
+            )
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is not None and pool.credentials is not credentials:
+                del self._pools[user_id]
+
+    def enroll(self, credentials, user_id=None):
+        """Store credentials for a new user and return the user ID."""
+        user_id = user_id or uuid.uuid4().hex
+        self.save(user_id, credentials)
+        return user_id
+
+    def load(self, user_id):
+        """Read a user's credentials from the database, or None."""
+        from google.oauth2.credentials import Credentials
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT token FROM credentials WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Credentials.from_authorized_user_info(json.loads(row[0]), SCOPES)
+
+    def remove(self, user_id):
+        with self._db_lock:
+            self._db.execute("DELETE FROM credentials WHERE user_id = ?", (user_id,))
+        with self._lock:
+            self._pools.pop(user_id, None)
+
+    def user_ids(self):
+        with self._db_lock:
+            return [row[0] for row in self._db.execute("SELECT user_id FROM credentials ORDER BY updated_at")]
+
+    # -- live credentials -------------------------------------------------
+
+    def service(self, user_id):
+        """
+        Return the calling thread's Calendar service for a user
+
+        Returns:
+            Service object, or None if the user has no stored credentials
+        """
+        pool = self._pool(user_id)
+        return pool.get() if pool else None
+
+    def _pool(self, user_id):
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is not None:
+                self._pools.move_to_end(user_id)
+                self.hits += 1
+                return pool
+            self.misses += 1
+
+        credentials = self.load(user_id)
+        if credentials is None:
+            return None
+        if not credentials.valid and credentials.refresh_token:
+            # Only on a cache miss; loaded tokens are refreshed in the background
+            self._refresh(user_id, credentials)
+
+        def factory(creds):
+            service = build_service(creds)
+            service.calendar_owner = user_id
+            return service
+
+        pool = ServicePool(credentials, factory=factory, background_refresh=False)
+        with self._lock:
+            # Another thread may have loaded the same user meanwhile
+            pool = self._pools.setdefault(user_id, pool)
+            self._pools.move_to_end(user_id)
+            while len(self._pools) > self.max_users:
+                self._pools.popitem(last=False)
+        self._start_sweeper()
+        return pool
+
+    def _refresh(self, user_id, credentials):
+        try:
+            refresh_credentials(credentials)
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.warning("Could not refresh credentials for %s: %s", user_id, e)
+            return
+        self.refreshes += 1
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE credentials SET token = ?, updated_at = ? WHERE user_id = ?",
+                (credentials.to_json(), time.time(), user_id),
+            )
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name="credential-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep(self):
+        while not self._stop.wait(SWEEP_SECONDS):
+            self.refresh_expiring()
+
+    def refresh_expiring(self):
+        """Refresh every loaded token expiring within the refresh margin."""
+        with self._lock:
+            loaded = list(self._pools.items())
+        for user_id, pool in loaded:
+            remaining = seconds_until_expiry(pool.credentials)
+            if remaining is not None and remaining < self.refresh_margin and pool.credentials.refresh_token:
+                self._refresh(user_id, pool.credentials)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": len(self._pools),
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+            }
+
+    def close(self):
+        self._stop.set()
+        with self._db_lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage per-user Google Calendar credentials")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enroll = commands.add_parser("enroll", help="authorize a Google account in the browser")
+    enroll.add_argument("--user-id", help="ID to store the account under (default: random)")
+    commands.add_parser("list", help="list enrolled user IDs")
+    remove = commands.add_parser("remove", help="forget a user's credentials")
+    remove.add_argument("user_id")
+    args = parser.parse_args()
+
+    store = CredentialStore()
+    if args.command == "enroll":
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
+        credentials = flow.run_local_server(port=0)
+        print(store.enroll(credentials, args.user_id))
+    elif args.command == "list":
+        for user_id in store.user_ids():
+            print(user_id)
+    else:
+        store.remove(args.user_id)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
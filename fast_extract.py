@@ -0,0 +1,236 @@
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+from metrics import REGISTRY
+
+MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "1.0"))
+
+_WEEKDAYS = r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tues?|wed|thu(?:rs?)?|fri|sat|sun"
+_MONTHS = (
+    r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+)
+_ORDINALS = {
+    "first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3,
+    "fourth": 4, "4th": 4, "fifth": 5, "5th": 5, "sixth": 6, "6th": 6,
+    "seventh": 7, "7th": 7, "last": -1,
+}
+
+_DURATION_RE = re.compile(
+    r"\b(?P<half>half an? hour)\b"
+    r"|\b(?P<num>\d+(?:\.\d+)?|an?|one)\s*-?\s*(?P<unit>minutes?|mins?|hours?|hrs?|h)\b",
+    re.IGNORECASE,
+)
+# "in 2 hours" says when to start (relative to now), not how long
+_RELATIVE_START_RE = re.compile(r"\b(?:in|within)\s+$", re.IGNORECASE)
+_TIME_RE = re.compile(
+    r"\b(?:at\s+)?(?P<hour>1[0-2]|0?[1-9])(?::(?P<minute>[0-5]\d))?\s*(?P<ampm>[ap])\.?\s*m\b\.?"
+    r"|\b(?:at\s+)?(?P<hour24>[01]?\d|2[0-3]):(?P<minute24>[0-5]\d)\b"
+    r"|\b(?:at\s+)?(?P<named>noon|midday)\b",
+    re.IGNORECASE,
+)
+_DATE_EXPR = (
+    rf"(?:the\s+)?day after tomorrow|today|tomorrow|(?:(?:this|next)\s+)?(?:{_WEEKDAYS})\b"
+    rf"|\d{{4}}-\d{{2}}-\d{{2}}"
+    rf"|(?:{_MONTHS})\s+\d{{1,2}}(?:st|nd|rd|th)?|\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?(?:{_MONTHS})\b"
+)
+_DEADLINE_RE = re.compile(
+    rf"\b(?:before|by|no later than|until)\s+(?P<date>{_DATE_EXPR})", re.IGNORECASE
+)
+_DATE_RE = re.compile(rf"\b(?:on\s+)?(?P<date>{_DATE_EXPR})", re.IGNORECASE)
+_SELECTION_RE = re.compile(
+    r"^\s*(?:(?:let'?s\s+(?:go\s+with|do)|i'?ll\s+take|go\s+with|pick|choose)\s+)?"
+    r"(?:(?:option|number|no\.?|#)\s*(?P<num>\d+)|(?P<bare>\d)|(?:the\s+)?(?P<ord>\w+)\s*(?:one|option)?)"
+    r"\s*(?:please)?[.!]?\s*$",
+    re.IGNORECASE,
+)
+_SUGGEST_RE = re.compile(
+    r"\b(?:suggest\w*|what(?:'s| is| are)? (?:available|free)|when am i free|available (?:dates|days|times|slots)|options)\b",
+    re.IGNORECASE,
+)
+
+# Words that carry no meeting detail; anything else left over means the
+# message says more than the rules understood and the LLM should read it.
+_FILLER = frozenset(
+    """
+    a an the i i'd i'll i'm we we'd let's lets me us my our you can could would will please
+    need want like to for on at in of it is that this and schedule book set up make create
+    add put arrange plan meeting meetings call sync chat slot appointment event new sure yes
+    ok okay works fine perfect great good how about maybe do go take then instead actually
+    some any few dates days times
+    """.split()
+)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def extract_meeting_details(user_input, suggested_dates=(), today=None, min_confidence=None):
+    """
+    Deterministically extract meeting details from simple messages
+
+    Produces the same fields the LLM returns (duration_minutes, date,
+    time_pref, deadline, is_date_selection, request_suggestions).
+
+    Returns:
+        Dict of extracted fields, or None when confidence is below
+        ``min_confidence`` (FAST_PATH_MIN_CONFIDENCE by default) and the
+        LLM should handle the message
+    """
+    if min_confidence is None:
+        min_confidence = MIN_CONFIDENCE
+    today = today or datetime.utcnow().date()
+    text = user_input.strip()
+    if not text:
+        return None
+
+    if suggested_dates:
+        selection = _match_selection(text, suggested_dates)
+        if selection:
+            return selection
+
+    structured = {}
+    spans = []
+
+    match = _SUGGEST_RE.search(text)
+    if match:
+        structured["request_suggestions"] = True
+        spans.append(match.span())
+
+    match = _DURATION_RE.search(text)
+    if match:
+        if _RELATIVE_START_RE.search(text, 0, match.start()):
+            return None
+        structured["duration_minutes"] = _duration_minutes(match)
+        spans.append(match.span())
+
+    match = _TIME_RE.search(text)
+    if match:
+        structured["time_pref"] = _time_pref(match)
+        spans.append(match.span())
+
+    match = _DEADLINE_RE.search(text)
+    if match:
+        structured["deadline"] = _date_value(match.group("date"), today)
+        spans.append(match.span())
+
+    for match in _DATE_RE.finditer(text):
+        if not any(start <= match.start() < end for start, end in spans):
+            structured["date"] = _date_value(match.group("date"), today)
+            spans.append(match.span())
+            break
+
+    if not structured:
+        return None
+    # Suggestions are answered from existing state only; mixed requests go to the LLM
+    if structured.get("request_suggestions") and len(structured) > 1:
+        return None
+    if _confidence(text, spans) < min_confidence:
+        return None
+    return structured
+
+
+def _match_selection(text, suggested_dates):
+    match = _SELECTION_RE.match(text)
+    if not match:
+        return None
+    if match.group("num") or match.group("bare"):
+        choice = int(match.group("num") or match.group("bare"))
+    else:
+        choice = _ORDINALS.get(match.group("ord").lower())
+        if choice is None:
+            return None
+    if choice == -1:
+        choice = len(suggested_dates)
+    if not 1 <= choice <= len(suggested_dates):
+        return None
+    chosen = suggested_dates[choice - 1]
+    selection = {"date": chosen["date"], "is_date_selection": True}
+    if chosen.get("time"):
+        selection["time_pref"] = chosen["time"]
+    return selection
+
+
+def _duration_minutes(match):
+    if match.group("half"):
+        return 30
+    num = match.group("num").lower()
+    amount = 1.0 if num in ("a", "an", "one") else float(num)
+    if match.group("unit").lower().startswith("h"):
+        amount *= 60
+    return int(round(amount))
+
+
+def _time_pref(match):
+    if match.group("named"):
+        return "12:00 PM"
+    if match.group("hour24") is not None:
+        hour, minute = int(match.group("hour24")), int(match.group("minute24"))
+        return datetime(2000, 1, 1, hour, minute).strftime("%I:%M %p").lstrip("0")
+    hour, minute = int(match.group("hour")), match.group("minute") or "00"
+    return f"{hour}:{minute} {match.group('ampm').upper()}M"
+
+
+def _date_value(value, today):
+    value = value.lower()
+    if value == "today":
+        return today.isoformat()
+    if value == "tomorrow":
+        return (today + timedelta(days=1)).isoformat()
+    if value.endswith("day after tomorrow"):
+        return (today + timedelta(days=2)).isoformat()
+    # Weekday names and month/day forms are normalized by parse_date_or_day
+    return re.sub(r"^(?:this|next)\s+", "", value)
+
+
+def _confidence(text, spans):
+    remaining = text.lower()
+    for start, end in sorted(spans, reverse=True):
+        remaining = remaining[:start] + " " + remaining[end:]
+    words = _WORD_RE.findall(text.lower())
+    leftover = [w for w in _WORD_RE.findall(remaining) if w not in _FILLER]
+    if not words:
+        return 0.0
+    return 1.0 - len(leftover) / len(words)
+
+
+class ExtractionStats:
+    """Counts and latency of extractions answered locally vs by the LLM"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {"fast": 0, "llm": 0}
+        self.seconds = {"fast": 0.0, "llm": 0.0}
+
+    def record(self, path, seconds):
+        with self._lock:
+            self.calls[path] += 1
+            self.seconds[path] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            fast, llm = self.calls["fast"], self.calls["llm"]
+            fast_avg = self.seconds["fast"] / fast if fast else 0.0
+            llm_avg = self.seconds["llm"] / llm if llm else 0.0
+            total = fast + llm
+            return {
+                "fast_path_calls": fast,
+                "llm_calls": llm,
+                "fast_path_ratio": fast / total if total else 0.0,
+                "llm_calls_avoided": fast,
+                "avg_fast_path_ms": fast_avg * 1000,
+                "avg_llm_ms": llm_avg * 1000,
+                "estimated_seconds_saved": fast * max(llm_avg - fast_avg, 0.0),
+            }
+
+
+EXTRACTION_STATS = ExtractionStats()
+
+
+def _collect_extraction_metrics():
+    stats = EXTRACTION_STATS.snapshot()
+    samples = [({"path": "fast"}, stats["fast_path_calls"]), ({"path": "llm"}, stats["llm_calls"])]
+    return [("scheduler_extractions_total", "counter", "Meeting detail extractions by path", samples)]
+
+
+REGISTRY.register_collector(_collect_extraction_metrics)
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from intervals import parse_iso
+
+DEFAULT_TTL_SECONDS = float(os.getenv("FREEBUSY_CACHE_TTL", "60"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("FREEBUSY_CACHE_SIZE", "256"))
+
+
+class FreeBusyCache:
+    """
+    Per-calendar cache of fetched busy intervals with TTL and LRU eviction
+
+    Each entry is one fetched window (calendar_id, start, end) together with
+    the BusyIndex returned for it. A lookup is a hit when a fresh entry for
+    the same calendar fully covers the requested window. Events created
+    locally are written through into every overlapping entry so the cache
+    stays correct without refetching.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, calendar_id, time_min, time_max):
+        """Return a BusyIndex covering the window, or None on a miss."""
+        if self.max_entries <= 0:
+            return None
+        start, end = parse_iso(time_min), parse_iso(time_max)
+        now = time.monotonic()
+        with self._lock:
+            for key, (expires_at, index) in list(self._entries.items()):
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                cal, entry_start, entry_end = key
+                if cal == calendar_id and entry_start <= start and end <= entry_end:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return index
+            self.misses += 1
+            return None
+
+    def put(self, calendar_id, time_min, time_max, index):
+        """Store the busy intervals fetched for a window."""
+        if self.max_entries <= 0:
+            return
+        key = (calendar_id, parse_iso(time_min), parse_iso(time_max))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def add_busy(self, calendar_id, start, end):
+        """Write a newly booked interval through to every overlapping entry."""
+        start, end = parse_iso(start), parse_iso(end)
+        with self._lock:
+            for (cal, entry_start, entry_end), (_, index) in self._entries.items():
+                if cal == calendar_id and start < entry_end and entry_start < end:
+                    index.add(max(start, entry_start), min(end, entry_end))
+
+    def invalidate(self, calendar_id=None):
+        """Drop cached windows for one calendar, or everything."""
+        with self._lock:
+            if calendar_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == calendar_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,201 +1,442 @@
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from datetime import datetime, timezone
-import os
-import json
-
-SCOPES = ['https://www.googleapis.com/auth/calendar']
-
-def get_calendar_service():
-    """Get authenticated Google Calendar service"""
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                print(f"Error refreshing credentials: {e}")
-                # Delete expired token and re-authenticate
-                if os.path.exists('token.json'):
-                    os.remove('token.json')
-                creds = None
-        
-        if not creds:
-            if not os.path.exists('credentials.json'):
-                raise FileNotFoundError("credentials.json file not found. Please download it from Google Cloud Console.")
-            
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    
-    service = build('calendar', 'v3', credentials=creds)
-    return service
-
-def find_free_slots(service, duration_minutes, time_min, time_max):
-    """
-    Find free slots in the calendar for the given duration and time range
-    
-    Args:
-        service: Google Calendar service object
-        duration_minutes: Required meeting duration in minutes
-        time_min: Start time in ISO format
-        time_max: End time in ISO format
-    
-    Returns:
-        List of free slots with start and end times
-    """
-    try:
-        body = {
-            "timeMin": time_min,
-            "timeMax": time_max,
-            "items": [{"id": "primary"}]
-        }
-
-        print(f"Requesting freebusy with body:")
-        print(json.dumps(body, indent=2))
-
-        eventsResult = service.freebusy().query(body=body).execute()
-        
-        if 'calendars' not in eventsResult or 'primary' not in eventsResult['calendars']:
-            print("Warning: No calendar data returned")
-            return []
-        
-        busy_times = eventsResult['calendars']['primary'].get('busy', [])
-        print(f"Found {len(busy_times)} busy periods")
-
-        free_slots = []
-        
-        # Parse time strings to datetime objects
-        start_time = datetime.fromisoformat(time_min.replace('Z', '+00:00'))
-        end_time = datetime.fromisoformat(time_max.replace('Z', '+00:00'))
-        
-        # Sort busy times by start time
-        busy_times.sort(key=lambda x: x['start'])
-        
-        last_end = start_time
-
-        for busy in busy_times:
-            busy_start = datetime.fromisoformat(busy['start'].replace('Z', '+00:00'))
-            busy_end = datetime.fromisoformat(busy['end'].replace('Z', '+00:00'))
-            
-            # Check if there's a free slot before this busy period
-            if (busy_start - last_end).total_seconds() >= duration_minutes * 60:
-                free_slots.append({
-                    'start': last_end.isoformat(),
-                    'end': busy_start.isoformat(),
-                    'duration_minutes': int((busy_start - last_end).total_seconds() / 60)
-                })
-            
-            last_end = max(last_end, busy_end)
-
-        # Check if there's a free slot after the last busy period
-        if (end_time - last_end).total_seconds() >= duration_minutes * 60:
-            free_slots.append({
-                'start': last_end.isoformat(),
-                'end': end_time.isoformat(),
-                'duration_minutes': int((end_time - last_end).total_seconds() / 60)
-            })
-
-        print(f"Found {len(free_slots)} free slots")
-        for slot in free_slots:
-            print(f"  - {slot['start']} to {slot['end']} ({slot['duration_minutes']} minutes)")
-
-        return free_slots
-
-    except Exception as e:
-        print(f"Error finding free slots: {e}")
-        return []
-
-def create_meeting(service, start, end, summary="Scheduled Meeting", description="", attendees=None):
-    """
-    Create a meeting in Google Calendar
-    
-    Args:
-        service: Google Calendar service object
-        start: Start time in ISO format
-        end: End time in ISO format
-        summary: Meeting title
-        description: Meeting description
-        attendees: List of attendee email addresses
-    
-    Returns:
-        Meeting HTML link or None if failed
-    """
-    try:
-        # Ensure times are properly formatted
-        start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
-        
-        event = {
-            'summary': summary,
-            'description': description,
-            'start': {
-                'dateTime': start_dt.isoformat(),
-                'timeZone': 'UTC'
-            },
-            'end': {
-                'dateTime': end_dt.isoformat(),
-                'timeZone': 'UTC'
-            },
-            'reminders': {
-                'useDefault': False,
-                'overrides': [
-                    {'method': 'email', 'minutes': 24 * 60},  # 1 day before
-                    {'method': 'popup', 'minutes': 10},       # 10 minutes before
-                ],
-            },
-        }
-        
-        # Add attendees if provided
-        if attendees:
-            event['attendees'] = [{'email': email} for email in attendees]
-        
-        # Add conference/meet link
-        event['conferenceData'] = {
-            'createRequest': {
-                'requestId': f"meeting-{int(datetime.now().timestamp())}",
-                'conferenceSolutionKey': {'type': 'hangoutsMeet'}
-            }
-        }
-        
-        print(f"Creating meeting: {summary}")
-        print(f"Time: {start_dt.strftime('%Y-%m-%d %H:%M')} to {end_dt.strftime('%H:%M')} UTC")
-        
-        event_result = service.events().insert(
-            calendarId='primary', 
-            body=event,
-            conferenceDataVersion=1  # Required for conference data
-        ).execute()
-        
-        meeting_link = event_result.get('htmlLink')
-        meet_link = None
-        
-        # Extract Google Meet link if available
-        if 'conferenceData' in event_result and 'entryPoints' in event_result['conferenceData']:
-            for entry in event_result['conferenceData']['entryPoints']:
-                if entry['entryPointType'] == 'video':
-                    meet_link = entry['uri']
-                    break
-        
-        print(f"Meeting created successfully!")
-        print(f"Calendar link: {meeting_link}")
-        if meet_link:
-            print(f"Google Meet link: {meet_link}")
-        
-        return {
-            'calendar_link': meeting_link,
-            'meet_link': meet_link,
-            'event_id': event_result.get('id')
-        }
-
-    except Exception as e:
-        print(f"Error creating meeting: {e}")
-        return None
\ No newline at end of file
+from datetime import datetime, timezone
+from intervals import BusyIndex
+from freebusy_cache import FreeBusyCache
+from calendar_mirror import MIRRORS
+from metrics import REGISTRY, FREEBUSY_LATENCY, INSERT_LATENCY, ERRORS
+from resilience import http_status
+import base64
+import hashlib
+import logging
+import os
+import resilience
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Shared cache of busy intervals, sized/aged via FREEBUSY_CACHE_SIZE / FREEBUSY_CACHE_TTL
+FREEBUSY_CACHE = FreeBusyCache()
+
+def _collect_cache_metrics():
+    stats = FREEBUSY_CACHE.stats()
+    return [
+        ("scheduler_freebusy_cache_hits_total", "counter", "Freebusy cache hits", [({}, stats['hits'])]),
+        ("scheduler_freebusy_cache_misses_total", "counter", "Freebusy cache misses", [({}, stats['misses'])]),
+        ("scheduler_freebusy_cache_evictions_total", "counter", "Freebusy cache evictions", [({}, stats['evictions'])]),
+        ("scheduler_freebusy_cache_entries", "gauge", "Freebusy cache entries", [({}, stats['size'])]),
+    ]
+
+REGISTRY.register_collector(_collect_cache_metrics)
+
+# Callbacks run after every created event, see on_meeting_created
+_meeting_listeners = []
+
+def on_meeting_created(listener):
+    """
+    Register ``listener(calendar, start, end, summary, links)`` to run after
+    create_meeting or a batched insert creates an event
+
+    ``calendar`` is the cache_calendar_id of the calendar written to and
+    ``links`` the dict meeting_links returns.
+    """
+    _meeting_listeners.append(listener)
+
+def notify_meeting_created(service, start, end, summary, links):
+    for listener in _meeting_listeners:
+        try:
+            listener(cache_calendar_id(service), start, end, summary, links)
+        except Exception as e:
+            logger.error("Meeting listener failed: %s", e)
+
+def load_credentials():
+    """Load the OAuth credentials from token.json, refreshing or re-authorizing if needed"""
+    # The Google client libraries take ~0.3 s to import; only pay for them
+    # when credentials are actually needed
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
+    creds = None
+    if os.path.exists('token.json'):
+        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+            except Exception as e:
+                logger.warning("Error refreshing credentials: %s", e)
+                # Delete expired token and re-authenticate
+                if os.path.exists('token.json'):
+                    os.remove('token.json')
+                creds = None
+        
+        if not creds:
+            if not os.path.exists('credentials.json'):
+                raise FileNotFoundError("credentials.json file not found. Please download it from Google Cloud Console.")
+            
+            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+            creds = flow.run_local_server(port=0)
+        
+        # Save the credentials for the next run
+        save_credentials(creds)
+
+    return creds
+
+def save_credentials(creds):
+    """Write credentials to token.json for the next run"""
+    with open('token.json', 'w') as token:
+        token.write(creds.to_json())
+
+def get_calendar_service():
+    """Get authenticated Google Calendar service"""
+    from calendar_service import build_service
+
+    return build_service(load_credentials())
+
+def find_free_slots(service, duration_minutes, time_min, time_max, use_cache=True):
+    """
+    Find free slots in the calendar for the given duration and time range
+    
+    Args:
+        service: Google Calendar service object
+        duration_minutes: Required meeting duration in minutes
+        time_min: Start time in ISO format
+        time_max: End time in ISO format
+        use_cache: Answer from FREEBUSY_CACHE when the window is covered
+    
+    Returns:
+        List of free slots with start and end times
+    """
+    try:
+        busy_index = fetch_busy_index(service, time_min, time_max, use_cache=use_cache)
+        if busy_index is None:
+            return []
+
+        free_slots = busy_index.free_slots(time_min, time_max, duration_minutes)
+
+        logger.info("Found %d free slots", len(free_slots))
+        if logger.isEnabledFor(logging.DEBUG):
+            for slot in free_slots:
+                logger.debug("  - %s to %s (%s minutes)", slot['start'], slot['end'], slot['duration_minutes'])
+
+        return free_slots
+
+    except Exception as e:
+        ERRORS.inc(stage="freebusy")
+        logger.error("Error finding free slots: %s", e)
+        return []
+
+def cache_calendar_id(service, calendar_id='primary'):
+    """
+    FREEBUSY_CACHE key for a calendar as seen through ``service``
+
+    Services built for an enrolled user carry ``calendar_owner``; their
+    'primary' is that user's calendar, not the deployment's.
+    """
+    owner = getattr(service, 'calendar_owner', None)
+    return f"{owner}/{calendar_id}" if owner else calendar_id
+
+def record_busy(service, start, end, calendar_id='primary'):
+    """Write a booked or reserved interval through to FREEBUSY_CACHE and the calendar's mirror."""
+    cache_id = cache_calendar_id(service, calendar_id)
+    FREEBUSY_CACHE.add_busy(cache_id, start, end)
+    mirror = MIRRORS.get(cache_id)
+    if mirror is not None:
+        mirror.add_busy(start, end)
+
+def forget_busy(service, calendar_id='primary'):
+    """Drop cached and locally held busy time of a calendar, e.g. after a failed booking."""
+    cache_id = cache_calendar_id(service, calendar_id)
+    FREEBUSY_CACHE.invalidate(cache_id)
+    mirror = MIRRORS.get(cache_id)
+    if mirror is not None:
+        mirror.invalidate()
+
+def fetch_busy_index(service, time_min, time_max, calendar_id='primary', use_cache=True):
+    """
+    Fetch busy periods for a time range with a single freebusy query
+
+    Calendars with a CalendarMirror are answered from it when it covers
+    the window and is fresh enough; windows already covered by a fresh
+    FREEBUSY_CACHE entry are answered locally too. Either way Google is
+    not contacted.
+
+    Args:
+        service: Google Calendar service object
+        time_min: Start time in ISO format
+        time_max: End time in ISO format
+        calendar_id: Calendar to query
+        use_cache: Consult the mirror, and consult and populate FREEBUSY_CACHE
+
+    Returns:
+        BusyIndex of the busy periods, or None if no calendar data was returned
+    """
+    cache_id = cache_calendar_id(service, calendar_id)
+    if use_cache:
+        mirror = MIRRORS.get(cache_id)
+        if mirror is not None:
+            mirrored = mirror.busy_index(time_min, time_max)
+            if mirrored is not None:
+                return mirrored
+        cached = FREEBUSY_CACHE.get(cache_id, time_min, time_max)
+        if cached is not None:
+            return cached
+
+    body = {
+        "timeMin": time_min,
+        "timeMax": time_max,
+        "items": [{"id": calendar_id}]
+    }
+
+    logger.debug("Requesting freebusy with body: %s", body)
+
+    with FREEBUSY_LATENCY.time():
+        eventsResult = resilience.call("calendar", service.freebusy().query(body=body).execute)
+
+    if 'calendars' not in eventsResult or calendar_id not in eventsResult['calendars']:
+        logger.warning("No calendar data returned")
+        return None
+
+    busy_times = eventsResult['calendars'][calendar_id].get('busy', [])
+    logger.info("Found %d busy periods", len(busy_times))
+
+    busy_index = BusyIndex.from_freebusy(busy_times)
+    if use_cache:
+        FREEBUSY_CACHE.put(cache_id, time_min, time_max, busy_index)
+    return busy_index
+
+def list_upcoming_meetings(service, time_min, time_max, max_results=10):
+    """
+    List the events in a time range, earliest first
+
+    Args:
+        service: Google Calendar service object
+        time_min: Start time in ISO format
+        time_max: End time in ISO format
+        max_results: Maximum number of events to return
+
+    Returns:
+        List of dicts with summary, start, end and calendar_link
+    """
+    request = service.events().list(
+        calendarId='primary',
+        timeMin=time_min,
+        timeMax=time_max,
+        singleEvents=True,
+        orderBy='startTime',
+        maxResults=max_results,
+    )
+    result = resilience.call("calendar", request.execute)
+
+    meetings = []
+    for event in result.get('items', []):
+        if event.get('status') == 'cancelled':
+            continue
+        meetings.append({
+            'summary': event.get('summary') or '(no title)',
+            # All-day events have a date instead of a dateTime
+            'start': event['start'].get('dateTime') or event['start'].get('date'),
+            'end': event['end'].get('dateTime') or event['end'].get('date'),
+            'calendar_link': event.get('htmlLink'),
+        })
+    return meetings
+
+def idempotent_event_id(service, start_dt, end_dt, summary="Scheduled Meeting", attendees=None,
+                        calendar_id='primary', recurrence=None):
+    """
+    Deterministic event ID for a meeting
+
+    The same meeting on the same calendar always maps to the same ID, so
+    a retried insert whose first attempt did land is rejected with 409
+    instead of creating a duplicate. IDs are lowercase base32hex (0-9,
+    a-v), the alphabet Calendar accepts for client-chosen IDs. A series
+    (``recurrence`` lines) gets a different ID than its first meeting alone.
+
+    Returns:
+        32-character event ID
+    """
+    parts = [
+        cache_calendar_id(service, calendar_id),
+        _as_utc(start_dt).isoformat(),
+        _as_utc(end_dt).isoformat(),
+        summary or "",
+        ",".join(sorted(attendees or [])),
+    ]
+    if recurrence:
+        parts.extend(recurrence)
+    key = "\n".join(parts)
+    digest = hashlib.sha256(key.encode()).digest()[:20]
+    return base64.b32hexencode(digest).decode().lower()
+
+def _as_utc(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+def build_event_body(start_dt, end_dt, summary="Scheduled Meeting", description="", attendees=None,
+                     request_id=None, event_id=None):
+    """
+    Build the events.insert body for a meeting with a Google Meet link
+
+    Args:
+        start_dt: Start datetime
+        end_dt: End datetime
+        summary: Meeting title
+        description: Meeting description
+        attendees: List of attendee email addresses
+        request_id: Conference create request ID (must be unique per
+            meeting; defaults to ``event_id`` or a random ID)
+        event_id: Client-chosen event ID, see idempotent_event_id
+
+    Returns:
+        Event resource dict
+    """
+    event = {
+        'summary': summary,
+        'description': description,
+        'start': {
+            'dateTime': start_dt.isoformat(),
+            'timeZone': 'UTC'
+        },
+        'end': {
+            'dateTime': end_dt.isoformat(),
+            'timeZone': 'UTC'
+        },
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'email', 'minutes': 24 * 60},  # 1 day before
+                {'method': 'popup', 'minutes': 10},       # 10 minutes before
+            ],
+        },
+    }
+
+    if event_id:
+        event['id'] = event_id
+
+    # Add attendees if provided
+    if attendees:
+        event['attendees'] = [{'email': email} for email in attendees]
+
+    # Add conference/meet link
+    event['conferenceData'] = {
+        'createRequest': {
+            'requestId': request_id or event_id or uuid.uuid4().hex,
+            'conferenceSolutionKey': {'type': 'hangoutsMeet'}
+        }
+    }
+    return event
+
+def meeting_links(event_result):
+    """
+    Extract the calendar link, Meet link and event ID from an inserted event
+
+    Returns:
+        Dict with calendar_link, meet_link and event_id
+    """
+    meeting_link = event_result.get('htmlLink')
+    meet_link = None
+
+    # Extract Google Meet link if available
+    if 'conferenceData' in event_result and 'entryPoints' in event_result['conferenceData']:
+        for entry in event_result['conferenceData']['entryPoints']:
+            if entry['entryPointType'] == 'video':
+                meet_link = entry['uri']
+                break
+
+    return {
+        'calendar_link': meeting_link,
+        'meet_link': meet_link,
+        'event_id': event_result.get('id')
+    }
+
+def insert_event(service, event, calendar_id='primary'):
+    """
+    Insert an event, retrying transient failures without creating duplicates
+
+    ``event`` should carry an ``id`` (see idempotent_event_id). If an
+    earlier attempt already created it, Calendar answers 409 and the
+    existing event is returned as the result.
+
+    Returns:
+        The inserted (or previously inserted) event resource
+    """
+    request = service.events().insert(
+        calendarId=calendar_id,
+        body=event,
+        conferenceDataVersion=1  # Required for conference data
+    )
+    try:
+        return resilience.call("calendar", request.execute)
+    except Exception as e:
+        if http_status(e) != 409 or 'id' not in event:
+            raise
+    logger.info("Event %s already exists; using the earlier insert", event['id'])
+    return existing_event(service, event, calendar_id)
+
+def existing_event(service, event, calendar_id='primary'):
+    """
+    Fetch the event an earlier insert of ``event`` created
+
+    An event that was since deleted keeps its ID as a cancelled event, so
+    booking the same meeting again restores it.
+    """
+    existing = resilience.call(
+        "calendar", service.events().get(calendarId=calendar_id, eventId=event['id']).execute
+    )
+    if existing.get('status') == 'cancelled':
+        request = service.events().update(
+            calendarId=calendar_id,
+            eventId=event['id'],
+            body=dict(event, status='confirmed'),
+            conferenceDataVersion=1,
+        )
+        existing = resilience.call("calendar", request.execute)
+    return existing
+
+def create_meeting(service, start, end, summary="Scheduled Meeting", description="", attendees=None):
+    """
+    Create a meeting in Google Calendar
+    
+    Args:
+        service: Google Calendar service object
+        start: Start time in ISO format
+        end: End time in ISO format
+        summary: Meeting title
+        description: Meeting description
+        attendees: List of attendee email addresses
+    
+    Returns:
+        Meeting HTML link or None if failed
+    """
+    try:
+        # Ensure times are properly formatted
+        start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
+        end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
+        
+        event_id = idempotent_event_id(service, start_dt, end_dt, summary, attendees)
+        event = build_event_body(start_dt, end_dt, summary, description, attendees, event_id=event_id)
+        
+        logger.info("Creating meeting: %s", summary)
+        logger.info("Time: %s to %s UTC", start_dt.strftime('%Y-%m-%d %H:%M'), end_dt.strftime('%H:%M'))
+        
+        with INSERT_LATENCY.time():
+            event_result = insert_event(service, event)
+        
+        # Keep cached availability correct without another freebusy fetch
+        record_busy(service, start_dt, end_dt)
+
+        result = meeting_links(event_result)
+        notify_meeting_created(service, start, end, summary, result)
+        
+        logger.info("Meeting created successfully")
+        logger.info("Calendar link: %s", result['calendar_link'])
+        if result['meet_link']:
+            logger.info("Google Meet link: %s", result['meet_link'])
+        
+        return result
+
+    except Exception as e:
+        ERRORS.inc(stage="insert")
+        logger.error("Error creating meeting: %s", e)
+        return None
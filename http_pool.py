@@ -0,0 +1,55 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+DEFAULT_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+
+
+class PooledClient:
+    """
+    Keep-alive HTTP client shared across worker threads
+
+    All threads draw connections from one urllib3 pool (through a single
+    shared HTTPAdapter), so a warm TCP/TLS connection opened by one request
+    is reused by the next regardless of thread. Each thread gets its own
+    requests.Session on top of that adapter because Session state such as
+    the cookie jar is not safe to mutate concurrently.
+    """
+
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+    ):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._local = threading.local()
+
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session().request(method, url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection (all threads)."""
+        self._adapter.close()
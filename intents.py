@@ -0,0 +1,105 @@
+"""
+Local intent router for messages that need no meeting extraction
+
+Greetings, thanks, goodbyes, acknowledgements, reset/cancel requests and
+"list my meetings" are recognized by one precompiled regex of
+word-bounded phrases. A message is routed only when it consists entirely
+of such phrases (plus politeness filler), so "hi, book 30 minutes on
+Friday" still goes to extraction and "your meeting" never reads as "yo".
+"""
+import re
+
+# Checked in this order when a message mixes intents ("ok thanks, bye")
+PRIORITY = ("list_meetings", "cancel", "reset", "goodbye", "thanks", "greeting", "ack")
+
+_PHRASES = {
+    "list_meetings": [
+        r"(?:list|show|tell|give|get)(?: me)?(?: all)? (?:of )?my(?: upcoming| next| scheduled)?"
+        r" (?:meetings|events|appointments|calendar|schedule|agenda)",
+        r"what(?:'s| is| do i have) on my (?:calendar|schedule|agenda)",
+        r"what (?:meetings|events|appointments) do i have",
+        r"what do i have(?: coming up| scheduled| planned)?",
+        r"(?:my|any)(?: upcoming| next| scheduled)? (?:meetings|events|appointments)",
+        r"upcoming (?:meetings|events|appointments)",
+        r"am i (?:free|busy)",
+    ],
+    "reset": [
+        r"start (?:over|again|fresh)", r"begin again", r"reset", r"restart",
+        r"clear (?:everything|all|it|that|this)",
+    ],
+    "cancel": [
+        r"cancel(?: (?:that|it|this|the (?:meeting|request)|my request))?",
+        r"never ?mind", r"forget (?:it|that|about it)", r"scratch that", r"abort",
+        r"don'?t (?:schedule|book) (?:it|that|anything)",
+    ],
+    "goodbye": [
+        r"bye(?: bye)?", r"goodbye", r"see (?:you|ya)(?: later| soon)?", r"cya", r"good ?night",
+        r"have a (?:good|nice|great) (?:day|one|evening)", r"that'?s (?:all|it)", r"i'?m done",
+        r"nothing else", r"talk (?:to you )?later",
+    ],
+    "thanks": [
+        r"thanks?(?: you)?(?: so much| very much| a lot| a bunch)?", r"thx", r"ty", r"cheers",
+        r"much appreciated", r"appreciate it",
+    ],
+    "greeting": [
+        r"hi(?:ya)?", r"hello", r"hey", r"howdy", r"yo", r"sup", r"greetings",
+        r"good (?:morning|afternoon|evening|day)", r"what'?s up",
+        r"how (?:are|r) (?:you|u)(?: doing)?(?: today)?", r"how'?s it going",
+    ],
+    "ack": [
+        r"ok(?:ay)?", r"k", r"cool", r"got it", r"great", r"perfect", r"sounds good", r"all ?right",
+        r"nice", r"awesome", r"sure", r"yes", r"yep", r"yeah", r"fine", r"noted", r"understood",
+    ],
+    # Time range for list_meetings
+    "period": [r"(?:for |on )?(?:today|tomorrow|this week|next week)"],
+    "filler": [
+        r"please", r"pls", r"let'?s", r"can you", r"could you", r"would you", r"will you", r"just", r"so",
+        r"oh", r"um", r"well", r"and", r"then", r"again", r"there", r"bot", r"assistant",
+        r"everyone", r"all", r"friend", r"buddy", r"me", r"for me", r"now",
+    ],
+}
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    + "|".join(
+        f"(?P<{name}>{'|'.join(sorted(phrases, key=len, reverse=True))})"
+        for name, phrases in _PHRASES.items()
+    )
+    + r")\b"
+)
+_PUNCTUATION_RE = re.compile(r"[^\w'\s]+")
+
+
+def route_intent(text):
+    """
+    Classify a message that needs no meeting extraction
+
+    Args:
+        text: The user's message
+
+    Returns:
+        (intent, period) where intent is one of PRIORITY and period is
+        "today", "tomorrow", "this week", "next week" or None; or None if
+        the message should go to meeting extraction
+    """
+    text = _PUNCTUATION_RE.sub(" ", text.lower().replace("’", "'")).strip()
+    seen = set()
+    period = None
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            return None
+        seen.add(match.lastgroup)
+        if match.lastgroup == "period":
+            period = re.sub(r"^(?:for|on) ", "", match.group("period"))
+        pos = match.end()
+        while pos < len(text) and text[pos] == " ":
+            pos += 1
+
+    for intent in PRIORITY:
+        if intent in seen:
+            if period and intent != "list_meetings":
+                return None  # "tomorrow" after a greeting is a scheduling detail
+            return intent, period
+    return None
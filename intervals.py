@@ -0,0 +1,126 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+
+def parse_iso(value):
+    """Parse an ISO timestamp as returned by the Calendar API ('Z' suffix allowed)."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class BusyIndex:
+    """
+    Sorted, merged set of busy intervals answering window queries with bisect.
+
+    Intervals are kept disjoint and ordered, so both the start and the end
+    lists are sorted and any window lookup is O(log n) plus the size of the
+    answer. The two lists are swapped in together as one tuple so readers on
+    other threads never see a half-applied insert.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = ([], [])
+        for start, end in intervals:
+            self.add(start, end)
+
+    @classmethod
+    def from_freebusy(cls, busy_times):
+        """Build an index from a freebusy ``busy`` list of {'start', 'end'} dicts."""
+        intervals = sorted((parse_iso(b['start']), parse_iso(b['end'])) for b in busy_times)
+        return cls.from_merged(merge_sorted(intervals))
+
+    @classmethod
+    def from_merged(cls, intervals):
+        """Build an index in O(n) from intervals already sorted and disjoint."""
+        index = cls()
+        index._intervals = ([s for s, _ in intervals], [e for _, e in intervals])
+        return index
+
+    def __len__(self):
+        return len(self._intervals[0])
+
+    def __iter__(self):
+        starts, ends = self._intervals
+        return iter(list(zip(starts, ends)))
+
+    def add(self, start, end):
+        """Insert a busy interval, merging it with any it touches or overlaps."""
+        start, end = parse_iso(start), parse_iso(end)
+        if end <= start:
+            return
+        starts, ends = self._intervals
+        # First interval ending at or after our start, first starting after our end
+        lo = bisect_left(ends, start)
+        hi = bisect_right(starts, end)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi - 1])
+        self._intervals = (
+            starts[:lo] + [start] + starts[hi:],
+            ends[:lo] + [end] + ends[hi:],
+        )
+
+    def overlaps(self, start, end):
+        """True if any busy interval intersects the half-open window [start, end)."""
+        starts, ends = self._intervals
+        i = bisect_right(ends, start)
+        return i < len(starts) and starts[i] < end
+
+    def busy_between(self, start, end):
+        """Busy intervals intersecting [start, end), clipped to the window."""
+        starts, ends = self._intervals
+        i = bisect_right(ends, start)
+        result = []
+        while i < len(starts) and starts[i] < end:
+            result.append((max(starts[i], start), min(ends[i], end)))
+            i += 1
+        return result
+
+    def free_slots(self, start, end, duration_minutes):
+        """
+        Free gaps of at least ``duration_minutes`` inside [start, end)
+
+        Returns:
+            List of slot dicts in the same format as ``find_free_slots``
+        """
+        start, end = parse_iso(start), parse_iso(end)
+        needed = duration_minutes * 60
+        free_slots = []
+        last_end = start
+
+        for busy_start, busy_end in self.busy_between(start, end):
+            if (busy_start - last_end).total_seconds() >= needed:
+                free_slots.append(make_slot(last_end, busy_start))
+            last_end = max(last_end, busy_end)
+
+        if (end - last_end).total_seconds() >= needed:
+            free_slots.append(make_slot(last_end, end))
+
+        return free_slots
+
+
+def merge_sorted(intervals):
+    """
+    Union of (start, end) intervals given in start order
+
+    Overlapping and touching intervals are coalesced in a single sweep.
+    """
+    merged = []
+    for start, end in intervals:
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def make_slot(start, end):
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'duration_minutes': int((end - start).total_seconds() / 60)
+    }
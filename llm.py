@@ -1,61 +1,216 @@
-import os
-import re
-import json
-import requests
-from dotenv import load_dotenv
-
-# Load .env file
-load_dotenv()
-
-# Get Google API key
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY environment variable is not set")
-
-# Gemini API endpoint
-GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}"
-
-def chat_with_llm(prompt):
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {"text": f"You are a helpful scheduler assistant. Only respond with JSON.\n{prompt}"}
-                ]
-            }
-        ]
-    }
-
-    response = requests.post(GEMINI_URL, json=payload)
-    if response.status_code != 200:
-        raise RuntimeError(f"Gemini API error: {response.status_code} {response.text}")
-
-    data = response.json()
-    # Extract the generated text
-    try:
-        content = data["candidates"][0]["content"]["parts"][0]["text"]
-        return content
-    except (KeyError, IndexError):
-        return None
-
-def extract_json_from_llm_response(llm_response):
-    """
-    Extract first JSON object from LLM response.
-    """
-    match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-    if match:
-        json_text = match.group(0)
-        try:
-            return json.loads(json_text)
-        except json.JSONDecodeError:
-            return None
-    return None
-
-# # Example usage:
-# if __name__ == "__main__":
-#     prompt = "Schedule a meeting with Alice tomorrow at 3 PM."
-#     response_text = chat_with_llm(prompt)
-#     print("Raw LLM response:", response_text)
-
-#     json_data = extract_json_from_llm_response(response_text)
-#     print("Extracted JSON:", json_data)
+import os
+import re
+import json
+import threading
+import requests
+from dotenv import load_dotenv
+import resilience
+from http_pool import PooledClient
+from metrics import REGISTRY, LLM_LATENCY, LLM_CALLS
+from resilience import RETRYABLE_STATUSES, TransientError, parse_retry_after
+
+# Load .env file
+load_dotenv()
+
+# Gemini model endpoint, overridable with GEMINI_MODEL_URL
+DEFAULT_MODEL_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash"
+
+# Ask Gemini for schema-constrained JSON instead of free text
+STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") != "0"
+
+# Keep-alive connection pool shared by all worker threads. Pool size and
+# timeouts come from LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT and LLM_READ_TIMEOUT.
+llm_client = PooledClient()
+
+def _gemini_url(method):
+    """
+    Endpoint URL for a Gemini method
+
+    The API key is read on each call rather than at import, so the web app
+    can start (and serve the fast path) without it.
+    """
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable is not set")
+    model_url = os.getenv("GEMINI_MODEL_URL", DEFAULT_MODEL_URL)
+    return f"{model_url}:{method}?key={api_key}"
+
+def _build_payload(prompt, response_schema=None):
+    payload = {
+        "contents": [
+            {
+                "parts": [
+                    {"text": f"You are a helpful scheduler assistant. Only respond with JSON.\n{prompt}"}
+                ]
+            }
+        ]
+    }
+    if response_schema:
+        payload["generationConfig"] = {
+            "responseMimeType": "application/json",
+            "responseSchema": response_schema,
+            "temperature": 0,
+        }
+    return payload
+
+def _candidate_text(data):
+    try:
+        return "".join(part.get("text", "") for part in data["candidates"][0]["content"]["parts"])
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def _post(url, payload):
+    """
+    One Gemini request
+
+    Throttling and server errors raise TransientError (with the server's
+    Retry-After) so resilience.call retries them; other errors do not.
+    """
+    response = llm_client.post(url, json=payload)
+    if response.status_code == 200:
+        return response
+    message = f"Gemini API error: {response.status_code} {response.text}"
+    response.close()
+    if response.status_code in RETRYABLE_STATUSES:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        raise TransientError(message, response.status_code, retry_after)
+    raise RuntimeError(message)
+
+def chat_with_llm(prompt, response_schema=None):
+    """
+    Send a prompt to Gemini and return the generated text
+
+    With ``response_schema`` the model is constrained to emit a single JSON
+    document matching the schema (structured output mode). Throttling,
+    server errors and timeouts are retried with backoff (see resilience.py).
+    """
+    url = _gemini_url("generateContent")
+    payload = _build_payload(prompt, response_schema)
+
+    LLM_CALLS.inc(mode="blocking")
+    with LLM_LATENCY.time():
+        try:
+            response = resilience.call("gemini", lambda: _post(url, payload))
+        except requests.Timeout as e:
+            raise RuntimeError(f"Gemini API timed out: {e}")
+
+        data = response.json()
+    # Extract the generated text
+    return _candidate_text(data)
+
+def extract_json_from_llm_response(llm_response):
+    """
+    Extract first JSON object from LLM response.
+    """
+    if not llm_response:
+        return None
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r'\{', llm_response):
+        try:
+            obj, _ = decoder.raw_decode(llm_response, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(obj, dict):
+            return obj
+    return None
+
+class ParseStats:
+    """Outcome counters for turning LLM output into JSON, per output mode"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def record(self, mode, outcome):
+        with self._lock:
+            key = (mode, outcome)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for (mode, outcome), count in self.counts.items():
+                result.setdefault(mode, {"parsed": 0, "fallback": 0, "failed": 0})[outcome] = count
+            return result
+
+PARSE_STATS = ParseStats()
+
+def _collect_parse_metrics():
+    samples = [
+        ({"mode": mode, "outcome": outcome}, count)
+        for mode, outcomes in sorted(PARSE_STATS.snapshot().items())
+        for outcome, count in sorted(outcomes.items())
+    ]
+    return [("scheduler_llm_parse_total", "counter", "LLM replies by parse outcome", samples)]
+
+REGISTRY.register_collector(_collect_parse_metrics)
+
+_SCHEMA_TYPES = {
+    "INTEGER": int,
+    "NUMBER": (int, float),
+    "STRING": str,
+    "BOOLEAN": bool,
+}
+
+def validate_against_schema(obj, schema):
+    """
+    Keep only the fields of ``obj`` whose values match the schema types.
+
+    Integers given as numeric strings are coerced; anything else that does
+    not match is dropped. Returns None if ``obj`` is not a JSON object.
+    """
+    if not isinstance(obj, dict):
+        return None
+    properties = schema.get("properties", {})
+    result = {}
+    for key, value in obj.items():
+        spec = properties.get(key)
+        if spec is None or value is None:
+            continue
+        expected = _SCHEMA_TYPES.get(spec.get("type", "").upper())
+        if spec.get("type", "").upper() == "INTEGER" and isinstance(value, (str, float)):
+            try:
+                value = int(float(value))
+            except (ValueError, OverflowError):
+                continue
+        if expected and isinstance(value, expected) and not (
+            expected is int and isinstance(value, bool)
+        ):
+            result[key] = value
+    return result
+
+def parse_llm_json(llm_response, response_schema=None):
+    """
+    Parse an LLM reply into a dict
+
+    Structured-mode replies are loaded directly and validated against the
+    schema; a reply that is not clean JSON falls back to scanning the text
+    for the first JSON object. Every outcome is counted in PARSE_STATS.
+    """
+    mode = "structured" if response_schema else "freeform"
+    if response_schema and llm_response:
+        try:
+            parsed = validate_against_schema(json.loads(llm_response), response_schema)
+        except json.JSONDecodeError:
+            parsed = None
+        if parsed is not None:
+            PARSE_STATS.record(mode, "parsed")
+            return parsed
+
+    parsed = extract_json_from_llm_response(llm_response)
+    if parsed is not None and response_schema:
+        parsed = validate_against_schema(parsed, response_schema)
+    if parsed is None:
+        PARSE_STATS.record(mode, "failed")
+    else:
+        PARSE_STATS.record(mode, "fallback" if response_schema else "parsed")
+    return parsed
+
+# # Example usage:
+# if __name__ == "__main__":
+#     prompt = "Schedule a meeting with Alice tomorrow at 3 PM."
+#     response_text = chat_with_llm(prompt)
+#     print("Raw LLM response:", response_text)
+
+#     json_data = extract_json_from_llm_response(response_text)
+#     print("Extracted JSON:", json_data)
@@ -0,0 +1,155 @@
+"""
+Minimal in-process metrics with Prometheus text exposition
+
+Counters and histograms are plain Python objects guarded by a lock, so
+recording a sample costs a dict lookup and an addition. Stats kept
+elsewhere (caches, parse counters) are exported through collector
+functions that are only called when /metrics is scraped.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    pairs = list(zip(names, values))
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum {_format_value(self._sum)}")
+            lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def register_collector(self, collect):
+        """
+        Register a function returning [(name, type, help, [(labels, value)])]
+
+        Collectors are evaluated at scrape time only.
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        for collect in list(self._collectors):
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_text = _format_labels(labels.keys(), labels.values())
+                    lines.append(f"{name}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+LLM_LATENCY = REGISTRY.histogram(
+    "scheduler_llm_request_seconds", "Gemini request latency in seconds")
+FREEBUSY_LATENCY = REGISTRY.histogram(
+    "scheduler_freebusy_request_seconds", "Calendar freebusy query latency in seconds")
+INSERT_LATENCY = REGISTRY.histogram(
+    "scheduler_event_insert_seconds", "Calendar event insert latency in seconds")
+PROCESS_LATENCY = REGISTRY.histogram(
+    "scheduler_process_seconds", "Total /process handling time in seconds")
+
+LLM_CALLS = REGISTRY.counter(
+    "scheduler_llm_calls_total", "Gemini requests sent", ["mode"])
+ERRORS = REGISTRY.counter(
+    "scheduler_errors_total", "Errors by pipeline stage", ["stage"])
+INTENTS = REGISTRY.counter(
+    "scheduler_intents_total", "Messages answered by the local intent router", ["intent"])
+RETRIES = REGISTRY.counter(
+    "scheduler_retries_total", "Backend calls retried after a transient failure", ["backend"])
@@ -0,0 +1,131 @@
+"""
+Fast, memoized normalization of date and time strings
+
+Common forms (ISO dates, today/tomorrow, weekday names, "Oct 25",
+"3 PM", "15:30", "noon") are matched by precompiled patterns; anything
+else falls back to dateutil's fuzzy parser. Results are memoized per
+(text, reference date), so repeated turns and the per-day suggestion loop
+parse each string once.
+"""
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from dateutil import parser as date_parser
+
+MEMO_SIZE = 4096
+
+_WEEKDAY_NUMBERS = {name.lower(): i for i, name in enumerate(calendar.day_name)}
+_WEEKDAY_NUMBERS.update({name.lower(): i for i, name in enumerate(calendar.day_abbr)})
+_WEEKDAY_NUMBERS.update({"tues": 1, "thur": 3, "thurs": 3})
+_MONTH_NUMBERS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTH_NUMBERS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_MONTH_NUMBERS["sept"] = 9
+_RELATIVE_DAYS = {"today": 0, "tomorrow": 1, "day after tomorrow": 2, "the day after tomorrow": 2}
+
+_ISO_DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_WEEKDAY_RE = re.compile(
+    r"(?:(?:on|this|next)\s+)?(" + "|".join(sorted(_WEEKDAY_NUMBERS, key=len, reverse=True)) + r")\.?"
+)
+_MONTH_DAY_RE = re.compile(
+    r"(?:on\s+)?(?:(?P<month>[a-z]+)\.?\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+    r"|(?P<day2>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month2>[a-z]+)\.?)"
+)
+_TIME_RE = re.compile(
+    r"(?:at\s+)?(?:(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>[ap])\.?\s*m\.?"
+    r"|(?P<hour24>\d{1,2}):(?P<minute24>\d{2})"
+    r"|(?P<named>noon|midday))"
+)
+
+
+def normalize_date(value, today=None):
+    """
+    Resolve a date expression to an ISO date string
+
+    Weekday names resolve to their next occurrence, today included, as
+    dateutil does. Month/day forms without a year use the current year.
+
+    Args:
+        value: Text such as "2024-05-03", "tomorrow", "Friday" or "May 3rd"
+        today: Reference date (default: today, UTC)
+
+    Returns:
+        "YYYY-MM-DD", or None if the text is not understood
+    """
+    if not isinstance(value, str):
+        return None
+    return _normalize_date(value.strip().lower(), today or datetime.utcnow().date())
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _normalize_date(text, today):
+    match = _ISO_DATE_RE.fullmatch(text)
+    if match:
+        try:
+            return date(*map(int, match.groups())).isoformat()
+        except ValueError:
+            return None
+
+    if text in _RELATIVE_DAYS:
+        return (today + timedelta(days=_RELATIVE_DAYS[text])).isoformat()
+
+    match = _WEEKDAY_RE.fullmatch(text)
+    if match:
+        days_ahead = (_WEEKDAY_NUMBERS[match.group(1)] - today.weekday()) % 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+
+    match = _MONTH_DAY_RE.fullmatch(text)
+    if match:
+        month = _MONTH_NUMBERS.get(match.group("month") or match.group("month2"))
+        day = int(match.group("day") or match.group("day2"))
+        if month:
+            try:
+                return date(today.year, month, day).isoformat()
+            except ValueError:
+                return None
+
+    try:
+        parsed = date_parser.parse(
+            text, fuzzy=True, default=datetime.combine(today, datetime.min.time())
+        )
+    except (ValueError, OverflowError):
+        return None
+    return parsed.date().isoformat()
+
+
+def parse_time(value):
+    """
+    Parse a time-of-day expression
+
+    Args:
+        value: Text such as "3 PM", "3:30pm", "15:30" or "noon"
+
+    Returns:
+        (hour, minute) tuple, or None if the text is not understood
+    """
+    if not isinstance(value, str):
+        return None
+    return _parse_time(value.strip().lower())
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _parse_time(text):
+    match = _TIME_RE.fullmatch(text)
+    if match:
+        if match.group("named"):
+            return 12, 0
+        if match.group("hour24") is not None:
+            hour, minute = int(match.group("hour24")), int(match.group("minute24"))
+            if hour < 24 and minute < 60:
+                return hour, minute
+        else:
+            hour, minute = int(match.group("hour")), int(match.group("minute") or 0)
+            if 1 <= hour <= 12 and minute < 60:
+                return hour % 12 + (12 if match.group("ampm") == "p" else 0), minute
+
+    try:
+        parsed = date_parser.parse(text, fuzzy=True)
+    except (ValueError, OverflowError):
+        return None
+    return parsed.hour, parsed.minute
@@ -0,0 +1,90 @@
+import json
+import os
+from datetime import datetime, timezone
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "600"))
+
+EXTRACTION_INSTRUCTIONS = """
+You extract meeting scheduling details from the user's latest message.
+Reply with one JSON object and nothing else, containing only the fields the message provides:
+{
+  "duration_minutes": int,
+  "date": str (YYYY-MM-DD or day name),
+  "time_pref": str (e.g. "3 PM"),
+  "deadline": str (YYYY-MM-DD or day name the meeting must happen by),
+  "request_suggestions": bool (true if asking for available dates/times),
+  "is_date_selection": bool (true if choosing one of the suggested dates)
+}
+Resolve relative dates such as "tomorrow" against the current date.
+If the message has no new meeting details, reply {}.
+"""
+
+
+# Gemini responseSchema for structured output, mirroring the fields above
+MEETING_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "duration_minutes": {"type": "INTEGER", "nullable": True},
+        "date": {"type": "STRING", "nullable": True},
+        "time_pref": {"type": "STRING", "nullable": True},
+        "deadline": {"type": "STRING", "nullable": True},
+        "request_suggestions": {"type": "BOOLEAN", "nullable": True},
+        "is_date_selection": {"type": "BOOLEAN", "nullable": True},
+    },
+}
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+class PromptTemplate:
+    """
+    Prompt with a static prefix compiled once and a small per-turn suffix
+
+    The prefix never changes between turns, so it is built and measured a
+    single time and stays byte-identical (which also lets the model
+    provider reuse its prefix cache). Each turn only formats the variable
+    fields, and the user message is trimmed if the prompt would exceed
+    ``token_budget``.
+    """
+
+    def __init__(self, instructions, token_budget=DEFAULT_TOKEN_BUDGET):
+        self.prefix = instructions.strip() + "\n\n"
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.token_budget = token_budget
+        if self.prefix_tokens >= token_budget:
+            raise ValueError(
+                f"Prompt prefix needs ~{self.prefix_tokens} tokens, over the budget of {token_budget}"
+            )
+
+    def build(self, state, user_input, suggested_dates=(), now=None):
+        """
+        Build the prompt for one turn
+
+        Returns:
+            Tuple of (prompt text, estimated token count)
+        """
+        now = now or datetime.now(timezone.utc)
+        context = (
+            f"Current date and time: {now.strftime('%Y-%m-%d %H:%M %Z (%A)')}\n"
+            f"Current meeting state: {json.dumps(state, separators=(',', ':'))}\n"
+        )
+        if suggested_dates:
+            options = ", ".join(
+                f"{i}={d['date']}" + (f" {d['time']}" if d.get("time") else "")
+                for i, d in enumerate(suggested_dates, 1)
+            )
+            context += f"Suggested dates: {options}\n"
+
+        remaining = self.token_budget - self.prefix_tokens - estimate_tokens(context + "User input: \n")
+        max_chars = max(remaining, 0) * 4
+        if len(user_input) > max_chars:
+            user_input = user_input[:max_chars]
+
+        prompt = f"{self.prefix}{context}User input: {user_input}\n"
+        return prompt, estimate_tokens(prompt)
+
+
+EXTRACTION_PROMPT = PromptTemplate(EXTRACTION_INSTRUCTIONS)
@@ -0,0 +1,184 @@
+"""
+Recurring meetings: conflict check across every occurrence, one insert
+
+A series ("weekly 1:1 every Tuesday for a quarter") is given as an
+RFC 5545 RRULE and expanded with dateutil. All occurrences are checked
+against a single busy-interval fetch spanning the whole series (one
+freebusy round trip, or none when the calendar mirror covers it), each
+with an O(log n) bisect lookup in the BusyIndex, rather than one
+freebusy query per occurrence. Conflicting occurrences are reported;
+with ``skip_conflicts`` they are left out of the series as EXDATEs.
+The series is then created with one recurring events.insert.
+
+Times are UTC, like the rest of the scheduler, so a weekly 15:00 UTC
+meeting stays at 15:00 UTC across daylight-saving changes.
+"""
+import logging
+import os
+import re
+from datetime import timezone
+
+from dateutil.rrule import rrulestr
+
+from bulk_scheduler import resolve_slot
+from google_calendar import (
+    build_event_body,
+    fetch_busy_index,
+    idempotent_event_id,
+    insert_event,
+    meeting_links,
+    notify_meeting_created,
+    record_busy,
+)
+from metrics import ERRORS, INSERT_LATENCY
+
+logger = logging.getLogger(__name__)
+
+MAX_OCCURRENCES = int(os.getenv("RECURRENCE_MAX_OCCURRENCES", "366"))
+
+_UNTIL_RE = re.compile(r"UNTIL=(\d{8})(T\d{6})?Z?", re.IGNORECASE)
+
+
+def normalize_rrule(rule):
+    """
+    Canonical RRULE text without the "RRULE:" prefix
+
+    A series must end (COUNT or UNTIL) so it can be checked. UNTIL is
+    rewritten in UTC, as both dateutil and Google require for a start
+    with a time zone; a date-only UNTIL covers that whole day.
+    """
+    rule = rule.strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    rule = rule.upper()
+    if "COUNT=" not in rule and "UNTIL=" not in rule:
+        raise ValueError("The recurrence needs an end: COUNT=n or UNTIL=YYYYMMDD")
+    return _UNTIL_RE.sub(lambda m: f"UNTIL={m.group(1)}{m.group(2) or 'T235959'}Z", rule)
+
+
+def expand_occurrences(start_dt, end_dt, rule, max_occurrences=None):
+    """
+    Every (start, end) of a series, in order
+
+    The first occurrence is the first match of the rule at or after
+    ``start_dt``, at the same clock time.
+
+    Args:
+        start_dt: Start of the first meeting (aware datetime)
+        end_dt: Its end; every occurrence has the same duration
+        rule: RRULE text (see normalize_rrule)
+        max_occurrences: Longest series accepted (RECURRENCE_MAX_OCCURRENCES)
+
+    Returns:
+        List of (start, end) datetimes
+    """
+    max_occurrences = max_occurrences or MAX_OCCURRENCES
+    duration = end_dt - start_dt
+    starts = []
+    for occurrence in rrulestr(normalize_rrule(rule), dtstart=start_dt):
+        if len(starts) == max_occurrences:
+            raise ValueError(f"The series has more than {max_occurrences} occurrences")
+        starts.append(occurrence)
+    if not starts:
+        raise ValueError("The recurrence has no occurrences")
+    return [(start, start + duration) for start in starts]
+
+
+def find_conflicts(busy_index, occurrences):
+    """Indexes of the occurrences that overlap a busy interval."""
+    return [i for i, (start, end) in enumerate(occurrences) if busy_index.overlaps(start, end)]
+
+
+def check_series(service, occurrences):
+    """
+    Check every occurrence with one busy-interval fetch covering the series
+
+    Returns:
+        List of conflicting occurrence indexes
+
+    Raises:
+        RuntimeError: The calendar returned no availability data
+    """
+    busy_index = fetch_busy_index(service, occurrences[0][0].isoformat(), occurrences[-1][1].isoformat())
+    if busy_index is None:
+        raise RuntimeError("Could not read calendar availability")
+    return find_conflicts(busy_index, occurrences)
+
+
+def _exdate(start):
+    return start.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def schedule_recurring(service, spec):
+    """
+    Check and create a recurring meeting
+
+    Args:
+        service: Google Calendar service object
+        spec: Dict with ``rrule``, ``duration_minutes``, ``start`` or
+            ``date``/``time_pref`` (as for bulk_scheduler.resolve_slot),
+            optional summary, description and attendees, and
+            ``skip_conflicts`` to create the series without the
+            conflicting occurrences instead of not at all
+
+    Returns:
+        Dict with ``status`` (created, conflict, invalid or error), the
+        number of ``occurrences``, the ``conflicts`` as {index, start,
+        end} dicts, and the event's links once created
+    """
+    try:
+        first_start, first_end = resolve_slot(spec)
+        rule = normalize_rrule(spec["rrule"])
+        occurrences = expand_occurrences(first_start, first_end, rule)
+    except KeyError as e:
+        return {"status": "invalid", "error": f"missing field {e.args[0]}"}
+    except (AttributeError, TypeError, ValueError) as e:
+        return {"status": "invalid", "error": str(e)}
+
+    try:
+        conflicts = check_series(service, occurrences)
+    except Exception as e:
+        ERRORS.inc(stage="freebusy")
+        logger.error("Error checking recurring meeting: %s", e)
+        return {"status": "error", "error": str(e)}
+
+    result = {
+        "occurrences": len(occurrences),
+        "conflicts": [
+            {"index": i, "start": occurrences[i][0].isoformat(), "end": occurrences[i][1].isoformat()}
+            for i in conflicts
+        ],
+    }
+    busy = set(conflicts)
+    booked = [occurrence for i, occurrence in enumerate(occurrences) if i not in busy]
+    if conflicts and (not spec.get("skip_conflicts") or not booked):
+        result.update(status="conflict", error=f"{len(conflicts)} of {len(occurrences)} occurrences are busy")
+        return result
+
+    recurrence = [f"RRULE:{rule}"]
+    if conflicts:
+        recurrence.append("EXDATE:" + ",".join(_exdate(occurrences[i][0]) for i in conflicts))
+    summary = spec.get("summary") or "Scheduled Meeting"
+    attendees = spec.get("attendees")
+    # The series starts at its first occurrence, which need not be the requested start
+    start_dt, end_dt = occurrences[0]
+    event = build_event_body(
+        start_dt, end_dt, summary, spec.get("description", ""), attendees,
+        event_id=idempotent_event_id(service, start_dt, end_dt, summary, attendees, recurrence=recurrence),
+    )
+    event["recurrence"] = recurrence
+
+    try:
+        with INSERT_LATENCY.time():
+            links = meeting_links(insert_event(service, event))
+    except Exception as e:
+        ERRORS.inc(stage="insert")
+        logger.error("Error creating recurring meeting: %s", e)
+        result.update(status="error", error=str(e))
+        return result
+
+    for start, end in booked:
+        record_busy(service, start, end)
+    notify_meeting_created(service, start_dt.isoformat(), end_dt.isoformat(), summary, links)
+    result.update(status="created", **links)
+    return result
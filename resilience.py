@@ -0,0 +1,246 @@
+"""
+Retries and circuit breakers for calls to Gemini and Google Calendar
+
+``call(backend, fn)`` runs ``fn`` and retries transient failures (HTTP
+408/429/5xx, Calendar rate-limit 403s, timeouts and dropped connections)
+with capped exponential backoff and full jitter. A Retry-After from the
+server replaces the computed delay; one longer than RETRY_MAX_DELAY is
+not waited out and the error is raised instead.
+
+Each backend has a CircuitBreaker. After BREAKER_FAILURE_THRESHOLD
+transient failures in a row it opens and calls fail at once with
+CircuitOpenError, so a struggling backend is not hammered by every
+worker's retries; after BREAKER_RESET_SECONDS one trial call is let
+through and its outcome closes or re-opens the circuit.
+"""
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from metrics import REGISTRY, RETRIES
+
+logger = logging.getLogger(__name__)
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+# Calendar reports quota exhaustion as 403 with one of these reasons
+_RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+
+
+class TransientError(RuntimeError):
+    """A retryable failure reported by a backend, with its Retry-After if any"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+def parse_retry_after(value, now=None):
+    """
+    Seconds to wait according to a Retry-After header
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+        now: Reference time for HTTP dates (default: now, UTC)
+
+    Returns:
+        Non-negative float, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+
+def http_status(exc):
+    """HTTP status of a googleapiclient HttpError (or lookalike), else None"""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "resp", None), "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc):
+    """
+    Decide whether a failed call is worth retrying
+
+    Returns:
+        (retryable, retry_after) where retry_after is the server-requested
+        delay in seconds or None
+    """
+    if isinstance(exc, TransientError):
+        return True, exc.retry_after
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return True, None
+
+    status = http_status(exc)
+    if status is None:
+        return False, None
+    resp = getattr(exc, "resp", None)
+    retry_after = parse_retry_after(resp.get("retry-after")) if hasattr(resp, "get") else None
+    if status in RETRYABLE_STATUSES:
+        return True, retry_after
+    if status == 403:
+        content = getattr(exc, "content", b"") or b""
+        if isinstance(content, str):
+            content = content.encode()
+        return any(reason in content for reason in _RATE_LIMIT_REASONS), retry_after
+    return False, None
+
+
+def backoff_delay(attempt, retry_after=None, base=None, cap=None):
+    """
+    Seconds to sleep before retry number ``attempt + 1``
+
+    Full jitter: uniform between 0 and min(cap, base * 2**attempt).
+
+    Returns:
+        The delay, or None when the server asked for more than ``cap``
+    """
+    base = RETRY_BASE_DELAY if base is None else base
+    cap = RETRY_MAX_DELAY if cap is None else cap
+    if retry_after is not None:
+        return retry_after if retry_after <= cap else None
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one backend
+
+    Closed: calls pass. Open: calls are refused until ``reset_seconds``
+    have passed. Half-open: one trial call passes; success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds=BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._trial_running = False
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("%s circuit closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (
+                self.state == "closed" and self.failures >= self.failure_threshold
+            ):
+                if self.state == "closed":
+                    logger.warning("%s circuit opened after %d failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = self._clock()
+                self._trial_running = False
+
+
+BREAKERS = {
+    "gemini": CircuitBreaker("gemini"),
+    "calendar": CircuitBreaker("calendar"),
+}
+
+
+def call(backend, fn, max_attempts=None, sleep=time.sleep):
+    """
+    Call ``fn()`` through the backend's circuit breaker, retrying transient failures
+
+    Errors that are not transient (a 400, a 404, a 409) are raised at once
+    and count as the backend being reachable.
+
+    Args:
+        backend: Key into BREAKERS, e.g. "gemini" or "calendar"
+        fn: Zero-argument callable making one attempt
+        max_attempts: Attempts before giving up (default RETRY_MAX_ATTEMPTS)
+
+    Returns:
+        Whatever ``fn`` returns
+    """
+    breaker = BREAKERS[backend]
+    max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    for attempt in range(max_attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{backend} is unavailable (circuit open)")
+        try:
+            result = fn()
+        except Exception as e:
+            retryable, retry_after = classify(e)
+            if not retryable:
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            delay = backoff_delay(attempt, retry_after)
+            if attempt + 1 >= max_attempts or delay is None:
+                raise
+            RETRIES.inc(backend=backend)
+            logger.warning("%s call failed (%s); retry %d in %.2fs", backend, e, attempt + 1, delay)
+            sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def _collect_breaker_metrics():
+    return [
+        ("scheduler_circuit_open", "gauge", "1 while a backend's circuit breaker is not closed",
+         [({"backend": name}, int(b.state != "closed")) for name, b in sorted(BREAKERS.items())]),
+        ("scheduler_circuit_rejected_total", "counter", "Calls refused by an open circuit breaker",
+         [({"backend": name}, b.rejected) for name, b in sorted(BREAKERS.items())]),
+    ]
+
+
+REGISTRY.register_collector(_collect_breaker_metrics)
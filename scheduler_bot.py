@@ -1,434 +1,516 @@
-from google_calendar import get_calendar_service, find_free_slots, create_meeting
-from voice import speak
-from llm import chat_with_llm, extract_json_from_llm_response
-from datetime import datetime, timedelta, timezone
-import calendar
-from dateutil import parser as date_parser
-
-# State accumulator
-MEETING_STATE = {
-    "duration_minutes": None,
-    "date": None,
-    "time_pref": None,
-    "deadline": None,
-}
-
-
-def parse_date_or_day(value):
-    today = datetime.utcnow().date()
-    try:
-        dt = date_parser.parse(
-            value, fuzzy=True, default=datetime.combine(today, datetime.min.time())
-        )
-        return dt.date().isoformat()
-    except Exception:
-        try:
-            target_weekday = list(calendar.day_name).index(value.capitalize())
-            days_ahead = (target_weekday - today.weekday() + 7) % 7
-            if days_ahead == 0:
-                days_ahead = 7
-            target_date = today + timedelta(days=days_ahead)
-            return target_date.isoformat()
-        except ValueError:
-            return None
-
-
-def find_available_dates_before_deadline(
-    service, duration_minutes, time_pref, deadline_str
-):
-    deadline_date = datetime.strptime(deadline_str, "%Y-%m-%d").date()
-    today = datetime.utcnow().date()
-
-    # If deadline is in the past, start from today
-    start_date = max(today, today)
-
-    available_dates = []
-    current_date = start_date
-
-    # Check up to 14 days or until deadline, whichever comes first
-    max_days_to_check = min(14, (deadline_date - start_date).days + 1)
-    days_checked = 0
-
-    while (
-        current_date <= deadline_date
-        and len(available_dates) < 7
-        and days_checked < max_days_to_check
-    ):
-        days_checked += 1
-
-        # Skip today if it's already past preferred time
-        if current_date == today:
-            current_datetime = datetime.now()
-            try:
-                time_obj = date_parser.parse(time_pref, fuzzy=True)
-                preferred_time = current_datetime.replace(
-                    hour=time_obj.hour, minute=time_obj.minute, second=0, microsecond=0
-                )
-                if current_datetime >= preferred_time:
-                    current_date += timedelta(days=1)
-                    continue
-            except:
-                pass
-
-        # Check if this date has availability
-        try:
-            date_obj = datetime.combine(current_date, datetime.min.time())
-            time_obj = date_parser.parse(time_pref, fuzzy=True)
-            start_dt = datetime(
-                date_obj.year,
-                date_obj.month,
-                date_obj.day,
-                time_obj.hour,
-                time_obj.minute,
-                tzinfo=timezone.utc,
-            )
-            end_dt = start_dt + timedelta(minutes=duration_minutes)
-
-            time_min = start_dt.isoformat()
-            time_max = end_dt.isoformat()
-
-            free_slots = find_free_slots(service, duration_minutes, time_min, time_max)
-
-            if free_slots:
-                day_name = current_date.strftime("%A")
-                available_dates.append(
-                    {
-                        "date": current_date.isoformat(),
-                        "day": day_name,
-                        "formatted": current_date.strftime("%Y-%m-%d (%A)"),
-                    }
-                )
-        except Exception as e:
-            print(f"Error checking date {current_date}: {e}")
-
-        current_date += timedelta(days=1)
-
-    return available_dates
-
-
-def is_greeting_or_casual(user_input):
-    """
-    Check if the input is a greeting or casual conversation
-    """
-    greetings = [
-        "hi",
-        "hello",
-        "hey",
-        "good morning",
-        "good afternoon",
-        "good evening",
-        "how are you",
-        "what's up",
-        "whats up",
-        "sup",
-        "yo",
-        "hiya",
-    ]
-    casual_phrases = [
-        "thanks",
-        "thank you",
-        "bye",
-        "goodbye",
-        "see you",
-        "ok",
-        "okay",
-        "cool",
-    ]
-
-    user_lower = user_input.lower().strip()
-
-    # Check exact matches
-    if user_lower in greetings + casual_phrases:
-        return True
-
-    # Check if input starts with common greetings
-    for greeting in greetings:
-        if user_lower.startswith(greeting):
-            return True
-
-    return False
-
-
-def handle_greeting_or_casual(user_input):
-    """
-    Handle greetings and casual conversation
-    """
-    user_lower = user_input.lower().strip()
-
-    # Greetings
-    if any(
-        greeting in user_lower
-        for greeting in [
-            "hi",
-            "hello",
-            "hey",
-            "good morning",
-            "good afternoon",
-            "good evening",
-        ]
-    ):
-        return "Hello! I'm here to help you schedule meetings. You can tell me things like 'Schedule a 30-minute meeting on Monday at 2 PM' or 'I need a meeting before Friday at 10 AM'. What would you like to schedule?"
-
-    # Appreciation
-    if any(thanks in user_lower for thanks in ["thanks", "thank you"]):
-        return "You're welcome! Is there anything else I can help you schedule?"
-
-    # Goodbye
-    if any(bye in user_lower for bye in ["bye", "goodbye", "see you"]):
-        return "Goodbye! Feel free to come back anytime you need to schedule a meeting."
-
-    # Casual acknowledgments
-    if user_lower in ["ok", "okay", "cool", "got it"]:
-        return "Great! What would you like to schedule?"
-
-    # Default for other casual inputs
-    return "I'm here to help you schedule meetings. You can tell me the duration, date, and time you prefer. What meeting would you like to schedule?"
-
-
-def process_request(user_input, service):
-    # Check if it's a greeting or casual conversation first
-    if is_greeting_or_casual(user_input):
-        return handle_greeting_or_casual(user_input)
-
-    # Build prompt showing current state
-    prompt = f"""
-Current meeting state:
-{MEETING_STATE}
-
-User input:
-{user_input}
-
-You are a helpful and efficient calendar assistant. Your current date and time is {{CURRENT_DATETIME}}.
-
-**Your primary goal is to manage calendar events, either by creating new ones or searching existing ones.**
-
-**Here's how to handle requests:**
-- **If the user wants to create an event:**
-  - **First, gather all essential details:** This includes the **title**, **start time**, and **end time** (or duration to calculate the end time).
-  - **Always ask clarifying questions** if any of these critical pieces of information are missing. Be specific about what you need.
-  - **Once you have the title, start time, and end time, use the `search_calendar_event` tool to check for any overlapping or conflicting events.**
-  - **If `search_calendar_event` finds conflicts:** Report these conflicts clearly to the user. Ask if they want to proceed with the current time, suggest alternative times, or if they wish to alter the event details.
-  - **If no conflicts are found, or the user confirms despite conflicts:** Proceed to use the `create_calendar_event` tool.
-  - **After creating the event, confirm with the user** and provide the event link if available.
-
-- **If the user wants to search for events:**
-  - Directly use the `search_calendar_event` tool. If parameters like `event_name` or `time_min` are missing, ask for them before searching.
-  - If the user refuses to provide the minimum time, consider the current time as minimum time (in ISO format).
-
-- **If the user asks for the current time:** Use the `get_current_date_time` tool.
-
-- **If the user wants to delete events:**
-  - Use `delete_calendar_event` tool if the event_id is known, else use the `search_calendar_event` tool to find the event_id (link) and use `delete_event` tool.
-
-- **If the user wants to list the events:**
-  - Use the `list_calendar_event` tool to list the events starting from a minimum time range.
-
-- **For unrelated requests:** Politely inform the user that you specialize in calendar management and cannot assist with that specific request.
-
-**Key principles for interaction:**
-- Maintain a natural and conversational tone.
-- Be proactive in asking for missing information.
-- Be clear and concise in your responses.
-
-### Example 1: Creating a Meeting
-**User:** I need to schedule a meeting.  
-**Bot:** Sure! How long should the meeting be?  
-**User:** 1 hour.  
-**Bot:** Got it. Do you have a preferred day or time?  
-**User:** Sometime on Tuesday afternoon.  
-**Bot:** Great. I see 2:00 PM and 4:30 PM available on Tuesday. Which works best for you?  
-**User:** 2:00 PM works for me.  
-**Bot:** Perfect! I've scheduled the meeting for 2:00 PM on Tuesday. Anything else I can help you with?
-
-### Example 2: Rescheduling Due to Conflict
-**User:** I'm going to a party this Sunday.  
-**Bot:** Nice! How long will the party last?  
-**User:** About 3 hours, starting at 5 PM.  
-**Bot:** Just a heads-up — you have a meeting at 7 PM on Sunday. Do you want to reschedule it or proceed as planned?  
-**User:** Oh, I forgot. Can you move it to 8 PM?  
-**Bot:** Sure! Would 8:30 PM work better to give you a little buffer after the party?  
-**User:** Yes, that’s better.  
-**Bot:** Great! I’ve rescheduled your meeting to 8:30 PM on Sunday.
-
-### Example 3: Flexible Duration & Time Parsing
-**User:** Can you create an event for a test interview?  
-**Bot:** Of course! What date and time do you want the interview?  
-**User:** It is in 5 hours from now.  
-**Bot:** Got it! How long should the interview last?  
-**User:** I have no idea, can you suggest a time?  
-**Bot:** Typically, interviews last about 30 minutes to an hour. Would you like to schedule it for 30 minutes?  
-**User:** Yes, 30 minutes is fine.  
-**Bot:** Great! I’ll create the event for 30 minutes starting in 5 hours. Anything else you need?  
-**User:** No, that’s all for now. Thanks!
-
-Extract any new info in JSON:
-{{
-  "duration_minutes": 30,
-  "date": "in 5 hours",
-  "time_pref": str optional,
-  "deadline": str optional (day or date),
-  "request_suggestions": bool optional (true if asking for available dates/times),
-  "is_date_selection": bool optional (true if user is selecting from previously suggested dates)
-}}
-Only respond with JSON. If no new info, return {{}}
-"""
-
-    llm_response = chat_with_llm(prompt)
-    print("LLM response:", llm_response)
-    structured = extract_json_from_llm_response(llm_response)
-
-    if not structured:
-        return "I didn't catch any meeting details in your message. Could you please tell me about the meeting you'd like to schedule? For example, 'I need a 30-minute meeting on Monday at 2 PM'."
-
-    # Handle suggestion requests
-    if structured.get("request_suggestions", False):
-        if not all(
-            [
-                MEETING_STATE["duration_minutes"],
-                MEETING_STATE["time_pref"],
-                MEETING_STATE["deadline"],
-            ]
-        ):
-            return "I need the meeting duration, preferred time, and deadline to suggest available dates."
-
-        available_dates = find_available_dates_before_deadline(
-            service,
-            MEETING_STATE["duration_minutes"],
-            MEETING_STATE["time_pref"],
-            MEETING_STATE["deadline"],
-        )
-
-        if not available_dates:
-            return f"No available slots found before {MEETING_STATE['deadline']} at {MEETING_STATE['time_pref']}. Please try a different time or deadline."
-
-        suggestion_text = "Here are available dates before your deadline:\n"
-        for i, date_info in enumerate(available_dates, 1):
-            suggestion_text += f"{i}. {date_info['formatted']}\n"
-        suggestion_text += "\nPlease let me know which date you'd prefer."
-
-        return suggestion_text
-
-    # Handle date selections (don't reset state if user is just selecting a date)
-    is_selecting_date = structured.get("is_date_selection", False) or (
-        "date" in structured
-        and len(structured) == 1
-        and any(MEETING_STATE[k] for k in ["duration_minutes", "time_pref", "deadline"])
-    )
-
-    # If structured includes duration/time_pref AND date, it's a new request (reset state)
-    # If it's just a date selection, don't reset
-    if not is_selecting_date and any(
-        k in structured for k in ["duration_minutes", "time_pref"]
-    ):
-        for k in MEETING_STATE:
-            MEETING_STATE[k] = None
-
-    # Update state
-    for key in MEETING_STATE:
-        if key in structured and structured[key]:
-            MEETING_STATE[key] = structured[key]
-
-    # Normalize date fields
-    if MEETING_STATE["date"]:
-        parsed = parse_date_or_day(MEETING_STATE["date"])
-        if not parsed:
-            return f"I couldn't understand the date: {MEETING_STATE['date']}. Please rephrase."
-        MEETING_STATE["date"] = parsed
-
-    if MEETING_STATE["deadline"]:
-        parsed = parse_date_or_day(MEETING_STATE["deadline"])
-        if not parsed:
-            return f"I couldn't understand the deadline: {MEETING_STATE['deadline']}. Please rephrase."
-        MEETING_STATE["deadline"] = parsed
-
-    # Check for missing fields
-    missing = [k for k, v in MEETING_STATE.items() if not v and k != "deadline"]
-    if missing:
-        return f"Could you provide the following missing details: {', '.join(missing)}?"
-
-    # Check deadline validity - FIXED: Compare date objects, not strings
-    if MEETING_STATE["deadline"]:
-        meeting_date = datetime.strptime(MEETING_STATE["date"], "%Y-%m-%d").date()
-        deadline_date = datetime.strptime(MEETING_STATE["deadline"], "%Y-%m-%d").date()
-
-        if meeting_date > deadline_date:
-            # Suggest available dates
-            available_dates = find_available_dates_before_deadline(
-                service,
-                MEETING_STATE["duration_minutes"],
-                MEETING_STATE["time_pref"],
-                MEETING_STATE["deadline"],
-            )
-
-            if available_dates:
-                suggestion_text = f"The date {MEETING_STATE['date']} is after your deadline {MEETING_STATE['deadline']}. Here are available dates before the deadline:\n"
-                for i, date_info in enumerate(available_dates, 1):
-                    suggestion_text += f"{i}. {date_info['formatted']}\n"
-                suggestion_text += "\nPlease choose one of these dates."
-                return suggestion_text
-            else:
-                return f"The date you provided is after the deadline, and no slots are available before {MEETING_STATE['deadline']} at {MEETING_STATE['time_pref']}. Please try a different time or extend the deadline."
-
-    # Schedule meeting
-    try:
-        duration = int(MEETING_STATE["duration_minutes"])
-    except:
-        return "Invalid duration."
-
-    date_obj = datetime.strptime(MEETING_STATE["date"], "%Y-%m-%d")
-    time_pref = MEETING_STATE["time_pref"]
-
-    try:
-        time_obj = date_parser.parse(time_pref, fuzzy=True)
-        start_dt = datetime(
-            date_obj.year,
-            date_obj.month,
-            date_obj.day,
-            time_obj.hour,
-            time_obj.minute,
-            tzinfo=timezone.utc,
-        )
-    except:
-        return f"Invalid time preference: {time_pref}"
-
-    end_dt = start_dt + timedelta(minutes=duration)
-    time_min = start_dt.isoformat()
-    time_max = end_dt.isoformat()
-
-    free_slots = find_free_slots(service, duration, time_min, time_max)
-
-    if not free_slots:
-        return "No available slots at that time. Please try another time."
-
-    slot = free_slots[0]
-    link = create_meeting(service, slot["start"], slot["end"])
-
-    # Reset state
-    for k in MEETING_STATE:
-        MEETING_STATE[k] = None
-
-    return f"Meeting scheduled from {slot['start']} to {slot['end']}. Link: {link}"
-
-
-def main():
-    service = get_calendar_service()
-    speak("Hi! I can help schedule your meeting. What do you need?")
-    while True:
-        mode = input("Type 'voice' or 'text': ").strip().lower()
-        if mode == "voice":
-            from voice import listen
-
-            user_input = listen()
-        elif mode == "text":
-            user_input = input("Please enter your meeting request: ")
-        else:
-            print("Invalid mode.")
-            continue
-
-        reply = process_request(user_input, service)
-        speak(reply)
-        print(reply)
-
-
-if __name__ == "__main__":
-    main()
+from google_calendar import (
+    get_calendar_service,
+    find_free_slots,
+    fetch_busy_index,
+    create_meeting,
+    list_upcoming_meetings,
+    record_busy,
+)
+from llm import chat_with_llm, parse_llm_json, STRUCTURED_OUTPUT
+from fast_extract import extract_meeting_details, EXTRACTION_STATS
+from prompt import EXTRACTION_PROMPT, MEETING_SCHEMA
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+
+from intents import route_intent
+from intervals import parse_iso
+from metrics import ERRORS, INTENTS
+from normalize import normalize_date, parse_time
+from session_store import Session
+from slot_recommender import suggest_alternatives
+
+logger = logging.getLogger(__name__)
+
+BOOKING_FAILED_REPLY = "Sorry, I couldn't create the meeting in your calendar. Please try again."
+
+
+def parse_date_or_day(value):
+    return normalize_date(value, datetime.utcnow().date())
+
+
+def _candidate_windows(duration_minutes, time_pref, deadline_str):
+    """
+    Yield (date, start_dt, end_dt) for each day to check before the deadline
+    """
+    deadline_date = datetime.strptime(deadline_str, "%Y-%m-%d").date()
+    today = datetime.utcnow().date()
+
+    preferred = parse_time(time_pref)
+    if preferred is None:
+        logger.warning("Could not understand time preference %r", time_pref)
+        return
+    hour, minute = preferred
+
+    # If deadline is in the past, start from today
+    start_date = max(today, today)
+    current_date = start_date
+
+    # Check up to 14 days or until deadline, whichever comes first
+    max_days_to_check = min(14, (deadline_date - start_date).days + 1)
+    days_checked = 0
+
+    while current_date <= deadline_date and days_checked < max_days_to_check:
+        days_checked += 1
+
+        # Skip today if it's already past preferred time
+        if current_date == today:
+            current_datetime = datetime.now()
+            preferred_time = current_datetime.replace(
+                hour=hour, minute=minute, second=0, microsecond=0
+            )
+            if current_datetime >= preferred_time:
+                current_date += timedelta(days=1)
+                continue
+
+        start_dt = datetime(
+            current_date.year,
+            current_date.month,
+            current_date.day,
+            hour,
+            minute,
+            tzinfo=timezone.utc,
+        )
+        end_dt = start_dt + timedelta(minutes=duration_minutes)
+        yield current_date, start_dt, end_dt
+
+        current_date += timedelta(days=1)
+
+
+def _format_available_date(current_date):
+    return {
+        "date": current_date.isoformat(),
+        "day": current_date.strftime("%A"),
+        "formatted": current_date.strftime("%Y-%m-%d (%A)"),
+    }
+
+
+def _format_alternative(slot):
+    start = parse_iso(slot["start"])
+    return {
+        "date": start.date().isoformat(),
+        "time": start.strftime("%H:%M"),
+        "day": start.strftime("%A"),
+        "formatted": start.strftime("%Y-%m-%d (%A) at %H:%M"),
+    }
+
+
+def _offer_alternatives(service, session, preferred_start, duration_minutes, deadline, intro):
+    """
+    Reply listing the nearest free alternatives to a taken or unavailable time
+
+    The options are remembered in ``session.suggested_dates`` with their
+    times, so "option 2" books that exact slot on the next turn.
+
+    Returns:
+        The reply text, or None if nothing is free in the search window
+    """
+    alternatives = suggest_alternatives(service, preferred_start, int(duration_minutes), deadline)
+    if not alternatives:
+        return None
+    session.suggested_dates = [_format_alternative(slot) for slot in alternatives]
+    lines = [intro]
+    for i, option in enumerate(session.suggested_dates, 1):
+        lines.append(f"{i}. {option['formatted']}")
+    lines.append("\nPlease let me know which one you'd prefer.")
+    return "\n".join(lines)
+
+
+def _preferred_on(date_value, time_pref):
+    """Requested start on a date (date or "YYYY-MM-DD"), or None if the time is not understood"""
+    preferred = parse_time(time_pref)
+    if preferred is None:
+        return None
+    if isinstance(date_value, str):
+        date_value = datetime.strptime(date_value, "%Y-%m-%d").date()
+    return datetime(date_value.year, date_value.month, date_value.day, *preferred, tzinfo=timezone.utc)
+
+
+def find_available_dates_before_deadline(
+    service, duration_minutes, time_pref, deadline_str, batched=True
+):
+    """
+    List up to 7 dates before the deadline that are free at the preferred time
+
+    With ``batched`` (the default) one freebusy query covers the whole range
+    and every per-day check is answered from an in-memory BusyIndex. With
+    ``batched=False`` each candidate day issues its own freebusy query.
+    """
+    windows = list(_candidate_windows(duration_minutes, time_pref, deadline_str))
+    if not windows:
+        return []
+
+    if batched:
+        time_min = windows[0][1].isoformat()
+        time_max = max(end_dt for _, _, end_dt in windows).isoformat()
+        try:
+            busy_index = fetch_busy_index(service, time_min, time_max)
+        except Exception as e:
+            ERRORS.inc(stage="freebusy")
+            logger.error("Error fetching busy periods %s - %s: %s", time_min, time_max, e)
+            return []
+        if busy_index is None:
+            return []
+
+        def is_free(start_dt, end_dt):
+            return bool(busy_index.free_slots(start_dt, end_dt, duration_minutes))
+
+    else:
+
+        def is_free(start_dt, end_dt):
+            return bool(
+                find_free_slots(
+                    service, duration_minutes, start_dt.isoformat(), end_dt.isoformat()
+                )
+            )
+
+    available_dates = []
+    for current_date, start_dt, end_dt in windows:
+        if is_free(start_dt, end_dt):
+            available_dates.append(_format_available_date(current_date))
+            if len(available_dates) >= 7:
+                break
+
+    return available_dates
+
+
+INTENT_REPLIES = {
+    "greeting": "Hello! I'm here to help you schedule meetings. You can tell me things like 'Schedule a 30-minute meeting on Monday at 2 PM' or 'I need a meeting before Friday at 10 AM'. What would you like to schedule?",
+    "thanks": "You're welcome! Is there anything else I can help you schedule?",
+    "goodbye": "Goodbye! Feel free to come back anytime you need to schedule a meeting.",
+    "ack": "Great! What would you like to schedule?",
+    "reset": "Okay, let's start over. What meeting would you like to schedule?",
+    "cancel": "Okay, I've dropped that request. What else can I schedule for you?",
+}
+
+
+def handle_intent(intent, period, service, session, progress):
+    """
+    Answer a message classified by the intent router, without the LLM
+    """
+    if intent in ("reset", "cancel"):
+        pending = any(session.state.values())
+        session.reset()
+        if intent == "cancel" and not pending:
+            return "There's no meeting request in progress to cancel. What would you like to schedule?"
+
+    if intent == "list_meetings":
+        progress("stage", "checking calendar")
+        return _list_meetings_reply(service, period)
+
+    return INTENT_REPLIES[intent]
+
+
+def _period_window(period, now):
+    """Return (start, end, label) of the time range a list request asks about"""
+    today = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+    if period == "today":
+        return now, today + timedelta(days=1), "today"
+    if period == "tomorrow":
+        return today + timedelta(days=1), today + timedelta(days=2), "tomorrow"
+    next_monday = today + timedelta(days=7 - now.weekday())
+    if period == "this week":
+        return now, next_monday, "this week"
+    if period == "next week":
+        return next_monday, next_monday + timedelta(days=7), "next week"
+    return now, now + timedelta(days=7), "in the next 7 days"
+
+
+def _format_when(value):
+    if len(value) == 10:  # all-day event
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%a %Y-%m-%d (all day)")
+    return parse_iso(value).strftime("%a %Y-%m-%d %H:%M")
+
+
+def _list_meetings_reply(service, period):
+    start, end, label = _period_window(period, datetime.now(timezone.utc))
+    try:
+        meetings = list_upcoming_meetings(service, start.isoformat(), end.isoformat())
+    except Exception as e:
+        ERRORS.inc(stage="list")
+        logger.error("Error listing meetings: %s", e)
+        return "Sorry, I couldn't read your calendar right now. Please try again."
+
+    if not meetings:
+        return f"You have no meetings {label}."
+    lines = [f"Your meetings {label}:"]
+    for i, meeting in enumerate(meetings, 1):
+        lines.append(f"{i}. {_format_when(meeting['start'])} - {meeting['summary']}")
+    return "\n".join(lines)
+
+
+def _no_progress(event, data=None):
+    pass
+
+
+def process_request(user_input, service, session, progress=None, book=None):
+    """
+    Handle one conversation turn for ``session`` and return the reply text
+
+    Turns of the same session are serialized; different sessions run in
+    parallel. ``progress(event, data)`` is called as the turn moves through
+    its stages ("stage" events).
+
+    With ``book(start, end)`` the event is not created inline: the slot is
+    reserved and handed to ``book``, which queues the insert and returns a
+    job ID (see booking_jobs.py), and the reply says the links will follow.
+    """
+    with session.lock:
+        return _process_turn(user_input, service, session, progress or _no_progress, book)
+
+
+def _process_turn(user_input, service, session, progress, book=None):
+    state = session.state
+
+    # Greetings, thanks, reset/cancel and "list my meetings" need no extraction
+    routed = route_intent(user_input)
+    if routed:
+        intent, period = routed
+        INTENTS.inc(intent=intent)
+        return handle_intent(intent, period, service, session, progress)
+
+    # Simple messages are parsed locally; everything else goes to the LLM
+    progress("stage", "understanding")
+    started = time.perf_counter()
+    structured = extract_meeting_details(user_input, session.suggested_dates)
+    if structured is not None:
+        EXTRACTION_STATS.record("fast", time.perf_counter() - started)
+    else:
+        structured = _extract_with_llm(user_input, session, progress)
+        EXTRACTION_STATS.record("llm", time.perf_counter() - started)
+
+    if not structured:
+        return "I didn't catch any meeting details in your message. Could you please tell me about the meeting you'd like to schedule? For example, 'I need a 30-minute meeting on Monday at 2 PM'."
+
+    return _apply_extracted(structured, service, session, progress, book)
+
+
+def _extract_with_llm(user_input, session, progress):
+    prompt, prompt_tokens = EXTRACTION_PROMPT.build(
+        session.state, user_input, session.suggested_dates
+    )
+
+    schema = MEETING_SCHEMA if STRUCTURED_OUTPUT else None
+    progress("stage", "thinking")
+    started = time.perf_counter()
+    try:
+        llm_response = chat_with_llm(prompt, response_schema=schema)
+    except Exception:
+        ERRORS.inc(stage="llm")
+        raise
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        "LLM prompt ~%d tokens (%d chars), latency %.0f ms", prompt_tokens, len(prompt), elapsed_ms
+    )
+    logger.debug("LLM response: %s", llm_response)
+    structured = parse_llm_json(llm_response, schema)
+    if structured is None:
+        ERRORS.inc(stage="parse")
+    return structured
+
+
+def _apply_extracted(structured, service, session, progress, book=None):
+    state = session.state
+
+    # Handle suggestion requests
+    if structured.get("request_suggestions", False):
+        if not all(
+            [
+                state["duration_minutes"],
+                state["time_pref"],
+                state["deadline"],
+            ]
+        ):
+            return "I need the meeting duration, preferred time, and deadline to suggest available dates."
+
+        progress("stage", "checking calendar")
+        available_dates = find_available_dates_before_deadline(
+            service,
+            state["duration_minutes"],
+            state["time_pref"],
+            state["deadline"],
+        )
+
+        if not available_dates:
+            # Nothing at that exact time; look around it instead
+            preferred_start = _preferred_on(datetime.utcnow().date(), state["time_pref"])
+            reply = preferred_start and _offer_alternatives(
+                service, session, preferred_start, state["duration_minutes"], state["deadline"],
+                f"No dates before {state['deadline']} are free at {state['time_pref']}. The closest free times are:",
+            )
+            return reply or f"No available slots found before {state['deadline']} at {state['time_pref']}. Please try a different time or deadline."
+
+        # Remember the list so "option 2" can be resolved next turn
+        session.suggested_dates = available_dates
+
+        suggestion_text = "Here are available dates before your deadline:\n"
+        for i, date_info in enumerate(available_dates, 1):
+            suggestion_text += f"{i}. {date_info['formatted']}\n"
+        suggestion_text += "\nPlease let me know which date you'd prefer."
+
+        return suggestion_text
+
+    # Handle date selections (don't reset state if user is just selecting a date)
+    is_selecting_date = structured.get("is_date_selection", False) or (
+        "date" in structured
+        and len(structured) == 1
+        and any(state[k] for k in ["duration_minutes", "time_pref", "deadline"])
+    )
+
+    # Picking an alternative time books it at that time, not the old preference
+    if is_selecting_date and not structured.get("time_pref"):
+        chosen = next(
+            (d for d in session.suggested_dates if d["date"] == structured.get("date") and d.get("time")),
+            None,
+        )
+        if chosen:
+            structured["time_pref"] = chosen["time"]
+
+    # If structured changes an already-known duration/time_pref, it's a new
+    # request (reset state). Filling in missing details or selecting a date
+    # continues the current one.
+    if not is_selecting_date and any(
+        structured.get(k) and state[k] and structured[k] != state[k]
+        for k in ["duration_minutes", "time_pref"]
+    ):
+        session.reset()
+
+    # Update state
+    for key in state:
+        if key in structured and structured[key]:
+            state[key] = structured[key]
+
+    # Normalize date fields
+    if state["date"]:
+        parsed = parse_date_or_day(state["date"])
+        if not parsed:
+            return f"I couldn't understand the date: {state['date']}. Please rephrase."
+        state["date"] = parsed
+
+    if state["deadline"]:
+        parsed = parse_date_or_day(state["deadline"])
+        if not parsed:
+            return f"I couldn't understand the deadline: {state['deadline']}. Please rephrase."
+        state["deadline"] = parsed
+
+    # Check for missing fields
+    missing = [k for k, v in state.items() if not v and k != "deadline"]
+    if missing:
+        return f"Could you provide the following missing details: {', '.join(missing)}?"
+
+    # Check deadline validity - FIXED: Compare date objects, not strings
+    if state["deadline"]:
+        meeting_date = datetime.strptime(state["date"], "%Y-%m-%d").date()
+        deadline_date = datetime.strptime(state["deadline"], "%Y-%m-%d").date()
+
+        if meeting_date > deadline_date:
+            # Suggest available dates
+            progress("stage", "checking calendar")
+            available_dates = find_available_dates_before_deadline(
+                service,
+                state["duration_minutes"],
+                state["time_pref"],
+                state["deadline"],
+            )
+
+            if available_dates:
+                session.suggested_dates = available_dates
+                suggestion_text = f"The date {state['date']} is after your deadline {state['deadline']}. Here are available dates before the deadline:\n"
+                for i, date_info in enumerate(available_dates, 1):
+                    suggestion_text += f"{i}. {date_info['formatted']}\n"
+                suggestion_text += "\nPlease choose one of these dates."
+                return suggestion_text
+            preferred_start = _preferred_on(deadline_date, state["time_pref"])
+            reply = preferred_start and _offer_alternatives(
+                service, session, preferred_start, state["duration_minutes"], state["deadline"],
+                f"The date {state['date']} is after your deadline {state['deadline']}, and no earlier date is free at {state['time_pref']}. The closest free times are:",
+            )
+            return reply or f"The date you provided is after the deadline, and no slots are available before {state['deadline']} at {state['time_pref']}. Please try a different time or extend the deadline."
+
+    # Schedule meeting
+    try:
+        duration = int(state["duration_minutes"])
+    except:
+        return "Invalid duration."
+
+    date_obj = datetime.strptime(state["date"], "%Y-%m-%d")
+    time_pref = state["time_pref"]
+
+    preferred = parse_time(time_pref)
+    if preferred is None:
+        return f"Invalid time preference: {time_pref}"
+    start_dt = datetime(
+        date_obj.year,
+        date_obj.month,
+        date_obj.day,
+        *preferred,
+        tzinfo=timezone.utc,
+    )
+
+    end_dt = start_dt + timedelta(minutes=duration)
+    time_min = start_dt.isoformat()
+    time_max = end_dt.isoformat()
+
+    progress("stage", "checking calendar")
+    free_slots = find_free_slots(service, duration, time_min, time_max)
+
+    if not free_slots:
+        reply = _offer_alternatives(
+            service, session, start_dt, duration, state["deadline"],
+            f"{start_dt.strftime('%Y-%m-%d %H:%M')} is already taken. The closest free times are:",
+        )
+        return reply or "No available slots at that time. Please try another time."
+
+    slot = free_slots[0]
+    # Reset state
+    session.reset()
+
+    if book is not None:
+        # Hold the slot until the queued insert lands, so the next request
+        # does not see it as free
+        record_busy(service, slot["start"], slot["end"])
+        book(slot["start"], slot["end"])
+        return (
+            f"Booking your meeting from {slot['start']} to {slot['end']}. "
+            "The calendar and Meet links will follow in a moment."
+        )
+
+    progress("stage", "creating event")
+    links = create_meeting(service, slot["start"], slot["end"])
+    if links is None:
+        return BOOKING_FAILED_REPLY
+    return booked_reply(slot["start"], slot["end"], links)
+
+
+def booked_reply(start, end, links):
+    """Confirmation text for a created meeting and its links"""
+    reply = f"Meeting scheduled from {start} to {end}. Calendar: {links['calendar_link']}"
+    if links.get("meet_link"):
+        reply += f" Meet: {links['meet_link']}"
+    return reply
+
+
+def main():
+    # Audio libraries are only needed by the CLI, not by the web app
+    from voice import listen, speak
+
+    service = get_calendar_service()
+    session = Session("cli")
+    speak("Hi! I can help schedule your meeting. What do you need?")
+    while True:
+        mode = input("Type 'voice' or 'text': ").strip().lower()
+        if mode == "voice":
+            user_input = listen()
+        elif mode == "text":
+            user_input = input("Please enter your meeting request: ")
+        else:
+            print("Invalid mode.")
+            continue
+
+        reply = process_request(user_input, service, session)
+        speak(reply)
+        print(reply)
+
+
+if __name__ == "__main__":
+    main()
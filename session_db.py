@@ -0,0 +1,414 @@
+"""
+SQLite persistence for conversations, booking jobs and created events
+
+Conversation state and suggested-date lists are saved after every turn,
+so they survive worker restarts and redeploys, and several worker
+processes can share one database file: it runs in WAL mode and each
+process has its own connections. Booking job status is saved too, so a
+job queued by one worker can be polled through any other. Reads use a small pool of read
+connections, so they never wait for a commit of this or another process.
+
+Writes are buffered and committed by a background thread in a single
+transaction every SESSION_DB_FLUSH_MS, with repeated saves of one
+session coalesced, so a turn only pays for a JSON dump and a dict
+insert. The SQL statements are constants, compiled once and reused from
+sqlite3's statement cache. A batch that cannot be committed (the file is
+locked by another process for longer than the busy timeout) is queued
+again. A crash loses at most the writes not yet committed.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+DEFAULT_FLUSH_SECONDS = float(os.getenv("SESSION_DB_FLUSH_MS", "50")) / 1000
+# Conversations and booking jobs untouched for this long are deleted
+# from the database
+DEFAULT_RETENTION_SECONDS = float(os.getenv("SESSION_DB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+PRUNE_EVERY_SECONDS = 600
+BUSY_TIMEOUT_SECONDS = 5.0
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " session_id TEXT PRIMARY KEY, state TEXT NOT NULL, suggested_dates TEXT NOT NULL,"
+    " version INTEGER NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)",
+    "CREATE TABLE IF NOT EXISTS bookings ("
+    " event_id TEXT PRIMARY KEY, calendar TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL,"
+    " summary TEXT, calendar_link TEXT, meet_link TEXT, created_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS bookings_calendar ON bookings (calendar, start)",
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " job_id TEXT PRIMARY KEY, owner TEXT, job TEXT NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated_at)",
+)
+_UPSERT_SESSION = (
+    "INSERT INTO sessions (session_id, state, suggested_dates, version, updated_at)"
+    " VALUES (?, ?, ?, ?, ?)"
+    " ON CONFLICT (session_id) DO UPDATE SET state = excluded.state,"
+    " suggested_dates = excluded.suggested_dates, version = excluded.version,"
+    " updated_at = excluded.updated_at"
+    # Never let an older snapshot (another process's, or a slower flush)
+    # overwrite a newer one. Two processes saving the same version is a
+    # conflict: the first commit wins and the other is told (rowcount 0).
+    " WHERE excluded.version > sessions.version"
+)
+_SELECT_SESSION = "SELECT state, suggested_dates, version FROM sessions WHERE session_id = ?"
+_SELECT_VERSION = "SELECT version FROM sessions WHERE session_id = ?"
+_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+_PRUNE_SESSIONS = "DELETE FROM sessions WHERE updated_at < ?"
+_UPSERT_JOB = "INSERT OR REPLACE INTO jobs (job_id, owner, job, updated_at) VALUES (?, ?, ?, ?)"
+_SELECT_JOB = "SELECT owner, job FROM jobs WHERE job_id = ?"
+_PRUNE_JOBS = "DELETE FROM jobs WHERE updated_at < ?"
+_INSERT_BOOKING = (
+    "INSERT OR REPLACE INTO bookings"
+    " (event_id, calendar, start, end, summary, calendar_link, meet_link, created_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class SessionDB:
+    """
+    Write-behind SQLite store of conversation state, booking jobs and
+    booked events
+
+    Reads see this process's unflushed writes. Other processes see them
+    after the next flush. Reads go through their own connections and never
+    wait for a commit; only the flusher waits for the database write lock.
+
+    Args:
+        path: SQLite database file (":memory:" for a private in-memory one)
+        flush_seconds: Longest time a write stays buffered
+        retention_seconds: Delete conversations and jobs idle for longer than this
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 retention_seconds=DEFAULT_RETENTION_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.retention_seconds = retention_seconds
+        self._db = self._connect()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Durable at every checkpoint rather than every commit; the write
+        # buffer already trades the last few milliseconds for speed
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        # Guards the write connection; readers take connections from the pool
+        self._db_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        self._flush_lock = threading.Lock()
+        self._pending_sessions = {}
+        self._pending_deletes = set()
+        self._pending_bookings = []
+        self._pending_jobs = {}
+        # The batch being committed, still visible to readers until it lands
+        self._in_flight = {}
+        self._in_flight_deletes = set()
+        self._in_flight_jobs = {}
+        # Sessions whose last save lost to another process's save of the same version
+        self._superseded = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+        self._last_prune = time.monotonic()
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    def _connect(self):
+        return sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=BUSY_TIMEOUT_SECONDS
+        )
+
+    @contextmanager
+    def _reader(self):
+        """A read connection from the pool (the write connection for ":memory:")."""
+        if self.path == ":memory:":
+            # A private in-memory database only exists on the connection that made it
+            with self._db_lock:
+                yield self._db
+            return
+        try:
+            db = self._readers.get_nowait()
+        except queue.Empty:
+            db = self._connect()
+            db.execute("PRAGMA query_only=ON")
+        try:
+            yield db
+        finally:
+            self._readers.put(db)
+
+    # -- conversations ----------------------------------------------------
+
+    def save_session(self, session):
+        """Queue a snapshot of ``session`` (state, suggestions, version)."""
+        row = (
+            session.id,
+            json.dumps(session.state),
+            json.dumps(session.suggested_dates),
+            session.version,
+            time.time(),
+        )
+        with self._lock:
+            self._pending_sessions[session.id] = row
+            self._pending_deletes.discard(session.id)
+        self._schedule_flush()
+
+    def load_session(self, session_id):
+        """
+        Read a saved conversation
+
+        Returns:
+            (state, suggested_dates, version), or None if it is not stored
+        """
+        row = self._buffered(session_id)
+        if row is False:
+            return None
+        if row is not None:
+            _, state, suggested, version, _ = row
+        else:
+            with self._reader() as db:
+                found = db.execute(_SELECT_SESSION, (session_id,)).fetchone()
+            if found is None:
+                return None
+            state, suggested, version = found
+        return json.loads(state), json.loads(suggested), version
+
+    def session_version(self, session_id):
+        """Version of the saved conversation, or None if it is not stored."""
+        row = self._buffered(session_id)
+        if row is False:
+            return None
+        if row is not None:
+            return row[3]
+        with self._reader() as db:
+            found = db.execute(_SELECT_VERSION, (session_id,)).fetchone()
+        return found[0] if found else None
+
+    def superseded(self, session_id):
+        """
+        Whether a save of this session was rejected since the last call
+
+        That happens when another process saved the same version first; the
+        caller should reload the conversation rather than keep its copy.
+        """
+        with self._lock:
+            if session_id in self._superseded:
+                self._superseded.discard(session_id)
+                return True
+        return False
+
+    def _buffered(self, session_id):
+        """Unflushed row for a session, False if its deletion is unflushed, else None."""
+        with self._lock:
+            for rows, deletes in ((self._pending_sessions, self._pending_deletes),
+                                  (self._in_flight, self._in_flight_deletes)):
+                if session_id in deletes:
+                    return False
+                if session_id in rows:
+                    return rows[session_id]
+        return None
+
+    def delete_session(self, session_id):
+        with self._lock:
+            self._pending_sessions.pop(session_id, None)
+            self._pending_deletes.add(session_id)
+        self._schedule_flush()
+
+    # -- booking jobs -----------------------------------------------------
+
+    def save_job(self, job_id, owner, job):
+        """Queue the latest status of a booking job (see BookingQueue's ``on_update``)."""
+        row = (job_id, owner, json.dumps(job), time.time())
+        with self._lock:
+            self._pending_jobs[job_id] = row
+        self._schedule_flush()
+
+    def load_job(self, job_id):
+        """
+        Read a booking job saved by this or another process
+
+        Returns:
+            (owner, job dict), or None if it is not stored
+        """
+        with self._lock:
+            row = self._pending_jobs.get(job_id) or self._in_flight_jobs.get(job_id)
+        if row is not None:
+            owner, job = row[1], row[2]
+        else:
+            with self._reader() as db:
+                found = db.execute(_SELECT_JOB, (job_id,)).fetchone()
+            if found is None:
+                return None
+            owner, job = found
+        return owner, json.loads(job)
+
+    # -- bookings ---------------------------------------------------------
+
+    def record_booking(self, calendar, start, end, summary, links):
+        """Queue metadata of a created event (see google_calendar.on_meeting_created)."""
+        if not links.get("event_id"):
+            return
+        row = (
+            links["event_id"], calendar, start, end, summary,
+            links.get("calendar_link"), links.get("meet_link"), time.time(),
+        )
+        with self._lock:
+            self._pending_bookings.append(row)
+        self._schedule_flush()
+
+    def bookings(self, calendar=None, limit=50):
+        """Most recently created events, newest first, optionally for one calendar."""
+        self.flush()
+        query = "SELECT event_id, calendar, start, end, summary, calendar_link, meet_link, created_at FROM bookings"
+        params = ()
+        if calendar is not None:
+            query += " WHERE calendar = ?"
+            params = (calendar,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._reader() as db:
+            rows = db.execute(query, params + (limit,)).fetchall()
+        columns = ("event_id", "calendar", "start", "end", "summary", "calendar_link", "meet_link", "created_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    # -- write buffer -----------------------------------------------------
+
+    def flush(self):
+        """
+        Commit every buffered write in one transaction
+
+        Returns:
+            False if the batch could not be written; it is queued again
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._in_flight, self._pending_sessions = self._pending_sessions, {}
+                self._in_flight_deletes, self._pending_deletes = self._pending_deletes, set()
+                bookings, self._pending_bookings = self._pending_bookings, []
+                self._in_flight_jobs, self._pending_jobs = self._pending_jobs, {}
+                sessions = list(self._in_flight.values())
+                deletes = list(self._in_flight_deletes)
+                jobs = list(self._in_flight_jobs.values())
+            committed = False
+            try:
+                committed = self._commit(sessions, deletes, bookings, jobs)
+            finally:
+                with self._lock:
+                    if not committed:
+                        self._requeue(bookings)
+                    self._in_flight = {}
+                    self._in_flight_deletes = set()
+                    self._in_flight_jobs = {}
+        if not committed:
+            self.failed_flushes += 1
+            self._wake.set()
+        return committed
+
+    def _requeue(self, bookings):
+        """Put a failed batch back in front of writes queued since (called under _lock)."""
+        for session_id, row in self._in_flight.items():
+            if session_id not in self._pending_sessions and session_id not in self._pending_deletes:
+                self._pending_sessions[session_id] = row
+        for session_id in self._in_flight_deletes:
+            if session_id not in self._pending_sessions:
+                self._pending_deletes.add(session_id)
+        self._pending_bookings[:0] = bookings
+        for job_id, row in self._in_flight_jobs.items():
+            self._pending_jobs.setdefault(job_id, row)
+
+    def _commit(self, sessions, deletes, bookings, jobs):
+        """Write one batch in a single transaction; returns False (logged) on error."""
+        if not (sessions or deletes or bookings or jobs):
+            return True
+        with self._db_lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                superseded = [row[0] for row in sessions if not self._db.execute(_UPSERT_SESSION, row).rowcount]
+                self._db.executemany(_DELETE_SESSION, [(session_id,) for session_id in deletes])
+                self._db.executemany(_INSERT_BOOKING, bookings)
+                self._db.executemany(_UPSERT_JOB, jobs)
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                logger.error("Could not write %d sessions / %d bookings / %d jobs, will retry: %s",
+                             len(sessions), len(bookings), len(jobs), e)
+                return False
+        if superseded:
+            logger.warning("Conversations saved by another process first: %s", ", ".join(superseded))
+            with self._lock:
+                self._superseded.update(superseded)
+        self.flushes += 1
+        self.rows_written += len(sessions) + len(deletes) + len(bookings) + len(jobs) - len(superseded)
+        return True
+
+    def prune(self, now=None):
+        """Delete conversations and jobs idle for longer than the retention period."""
+        cutoff = (now or time.time()) - self.retention_seconds
+        with self._db_lock:
+            self._db.execute(_PRUNE_JOBS, (cutoff,))
+            return self._db.execute(_PRUNE_SESSIONS, (cutoff,)).rowcount
+
+    def _schedule_flush(self):
+        flusher = self._flusher
+        if flusher is None or not flusher.is_alive():
+            with self._lock:
+                if self._flusher is flusher and not self._stop.is_set():
+                    if flusher is not None:
+                        logger.error("Session flush thread had stopped; starting a new one")
+                    self._flusher = threading.Thread(target=self._run, name="session-db-flush", daemon=True)
+                    self._flusher.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                # Let the writes of concurrent turns pile up into one commit
+                self._stop.wait(self.flush_seconds)
+                self.flush()
+                if time.monotonic() - self._last_prune > PRUNE_EVERY_SECONDS:
+                    self._last_prune = time.monotonic()
+                    try:
+                        self.prune()
+                    except sqlite3.Error as e:
+                        logger.warning("Could not prune old conversations, will retry later: %s", e)
+            except Exception:
+                # The thread must outlive any one failure, or buffered writes never land
+                logger.exception("Session flush failed; retrying")
+                self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            pending = (len(self._pending_sessions) + len(self._pending_deletes)
+                       + len(self._pending_bookings) + len(self._pending_jobs))
+        return {
+            "pending_writes": pending,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rows_written": self.rows_written,
+        }
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if not self.flush():
+            logger.error("Closing with %d unwritten conversation updates", self.stats()["pending_writes"])
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+MEETING_FIELDS = ("duration_minutes", "date", "time_pref", "deadline")
+
+DEFAULT_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+DEFAULT_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+
+def new_meeting_state():
+    return {field: None for field in MEETING_FIELDS}
+
+
+class Session:
+    """
+    Conversation state for one user
+
+    ``lock`` serializes turns of the same conversation; different sessions
+    are processed fully in parallel. ``version`` counts saves, so a copy
+    older than the one in the database can be detected.
+    """
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.state = new_meeting_state()
+        self.suggested_dates = []
+        self.version = 0
+        # (state, code_verifier) while an /authorize round trip is pending
+        self.oauth_flow = None
+        self.lock = threading.RLock()
+        self.last_seen = time.monotonic()
+
+    def reset(self):
+        for field in self.state:
+            self.state[field] = None
+        self.suggested_dates = []
+
+
+class SessionStore:
+    """
+    Thread-safe, session-keyed store of conversation state
+
+    Sessions idle for longer than ``idle_seconds`` are evicted, and the
+    store never holds more than ``max_sessions``; the least recently used
+    session is dropped first.
+
+    With a SessionDB (session_db.py) conversations are saved after each
+    turn and an evicted, restarted or other-process session is loaded
+    back from it. A cached session whose saved version is newer (another
+    worker process handled its last turn), or whose last save lost to
+    another process's, is refreshed before use. The store lock is never
+    held across database reads.
+    """
+
+    def __init__(self, idle_seconds=DEFAULT_IDLE_SECONDS, max_sessions=DEFAULT_MAX_SESSIONS, db=None):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.db = db
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id=None):
+        """Return the session for ``session_id``, creating a new one if needed."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None:
+                self._sessions.move_to_end(session.id)
+                session.last_seen = now
+        # Database reads happen outside the store lock, so a slow read only
+        # delays the conversation it is for
+        if session is not None:
+            if self.db is not None:
+                self._refresh(session)
+            return session
+
+        session = Session(session_id or uuid.uuid4().hex)
+        if session_id and self.db is not None:
+            self._load(session)
+        with self._lock:
+            existing = self._sessions.get(session.id)
+            if existing is not None:
+                # Another request loaded it meanwhile
+                self._sessions.move_to_end(existing.id)
+                existing.last_seen = now
+                return existing
+            session.last_seen = now
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def save(self, session):
+        """Persist the session's conversation state, if the store has a database."""
+        if self.db is not None:
+            with session.lock:
+                session.version += 1
+                self.db.save_session(session)
+
+    def _refresh(self, session):
+        """Reload a cached session another worker process has saved since."""
+        saved_version = self.db.session_version(session.id)
+        if saved_version is None:
+            return
+        if self.db.superseded(session.id) or saved_version > session.version:
+            with session.lock:
+                self._load(session)
+
+    def _load(self, session):
+        saved = self.db.load_session(session.id)
+        if saved is not None:
+            state, suggested_dates, session.version = saved
+            session.state.update({field: state.get(field) for field in session.state})
+            session.suggested_dates = suggested_dates
+
+    def peek(self, session_id):
+        """Return an existing session without creating or touching it."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.db is not None:
+            self.db.delete_session(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict_idle(self, now):
+        # Sessions are kept in last-used order, so idle ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen < self.idle_seconds:
+                break
+            del self._sessions[session_id]
@@ -0,0 +1,231 @@
+"""
+Ranked alternatives when the requested meeting time is taken
+
+Instead of telling the user the slot is busy and starting another round
+of extraction and freebusy calls, the recommender looks outwards from
+the requested time, up to SUGGEST_HORIZON_DAYS either side (and never
+past the deadline), inside working hours, and offers the best few free
+starts. Everything is answered from one busy list fetched for the whole
+search window.
+
+Candidates are scored (lower is better) by:
+
+  - distance from the requested start, plus how far their clock time is
+    from the requested one, so "same time tomorrow" beats "7 am today"
+    for a 3 pm request;
+  - deadline slack: slots in the last day before the deadline cost more;
+  - fragmentation: free time stranded next to the slot, too short to be
+    useful, costs more, so slots that sit against other meetings win.
+
+Only the best start of each free gap is kept and the top SUGGEST_TOP_K
+gaps are picked with a heap, so the alternatives are distinct windows
+rather than the same gap shifted by a few minutes. Times are UTC, like
+the rest of the scheduler.
+"""
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from google_calendar import fetch_busy_index
+from intervals import make_slot, parse_iso
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HORIZON_DAYS = int(os.getenv("SUGGEST_HORIZON_DAYS", "7"))
+DEFAULT_TOP_K = int(os.getenv("SUGGEST_TOP_K", "3"))
+DEFAULT_STEP_MINUTES = int(os.getenv("SUGGEST_STEP_MINUTES", "15"))
+WORKING_HOURS = os.getenv("WORKING_HOURS", "09:00-17:00")
+WORKING_DAYS = os.getenv("WORKING_DAYS", "mon-fri")
+
+# Score weights; a score is roughly "hours of inconvenience"
+PROXIMITY_WEIGHT = 0.25  # per hour between the candidate and the requested start
+TIME_OF_DAY_WEIGHT = 1.0  # per hour between their clock times
+SLACK_WEIGHT = 4.0  # for a slot ending right at the deadline, fading over the day before
+FRAGMENT_WEIGHT = 1.0  # per hour of free time stranded beside the slot
+MIN_USEFUL_MINUTES = 30
+
+_DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+class WorkingHours:
+    """
+    Daily working-hours mask
+
+    Args:
+        start: (hour, minute) the working day starts
+        end: (hour, minute) it ends, after ``start``
+        days: Weekday numbers (Monday is 0) that are working days
+    """
+
+    def __init__(self, start=(9, 0), end=(17, 0), days=range(5)):
+        if end <= start:
+            raise ValueError(f"Working hours must end after they start: {start} - {end}")
+        self.start = start
+        self.end = end
+        self.days = frozenset(days)
+
+    @classmethod
+    def parse(cls, hours, days):
+        """
+        Build a mask from strings like "09:00-17:00" and "mon-fri" or "mon,wed,fri"
+        """
+        start, end = (tuple(int(part) for part in bound.split(":")) for bound in hours.split("-"))
+        weekdays = set()
+        for item in days.lower().split(","):
+            first, _, last = item.strip().partition("-")
+            lo = _DAY_NAMES.index(first[:3])
+            hi = _DAY_NAMES.index(last[:3]) if last else lo
+            weekdays.update(range(lo, hi + 1))
+        return cls(start, end, weekdays)
+
+    def spans(self, start, end):
+        """Yield the working-hours (start, end) windows intersecting [start, end)."""
+        day = datetime(start.year, start.month, start.day, tzinfo=start.tzinfo)
+        while day < end:
+            if day.weekday() in self.days:
+                span_start = max(day.replace(hour=self.start[0], minute=self.start[1]), start)
+                span_end = min(day.replace(hour=self.end[0], minute=self.end[1]), end)
+                if span_start < span_end:
+                    yield span_start, span_end
+            day += timedelta(days=1)
+
+
+DEFAULT_WORKING_HOURS = WorkingHours.parse(WORKING_HOURS, WORKING_DAYS)
+
+
+def search_window(preferred_start, duration_minutes, deadline=None, now=None,
+                  horizon_days=DEFAULT_HORIZON_DAYS):
+    """
+    Range the recommender looks at, as (start, end) datetimes
+
+    ``deadline`` is a date (or "YYYY-MM-DD"); meetings must end by the end
+    of that day.
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = timedelta(days=horizon_days)
+    start = max(preferred_start - horizon, now)
+    end = preferred_start + horizon + timedelta(minutes=duration_minutes)
+    deadline_end = _deadline_end(deadline, preferred_start.tzinfo)
+    if deadline_end is not None:
+        end = min(end, deadline_end)
+    return start, end
+
+
+def _deadline_end(deadline, tz):
+    if not deadline:
+        return None
+    if isinstance(deadline, str):
+        deadline = datetime.strptime(deadline, "%Y-%m-%d").date()
+    return datetime(deadline.year, deadline.month, deadline.day, tzinfo=tz) + timedelta(days=1)
+
+
+def recommend_slots(busy_index, preferred_start, duration_minutes, deadline=None, now=None,
+                    horizon_days=DEFAULT_HORIZON_DAYS, working_hours=DEFAULT_WORKING_HOURS,
+                    step_minutes=DEFAULT_STEP_MINUTES, k=DEFAULT_TOP_K):
+    """
+    Best free slots near a preferred start, from an already fetched busy list
+
+    Args:
+        busy_index: BusyIndex covering ``search_window(...)``
+        preferred_start: Requested start (aware datetime)
+        duration_minutes: Meeting duration in minutes
+        deadline: Last allowed day (date or "YYYY-MM-DD"), or None
+        now: Current time; nothing earlier is offered
+        horizon_days: How far either side of the preference to look
+        working_hours: WorkingHours mask candidates must fit in
+        step_minutes: Grid candidate starts are aligned to
+        k: Number of alternatives to return
+
+    Returns:
+        Up to ``k`` slot dicts (as ``find_free_slots`` returns, plus
+        "score"), best first
+    """
+    window_start, window_end = search_window(
+        preferred_start, duration_minutes, deadline, now, horizon_days
+    )
+    duration = timedelta(minutes=duration_minutes)
+    context = (preferred_start, duration, _deadline_end(deadline, preferred_start.tzinfo))
+
+    best_per_gap = []
+    for span_start, span_end in working_hours.spans(window_start, window_end):
+        for gap in busy_index.free_slots(span_start, span_end, duration_minutes):
+            gap_start, gap_end = parse_iso(gap["start"]), parse_iso(gap["end"])
+            best_per_gap.append(min(
+                (_score(start, gap_start, gap_end, context), start)
+                for start in _candidate_starts(gap_start, gap_end, duration, step_minutes)
+            ))
+
+    return [
+        dict(make_slot(start, start + duration), score=round(score, 2))
+        for score, start in heapq.nsmallest(k, best_per_gap)
+    ]
+
+
+def _candidate_starts(gap_start, gap_end, duration, step_minutes):
+    """Starts against either edge of the gap, plus every grid-aligned one between."""
+    latest = gap_end - duration
+    yield gap_start
+    yield latest
+    step = timedelta(minutes=step_minutes)
+    midnight = gap_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    start = midnight + step * -(-(gap_start - midnight) // step)
+    while start < latest:
+        yield start
+        start += step
+
+
+def _score(start, gap_start, gap_end, context):
+    preferred_start, duration, deadline_end = context
+    distance_hours = abs((start - preferred_start).total_seconds()) / 3600
+    clock_hours = abs(
+        (start.hour * 60 + start.minute) - (preferred_start.hour * 60 + preferred_start.minute)
+    ) / 60
+    score = PROXIMITY_WEIGHT * distance_hours + TIME_OF_DAY_WEIGHT * min(clock_hours, 24 - clock_hours)
+
+    end = start + duration
+    if deadline_end is not None:
+        slack_hours = (deadline_end - end).total_seconds() / 3600
+        score += SLACK_WEIGHT * max(0.0, 1 - slack_hours / 24)
+
+    stranded = 0.0
+    for piece in (start - gap_start, gap_end - end):
+        minutes = piece.total_seconds() / 60
+        if 0 < minutes < MIN_USEFUL_MINUTES:
+            stranded += minutes
+    return score + FRAGMENT_WEIGHT * stranded / 60
+
+
+def suggest_alternatives(service, preferred_start, duration_minutes, deadline=None, now=None, **options):
+    """
+    Fetch the busy list for the search window once and rank alternatives in it
+
+    Args:
+        service: Google Calendar service object
+        preferred_start: Requested start (aware datetime)
+        duration_minutes: Meeting duration in minutes
+        deadline: Last allowed day (date or "YYYY-MM-DD"), or None
+        now: Current time (default: now, UTC)
+        **options: Passed on to ``recommend_slots``
+
+    Returns:
+        List of slot dicts, best first; empty when nothing fits or the
+        calendar could not be read
+    """
+    now = now or datetime.now(timezone.utc)
+    time_min, time_max = search_window(
+        preferred_start, duration_minutes, deadline, now,
+        options.get("horizon_days", DEFAULT_HORIZON_DAYS),
+    )
+    if time_max - time_min < timedelta(minutes=duration_minutes):
+        return []
+    try:
+        busy_index = fetch_busy_index(service, time_min.isoformat(), time_max.isoformat())
+    except Exception as e:
+        ERRORS.inc(stage="freebusy")
+        logger.error("Error fetching busy periods for alternatives: %s", e)
+        return []
+    if busy_index is None:
+        return []
+    return recommend_slots(busy_index, preferred_start, duration_minutes, deadline, now, **options)
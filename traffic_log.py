@@ -0,0 +1,67 @@
+"""
+Record /process traffic as JSONL and read it back as conversations
+
+Each line is one turn:
+    {"ts": 1718000000.123, "session": "...", "message": "...",
+     "reply": "...", "latency_ms": 412.5}
+
+``ts`` is when the turn arrived; ``reply`` and ``latency_ms`` are optional
+when reading. benchmarks/replay.py replays such files.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+RECORD_TRAFFIC_PATH = os.getenv("RECORD_TRAFFIC_PATH")
+
+
+class TrafficRecorder:
+    """
+    Appends turns to a JSONL file; a no-op when ``path`` is empty
+
+    Lines are written with a single append each, so several worker
+    processes can share one file.
+    """
+
+    def __init__(self, path=RECORD_TRAFFIC_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, started_at, session_id, message, reply, seconds):
+        if not self.path:
+            return
+        line = json.dumps({
+            "ts": round(started_at, 3),
+            "session": session_id,
+            "message": message,
+            "reply": reply,
+            "latency_ms": round(seconds * 1000, 1),
+        })
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def read_traffic(path):
+    """
+    Load recorded turns grouped into conversations
+
+    Returns:
+        List of conversations ordered by their first turn, each a list of
+        turn dicts in arrival order
+    """
+    turns = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            turn = json.loads(line)
+            if "session" not in turn or "message" not in turn:
+                raise ValueError(f"{path}:{number}: a turn needs 'session' and 'message'")
+            turns.append(turn)
+
+    conversations = OrderedDict()
+    for turn in sorted(turns, key=lambda t: t.get("ts", 0)):
+        conversations.setdefault(turn["session"], []).append(turn)
+    return list(conversations.values())
@@ -1,19 +1,19 @@
-import speech_recognition as sr
-import pyttsx3
-
-def listen():
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("Listening...")
-        audio = r.listen(source)
-    try:
-        text = r.recognize_google(audio)
-        print(f"You said: {text}")
-        return text
-    except:
-        return ""
-
-def speak(text):
-    engine = pyttsx3.init()
-    engine.say(text)
-    engine.runAndWait()
+import speech_recognition as sr
+import pyttsx3
+
+def listen():
+    r = sr.Recognizer()
+    with sr.Microphone() as source:
+        print("Listening...")
+        audio = r.listen(source)
+    try:
+        text = r.recognize_google(audio)
+        print(f"You said: {text}")
+        return text
+    except:
+        return ""
+
+def speak(text):
+    engine = pyttsx3.init()
+    engine.say(text)
+    engine.runAndWait()